@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 批处理工具
+在一个常驻进程池中对目录、通配符或清单中的所有文件执行同一操作，
+并输出每个文件的状态与耗时汇总（JSON）
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from pdf_metrics import METRICS, set_quiet
+
+
+# 操作名 -> (模块, 函数, 输出命名方式)
+OPERATIONS = {
+    "text": ("extract_text", "extract_text_from_pdf", "{stem}.txt"),
+    "tables": ("extract_tables", "extract_tables_from_pdf", "{stem}_tables.xlsx"),
+    "split": ("split_pdf", "split_pdf", "{stem}_split"),
+    "merge": ("merge_pdfs", "merge_pdfs", "{stem}.pdf"),
+    "watermark": ("watermark_pdf", "watermark_pdf", "{stem}_watermarked.pdf"),
+}
+
+
+def _call_operation(operation, input_path, output_path, options):
+    """调用对应示例脚本中的函数，返回可写入汇总的结果摘要"""
+    module_name, func_name, _ = OPERATIONS[operation]
+    # 模块在每个工作进程中只导入一次，后续任务复用
+    func = getattr(importlib.import_module(module_name), func_name)
+
+    if operation == "merge":
+        # 目录输入合并其中的所有 PDF，其余视为通配符
+        pattern = os.path.join(input_path, "*.pdf") if os.path.isdir(input_path) else input_path
+        result = func(pattern, output_path, **options)
+    else:
+        result = func(input_path, output_path, **options)
+
+    # 各脚本出错时打印信息后返回 None 而不是抛出异常，空结果同样视为失败
+    if result is None or result == [] or (operation == "merge" and not result.get("files")):
+        raise RuntimeError("没有产生任何输出")
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, (dict, int, float, str, bool)) or result is None:
+        return result
+    return str(result)
+
+
+def run_job(operation, input_path, output_path, options):
+    """
+    工作进程任务：执行单个文件的操作并捕获所有异常，附带各阶段耗时
+
+    Returns:
+        单个文件的状态字典
+    """
+    record = {
+        "input": input_path,
+        "output": output_path,
+        "status": "ok",
+        "elapsed": 0.0,
+    }
+    start = time.perf_counter()
+    set_quiet(True)
+    METRICS.reset(operation)
+    output = io.StringIO()
+    try:
+        if operation != "merge" and not os.path.exists(input_path):
+            raise FileNotFoundError(f"文件不存在: {input_path}")
+        # 各脚本的打印在批处理中不输出，失败时取最后一条错误提示作为说明
+        with contextlib.redirect_stdout(output):
+            record["result"] = _call_operation(operation, input_path, output_path, options)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        lines = [line.strip() for line in output.getvalue().splitlines()
+                 if line.lstrip().startswith(("✗", "⚠", "错误", "未找到"))]
+        if lines:
+            record["error"] += f"（{lines[-1]}）"
+        record["traceback"] = traceback.format_exc()
+    record["elapsed"] = round(time.perf_counter() - start, 4)
+    record["stages"] = METRICS.stage_summary()
+    return record
+
+
+def load_manifest(manifest_file):
+    """
+    读取清单文件
+
+    每行可以是一个路径，或一个 JSON 对象：
+    {"input": "a.pdf", "output": "a.txt", "options": {"workers": 2}}
+    """
+    jobs = []
+    with open(manifest_file, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                if "input" not in entry:
+                    raise ValueError(f"清单第 {line_no} 行缺少 input 字段")
+                jobs.append({
+                    "input": entry["input"],
+                    "output": entry.get("output"),
+                    "options": entry.get("options", {}),
+                })
+            else:
+                jobs.append({"input": line, "output": None, "options": {}})
+    return jobs
+
+
+def parse_options(pairs):
+    """将 KEY=VALUE 列表解析为参数字典，值按 JSON 解析，失败时保留为字符串"""
+    options = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            options[key] = json.loads(value)
+        except json.JSONDecodeError:
+            options[key] = value
+    return options
+
+
+def collect_inputs(sources, operation):
+    """
+    将目录或通配符展开为输入列表（合并操作以子目录为单位）
+
+    不存在的明确路径保留在列表中，由任务报告为失败；未匹配任何文件的
+    通配符打印警告。
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isdir(source):
+            if operation == "merge":
+                entries = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+                inputs.extend(path for path in entries if os.path.isdir(path))
+            else:
+                inputs.extend(sorted(glob.glob(os.path.join(source, "*.pdf"))))
+        elif glob.has_magic(source):
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                print(f"⚠ 通配符未匹配任何文件: {source}")
+            inputs.extend(matches)
+        else:
+            inputs.append(source)
+    return inputs
+
+
+def plan_jobs(inputs, manifest_jobs, operation, output_dir, default_options):
+    """为每个输入确定输出路径，同名输入按顺序加后缀避免覆盖"""
+    _, _, output_template = OPERATIONS[operation]
+    jobs = [{"input": path, "output": None, "options": {}} for path in inputs] + manifest_jobs
+
+    used_names = set()
+    for job in jobs:
+        job["options"] = {**default_options, **job["options"]}
+        if job["output"]:
+            continue
+        stem = os.path.splitext(os.path.basename(os.path.normpath(job["input"])))[0]
+        name = output_template.format(stem=stem)
+        suffix = 2
+        while name in used_names:
+            name = output_template.format(stem=f"{stem}_{suffix}")
+            suffix += 1
+        used_names.add(name)
+        job["output"] = os.path.join(output_dir, name)
+    return jobs
+
+
+def _run_pool(operation, jobs, workers, on_record):
+    """
+    在进程池中运行任务
+
+    Args:
+        jobs: [(任务序号, 任务), ...]，完成时调用 on_record(任务序号, 状态字典)
+
+    Returns:
+        因工作进程崩溃而未完成的 (任务序号, 任务) 列表
+    """
+    crashed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_job, operation, job["input"], job["output"], job["options"]): (job_idx, job)
+            for job_idx, job in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                on_record(futures[future][0], future.result())
+            except BrokenProcessPool:
+                crashed.append(futures[future])
+    return crashed
+
+
+def run_batch(operation, jobs, workers=None, summary_file=None):
+    """
+    批量执行操作，单个文件失败（包括工作进程崩溃）不会中断整体运行
+
+    Returns:
+        汇总字典
+    """
+    # 按任务序号记录结果，同一输入出现在多个任务中时不会混淆
+    records = {}
+
+    def on_record(job_idx, record):
+        records[job_idx] = record
+        if record["status"] == "ok":
+            print(f"✓ {record['input']} ({record['elapsed']:.2f}s)")
+        else:
+            print(f"✗ {record['input']}: {record['error']}")
+
+    start = time.perf_counter()
+    crashed = _run_pool(operation, list(enumerate(jobs)), workers, on_record)
+
+    # 进程池损坏时无法判断是哪个文件导致的，逐个隔离重跑
+    for job_idx, job in crashed:
+        if not _run_pool(operation, [(job_idx, job)], 1, on_record):
+            continue
+        on_record(job_idx, {
+            "input": job["input"],
+            "output": job["output"],
+            "status": "error",
+            "elapsed": 0.0,
+            "error": "工作进程异常退出",
+        })
+
+    # 汇总按任务顺序排列，便于对比多次运行
+    records = [records[job_idx] for job_idx in sorted(records)]
+
+    failed = sum(1 for record in records if record["status"] != "ok")
+    summary = {
+        "operation": operation,
+        "workers": workers or os.cpu_count(),
+        "total": len(records),
+        "ok": len(records) - failed,
+        "failed": failed,
+        "elapsed": round(time.perf_counter() - start, 4),
+        "files": records,
+    }
+
+    if summary_file:
+        with open(summary_file, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"共处理 {summary['total']} 个，成功 {summary['ok']} 个，失败 {failed} 个，"
+          f"耗时 {summary['elapsed']:.2f}s")
+    if summary_file:
+        print(f"汇总已保存到: {summary_file}")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="批量处理 PDF 文件",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python batch_pdf.py text inputs/ -o out/
+  python batch_pdf.py tables "reports/**/*.pdf" -o out/ -w 8
+  python batch_pdf.py split inputs/ -o out/ --option pages_per_file=5
+  python batch_pdf.py merge monthly/ -o out/          # 每个子目录合并为一个文件
+  python batch_pdf.py text --manifest jobs.jsonl -o out/
+        """
+    )
+
+    parser.add_argument(
+        "operation",
+        choices=sorted(OPERATIONS),
+        help="要执行的操作"
+    )
+
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        help="输入目录或通配符"
+    )
+
+    parser.add_argument(
+        "-m", "--manifest",
+        help="清单文件，每行一个路径或 JSON 对象"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        default="batch_output",
+        help="输出目录（默认: batch_output）"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="进程池大小（默认: CPU 核数）"
+    )
+
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="传给操作函数的参数，值按 JSON 解析（可重复）"
+    )
+
+    parser.add_argument(
+        "--summary",
+        help="汇总 JSON 文件（默认: 输出目录/batch_summary.json）"
+    )
+
+    args = parser.parse_args()
+
+    if not args.sources and not args.manifest:
+        parser.error("需要指定输入目录/通配符或 --manifest")
+
+    default_options = parse_options(args.option)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    inputs = collect_inputs(args.sources, args.operation)
+    manifest_jobs = load_manifest(args.manifest) if args.manifest else []
+    jobs = plan_jobs(inputs, manifest_jobs, args.operation, args.output, default_options)
+
+    if not jobs:
+        print("未找到需要处理的文件")
+        return 1
+
+    print(f"找到 {len(jobs)} 个任务，操作: {args.operation}")
+    summary_file = args.summary or os.path.join(args.output, "batch_summary.json")
+    summary = run_batch(args.operation, jobs, args.workers, summary_file)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
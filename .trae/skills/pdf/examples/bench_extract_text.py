@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本提取并行基准测试
+生成多页合成 PDF，对比串行与多进程提取的耗时，并校验输出完全一致
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from extract_text import extract_text_from_pdf
+from pdf_corpus import make_corpus_pdf
+
+
+def run_once(input_file, output_file, workers):
+    """运行一次提取，返回 (耗时秒数, 输出字节)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_text_from_pdf(input_file, output_file, workers=workers)
+    elapsed = time.perf_counter() - start
+    with open(output_file, "rb") as f:
+        return elapsed, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本提取并行基准测试")
+    parser.add_argument("-n", "--pages", type=int, default=500, help="合成 PDF 页数（默认: 500）")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1],
+                        help="要测试的进程数列表")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_file = os.path.join(tmp_dir, "synthetic.pdf")
+        make_corpus_pdf(pdf_file, "prose", args.pages)
+        print(f"合成 PDF: {args.pages} 页")
+
+        serial_time, serial_bytes = run_once(pdf_file, os.path.join(tmp_dir, "serial.txt"), 1)
+        print(f"串行:        {serial_time:8.2f}s")
+
+        for workers in sorted(set(args.workers)):
+            if workers <= 1:
+                continue
+            elapsed, output = run_once(pdf_file, os.path.join(tmp_dir, f"w{workers}.txt"), workers)
+            status = "一致" if output == serial_bytes else "不一致!"
+            print(f"{workers:2d} 进程:     {elapsed:8.2f}s  加速 {serial_time / elapsed:5.2f}x  输出{status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 示例工具基准测试
+在确定性的合成语料上运行文本提取、表格提取、合并与拆分，记录耗时、
+每秒页数与峰值内存，并与保存的基线对比以发现性能回退。
+每个用例在独立的子进程中运行，峰值内存互不影响。startup 用例记录
+pdftool.py 各子命令的冷启动耗时。
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_cache import default_cache_dir
+from pdf_corpus import CORPUS_KINDS, DEFAULT_SIZES, generate_corpus
+
+BENCH_OPERATIONS = ("text", "tables", "merge", "split", "startup")
+
+# 冷启动用例：以 --help 运行统一入口的各子命令，衡量导入开销
+STARTUP_COMMANDS = ("text", "tables", "split", "merge")
+
+# 操作 -> (模块, 函数, 推迟导入的依赖)；依赖在计时前预先导入，只衡量处理本身
+CASE_FUNCTIONS = {
+    "text": ("extract_text", "extract_text_from_pdf", ("pdfplumber", "pdf_lazy", "pdf_stream")),
+    "tables": ("extract_tables", "extract_tables_from_pdf", ("pdfplumber", "pandas")),
+    "merge": ("merge_pdfs", "merge_pdfs", ("pypdf", "pdf_stream")),
+    "split": ("split_pdf", "split_pdf", ("pdf_lazy", "pdf_stream")),
+}
+PDFTOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdftool.py")
+
+# 合并用例把同一文件复制多份后合并
+MERGE_COPIES = 4
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# 超过基线的比例阈值；耗时差值低于 MIN_SECONDS_DELTA 时视为噪声
+DEFAULT_THRESHOLD = 0.15
+MIN_SECONDS_DELTA = 0.05
+
+
+def _run_case(operation, input_file, work_dir):
+    """
+    子进程任务：运行一个用例，返回耗时与峰值内存
+
+    模块导入（包括工具内部推迟的导入）不计入耗时；各工具的输出全部丢弃。
+    """
+    from pdf_metrics import peak_rss_mb, set_quiet
+
+    set_quiet(True)
+    module_name, func_name, deferred = CASE_FUNCTIONS[operation]
+    func = getattr(importlib.import_module(module_name), func_name)
+    for dependency in deferred:
+        importlib.import_module(dependency)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if operation == "text":
+            func(input_file, os.path.join(work_dir, "output.txt"))
+        elif operation == "tables":
+            func(input_file, os.path.join(work_dir, "tables.xlsx"))
+        elif operation == "merge":
+            func(input_file, os.path.join(work_dir, "merged.pdf"))
+        else:
+            func(input_file, os.path.join(work_dir, "split"), pages_per_file=10)
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_case(operation, input_file, work_dir):
+    """在全新的子进程（spawn）中运行用例，避免继承父进程的内存与模块缓存"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_case, operation, input_file, work_dir).result()
+
+
+def run_startup(command):
+    """
+    在新的解释器中运行 pdftool.py <command> --help
+
+    Returns:
+        {"seconds", "peak_rss_mb"}；平台不支持 wait4 时峰值内存为 None
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, PDFTOOL, command, "--help"], stdout=subprocess.DEVNULL)
+    peak_rss = None
+    if hasattr(os, "wait4"):
+        # wait4 返回该子进程自身的资源占用（Linux 上 ru_maxrss 以 KB 为单位）
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    else:
+        process.wait()
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"pdftool.py {command} --help 退出码 {process.returncode}")
+    return {"seconds": elapsed, "peak_rss_mb": peak_rss}
+
+
+def _library_versions():
+    versions = {}
+    for name in ("pypdf", "pdfplumber", "reportlab", "pandas"):
+        try:
+            versions[name] = importlib.import_module(name).__version__
+        except (ImportError, AttributeError):
+            versions[name] = None
+    return versions
+
+
+def run_benchmarks(corpus_files, operations, repeat=1, log=print):
+    """
+    运行全部用例
+
+    Args:
+        corpus_files: generate_corpus 的结果
+        operations: 要测试的操作
+        repeat: 每个用例重复次数，耗时取最短、峰值内存取最大
+
+    Returns:
+        结果字典（含运行环境信息）
+    """
+    results = {}
+    if "startup" in operations:
+        for command in STARTUP_COMMANDS:
+            case_id = f"startup/{command}"
+            samples = [run_startup(command) for _ in range(repeat)]
+            peak_rss = [sample["peak_rss_mb"] for sample in samples if sample["peak_rss_mb"] is not None]
+            results[case_id] = {
+                "operation": "startup",
+                "kind": command,
+                "pages": None,
+                "seconds": round(min(sample["seconds"] for sample in samples), 4),
+                "pages_per_sec": None,
+                "peak_rss_mb": round(max(peak_rss), 1) if peak_rss else None,
+            }
+            log(_format_result(case_id, results[case_id]))
+
+    for (kind, num_pages), path in sorted(corpus_files.items()):
+        for operation in operations:
+            if operation == "startup":
+                continue
+            case_id = f"{operation}/{kind}_{num_pages}"
+            seconds, peak_rss = None, 0.0
+            for _ in range(repeat):
+                work_dir = tempfile.mkdtemp(prefix="pdf-bench-")
+                try:
+                    input_file = path
+                    pages = num_pages
+                    if operation == "merge":
+                        for copy_idx in range(MERGE_COPIES):
+                            shutil.copyfile(path, os.path.join(work_dir, f"part_{copy_idx}.pdf"))
+                        input_file = os.path.join(work_dir, "part_*.pdf")
+                        pages = num_pages * MERGE_COPIES
+                    sample = run_case(operation, input_file, work_dir)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                # 耗时取最短，峰值内存取最大
+                if seconds is None or sample["seconds"] < seconds:
+                    seconds = sample["seconds"]
+                peak_rss = max(peak_rss, sample["peak_rss_mb"] or 0.0)
+            results[case_id] = {
+                "operation": operation,
+                "kind": kind,
+                "pages": pages,
+                "seconds": round(seconds, 4),
+                "pages_per_sec": round(pages / seconds, 1) if seconds else None,
+                "peak_rss_mb": round(peak_rss, 1),
+            }
+            log(_format_result(case_id, results[case_id]))
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "libraries": _library_versions(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _format_result(case_id, result):
+    throughput = f"{result['pages_per_sec']:10.1f} 页/秒" if result["pages_per_sec"] else f"{'-':>15}"
+    peak_rss = f"{result['peak_rss_mb']:8.1f} MB" if result["peak_rss_mb"] is not None else f"{'-':>11}"
+    return f"{case_id:<22} {result['seconds']:9.3f}s {throughput} {peak_rss}"
+
+
+def compare_with_baseline(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    与基线逐项对比
+
+    Returns:
+        [(case_id, 说明), ...]：耗时或峰值内存超过基线 threshold 比例的用例
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for case_id, result in report["results"].items():
+        base = base_results.get(case_id)
+        if base is None:
+            continue
+        problems = []
+        time_delta = result["seconds"] - base["seconds"]
+        if time_delta > MIN_SECONDS_DELTA and result["seconds"] > base["seconds"] * (1 + threshold):
+            problems.append(f"耗时 {base['seconds']:.3f}s -> {result['seconds']:.3f}s")
+        if (result["peak_rss_mb"] is not None and base["peak_rss_mb"] is not None
+                and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold)):
+            problems.append(f"内存 {base['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB")
+        if problems:
+            regressions.append((case_id, "，".join(problems)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="PDF 示例工具基准测试",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python bench_pdf.py --save-baseline              # 记录当前版本为基线
+  python bench_pdf.py                              # 与基线对比，有回退时返回 1
+  python bench_pdf.py --kinds prose cjk --sizes 10 10000 --ops text split
+  python bench_pdf.py --ops startup --repeat 10          # 只测冷启动
+  python bench_pdf.py --repeat 5 -o results.json
+        """
+    )
+    parser.add_argument("--corpus", default=os.path.join(default_cache_dir(), "corpus"),
+                        help="语料目录，不存在的文件会先生成（默认: ~/.cache/pdf-skill/corpus）")
+    parser.add_argument("--kinds", nargs="+", choices=CORPUS_KINDS, default=list(CORPUS_KINDS),
+                        help="语料类型（默认: 全部）")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="页数列表（默认: 10 100 1000）")
+    parser.add_argument("--ops", nargs="+", choices=BENCH_OPERATIONS, default=list(BENCH_OPERATIONS),
+                        help="要测试的操作（默认: 全部）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数，取最短耗时（默认: 3）")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件（默认: bench_baseline.json）")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="判定回退的比例阈值（默认: %(default)s）")
+    args = parser.parse_args()
+
+    corpus_files = generate_corpus(args.corpus, args.kinds, args.sizes)
+    print(f"\n{'用例':<20} {'耗时':>8} {'吞吐':>13} {'峰值内存':>8}")
+    report = run_benchmarks(corpus_files, args.ops, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+    if args.save_baseline:
+        baseline = {"meta": report["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+            baseline["meta"] = report["meta"]
+        # 只覆盖本次运行的用例，保留基线中的其他用例
+        baseline["results"].update(report["results"])
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线文件 {args.baseline}，可使用 --save-baseline 创建")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_meta = baseline.get("meta", {})
+    if base_meta.get("platform") != report["meta"]["platform"] or base_meta.get("cpu_count") != report["meta"]["cpu_count"]:
+        print("\n⚠ 基线来自不同的运行环境，对比结果仅供参考")
+
+    regressions = compare_with_baseline(report, baseline, args.threshold)
+    compared = sum(1 for case_id in report["results"] if case_id in baseline.get("results", {}))
+    print(f"\n与基线对比 {compared} 个用例（阈值 {args.threshold:.0%}）")
+    for case_id, detail in regressions:
+        print(f"✗ 回退: {case_id}: {detail}")
+    if regressions:
+        return 1
+    print("✅ 未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
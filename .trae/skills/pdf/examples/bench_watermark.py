@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+水印基准测试
+生成多页合成 PDF，对比逐页 merge_page（SKILL.md 中的做法）与共享 Form XObject
+两种方式的耗时、峰值内存与输出大小。每种方式在独立的子进程中运行。
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_corpus import make_corpus_pdf
+from watermark_pdf import DEFAULT_TEXT, render_overlay
+
+
+def watermark_with_merge_page(input_file, output_file, text=DEFAULT_TEXT):
+    """对照组：每页 merge_page 同一张水印页，再逐页加入新文档"""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(input_file)
+    box = reader.pages[0].mediabox
+    watermark = PdfReader(io.BytesIO(render_overlay(round(float(box.width), 2),
+                                                    round(float(box.height), 2), text))).pages[0]
+    writer = PdfWriter()
+    for page in reader.pages:
+        page.merge_page(watermark)
+        writer.add_page(page)
+    with open(output_file, "wb") as f:
+        writer.write(f)
+
+
+def _run_case(method, input_file, output_file):
+    """子进程任务：运行一种方式，返回耗时与峰值内存（导入不计入耗时）"""
+    import pypdf  # noqa: F401
+    import reportlab.pdfgen.canvas  # noqa: F401
+
+    from pdf_metrics import peak_rss_mb, set_quiet
+    from watermark_pdf import watermark_pdf
+
+    set_quiet(True)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if method == "merge_page":
+            watermark_with_merge_page(input_file, output_file)
+        else:
+            watermark_pdf(input_file, output_file)
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_case(method, input_file, output_file):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_case, method, input_file, output_file).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水印基准测试：merge_page 与共享 Form XObject")
+    parser.add_argument("-n", "--pages", type=int, default=10000, help="合成 PDF 页数（默认: 10000）")
+    parser.add_argument("--kind", default="prose", help="合成语料类型（默认: prose）")
+    args = parser.parse_args()
+
+    from pypdf import PdfReader
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_file = os.path.join(tmp_dir, "synthetic.pdf")
+        make_corpus_pdf(pdf_file, args.kind, args.pages)
+        print(f"合成 PDF: {args.pages} 页，{os.path.getsize(pdf_file) / (1024 * 1024):.1f} MB")
+
+        results = {}
+        for method in ("merge_page", "xobject"):
+            output_file = os.path.join(tmp_dir, f"{method}.pdf")
+            result = run_case(method, pdf_file, output_file)
+            result["size"] = os.path.getsize(output_file)
+            result["pages"] = len(PdfReader(output_file).pages)
+            results[method] = result
+            rss = f"{result['peak_rss_mb']:7.1f} MB" if result["peak_rss_mb"] is not None else "      -"
+            print(f"{method:<11} {result['seconds']:8.2f}s  {args.pages / result['seconds']:7.0f} 页/秒  "
+                  f"峰值内存 {rss}  输出 {result['size'] / (1024 * 1024):6.1f} MB  {result['pages']} 页")
+
+        baseline, shared = results["merge_page"], results["xobject"]
+        print(f"\n加速 {baseline['seconds'] / shared['seconds']:.2f}x，"
+              f"输出缩小 {1 - shared['size'] / baseline['size']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 图片提取与压缩工具
+extract: 按图片的实际编码导出（JPEG、JPEG 2000 原样写出，其余解码后存为 PNG），
+         同一图片对象或内容相同的图片只导出一次
+compress: 按图片在页面上的显示尺寸计算有效分辨率，在进程池中降采样到目标 DPI
+          并重新压缩，再改写 PDF；书签、表单、元数据等其余内容保持不变
+
+图片位置通过解析内容流中的 q/Q/cm 与 Do 操作得到，包括嵌套的 Form XObject。
+内联图片（BI/ID/EI）与只作为软蒙版（/SMask）出现的图片不在处理范围内。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger, peak_rss_mb
+
+DEFAULT_DPI = 150
+DEFAULT_QUALITY = 75
+
+# 有效分辨率超过目标 DPI 的这一倍数才降采样，避免为很小的收益重新采样
+DOWNSAMPLE_MARGIN = 1.2
+
+# 宽或高小于该像素数的图片（图标、分隔线等）不压缩
+MIN_IMAGE_PIXELS = 16
+
+# 颜色数不超过该值的图片视为图形，无损压缩，不转为 JPEG
+MAX_GRAPHIC_COLORS = 256
+
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
+# 可原样写出为图片文件的编码
+PASSTHROUGH = {"/DCTDecode": ".jpg", "/JPXDecode": ".jp2"}
+
+LOSSY_FILTERS = ("/DCTDecode", "/JPXDecode")
+BILEVEL_FILTERS = ("/JBIG2Decode", "/CCITTFaxDecode")
+
+# 重新编码为 DeviceGray/DeviceRGB 会改变含义的颜色空间
+UNSUPPORTED_COLOR_SPACES = ("/Separation", "/DeviceN", "/Lab", "/Pattern")
+
+
+def _multiply(m, n):
+    """PDF 变换矩阵乘法 m × n（行向量约定，[a b c d e f]）"""
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+def _filters(xobj):
+    filters = xobj.get("/Filter")
+    if filters is None:
+        return []
+    if isinstance(filters, list):
+        return [str(name) for name in filters]
+    return [str(filters)]
+
+
+def _color_space_family(xobj):
+    color_space = xobj.get("/ColorSpace")
+    if color_space is None:
+        return None
+    color_space = color_space.get_object()
+    if isinstance(color_space, list):
+        family = str(color_space[0])
+        if family == "/Indexed" and len(color_space) > 1:
+            base = color_space[1].get_object()
+            return str(base[0] if isinstance(base, list) else base)
+        return family
+    return str(color_space)
+
+
+def _describe(value, digest, depth=0):
+    """把对象（解析间接引用）写入摘要；对象编号不参与计算"""
+    from pypdf.generic import DictionaryObject, StreamObject
+
+    value = value.get_object() if hasattr(value, "get_object") else value
+    if depth > 6:
+        return
+    if isinstance(value, StreamObject):
+        digest.update(hashlib.sha256(value._data).digest())
+    if isinstance(value, DictionaryObject):
+        for key in sorted(value):
+            if key != "/Length":
+                digest.update(key.encode())
+                _describe(value[key], digest, depth + 1)
+    elif isinstance(value, list):
+        for item in value:
+            _describe(item, digest, depth + 1)
+    else:
+        digest.update(repr(value).encode())
+
+
+def image_hash(xobj):
+    """图片内容哈希：覆盖原始数据、尺寸、编码参数、颜色空间与蒙版"""
+    digest = hashlib.sha256()
+    _describe(xobj, digest)
+    return digest.hexdigest()
+
+
+def scan_images(reader, log=print):
+    """
+    遍历所有页面（含嵌套的 Form XObject），收集被绘制的图片 XObject
+
+    Returns:
+        {(对象号, 代号): info}，同一对象被多处引用时只有一条；info 字段：
+        name, page（首次出现的页码）, pages, width, height, filters, bytes（原始数据大小）,
+        hash, placements（每次绘制的显示尺寸 (宽, 高)，单位为点）
+    """
+    from pypdf.generic import ContentStream, IndirectObject
+
+    from pdf_stream import ref_key
+
+    images = {}
+    forms = {}
+    page_log = page_logger(log)
+
+    def record(ref, xobj, name, page_idx, ctm):
+        key = ref_key(ref)
+        info = images.get(key)
+        if info is None:
+            info = images[key] = {
+                "key": key,
+                "name": str(name)[1:],
+                "page": page_idx,
+                "pages": set(),
+                "width": int(xobj.get("/Width", 0)),
+                "height": int(xobj.get("/Height", 0)),
+                "filters": _filters(xobj),
+                "bytes": len(xobj._data),
+                "hash": image_hash(xobj),
+                "placements": [],
+            }
+        info["pages"].add(page_idx)
+        info["placements"].append((math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3])))
+
+    def visit(operations, resources, ctm, page_idx, active):
+        xobjects = resources.get("/XObject") if resources else None
+        if not xobjects:
+            return
+        xobjects = xobjects.get_object()
+        stack = []
+        for operands, operator in operations():
+            if operator == b"q":
+                stack.append(ctm)
+            elif operator == b"Q":
+                if stack:
+                    ctm = stack.pop()
+            elif operator == b"cm":
+                ctm = _multiply([float(value) for value in operands], ctm)
+            elif operator == b"Do" and operands and operands[0] in xobjects:
+                ref = xobjects.raw_get(operands[0])
+                if not isinstance(ref, IndirectObject):
+                    continue
+                xobj = ref.get_object()
+                subtype = xobj.get("/Subtype")
+                if subtype == "/Image":
+                    record(ref, xobj, operands[0], page_idx, ctm)
+                elif subtype == "/Form":
+                    key = ref_key(ref)
+                    if key in active:
+                        continue
+                    if key not in forms:
+                        forms[key] = ContentStream(xobj, reader).operations
+                    matrix = [float(value) for value in xobj.get("/Matrix", IDENTITY)]
+                    visit(lambda: forms[key], xobj.get("/Resources") or resources,
+                          _multiply(matrix, ctm), page_idx, active | {key})
+
+    for page_idx, page in enumerate(reader.pages):
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else None
+        # 没有 XObject 的页面不必解析内容流
+        if resources and resources.get("/XObject"):
+            contents = page.get_contents()
+            if contents is not None:
+                visit(lambda: contents.operations, resources, IDENTITY, page_idx, frozenset())
+        page_log(f"✓ 已扫描第 {page_idx + 1} 页")
+    return images
+
+
+def effective_dpi(info):
+    """图片在所有绘制位置中最低的有效分辨率；没有有效位置时返回 None"""
+    dpis = []
+    for width_pt, height_pt in info["placements"]:
+        if width_pt > 0 and height_pt > 0:
+            dpis.append(min(info["width"] / (width_pt / 72), info["height"] / (height_pt / 72)))
+    return min(dpis) if dpis else None
+
+
+# ---- 子进程任务 ----
+
+_READERS = {}
+
+
+def _load_image(input_file, key):
+    """子进程中打开（并复用）源文件，返回图片 XObject"""
+    from pypdf import PdfReader
+    from pypdf.generic import IndirectObject
+
+    reader = _READERS.get(input_file)
+    if reader is None:
+        _READERS.clear()
+        reader = _READERS[input_file] = PdfReader(input_file)
+        if reader.is_encrypted:
+            reader.decrypt("")
+    return IndirectObject(key[0], key[1], reader).get_object()
+
+
+def _export_image(input_file, key, path_base):
+    """子进程任务：导出一张图片，返回 {"key", "file", "bytes", "seconds"} 或 {"key", "error"}"""
+    start = time.perf_counter()
+    try:
+        xobj = _load_image(input_file, key)
+        filters = _filters(xobj)
+        if len(filters) == 1 and filters[0] in PASSTHROUGH:
+            data, ext = xobj._data, PASSTHROUGH[filters[0]]
+        else:
+            image = xobj.decode_as_image()
+            if image is None:
+                return {"key": key, "error": "无法解码"}
+            if image.mode == "CMYK":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG")
+            data, ext = buffer.getvalue(), ".png"
+        path = path_base + ext
+        with open(path, "wb") as f:
+            f.write(data)
+    except Exception as e:
+        return {"key": key, "error": f"{type(e).__name__}: {e}"}
+    return {"key": key, "file": path, "bytes": len(data), "seconds": time.perf_counter() - start}
+
+
+def _unsupported(xobj):
+    """不适合重新编码的图片返回原因，否则返回 None"""
+    filters = _filters(xobj)
+    if xobj.get("/ImageMask"):
+        return "图像蒙版"
+    if any(name in BILEVEL_FILTERS for name in filters):
+        return "二值图像"
+    if "/Decode" in xobj:
+        return "带 /Decode 映射"
+    if isinstance(xobj.get("/Mask"), list):
+        return "颜色键蒙版"
+    if int(xobj.get("/BitsPerComponent", 8)) not in (2, 4, 8):
+        return "位深不支持"
+    if _color_space_family(xobj) in UNSUPPORTED_COLOR_SPACES:
+        return "颜色空间不支持"
+    return None
+
+
+def _recompress_image(input_file, key, scale, quality):
+    """
+    子进程任务：按比例降采样并重新编码一张图片
+
+    照片类图片编码为 JPEG；颜色较少的图形保持无损（Flate）。已是有损编码且
+    无需降采样的图片不重新编码，避免二次损失。结果不比原数据小时放弃。
+
+    Returns:
+        {"key", "data", "filter", "width", "height", "color_space", "bytes", "seconds"}，
+        或 {"key", "skipped"} / {"key", "error"}
+    """
+    start = time.perf_counter()
+    try:
+        xobj = _load_image(input_file, key)
+        reason = _unsupported(xobj)
+        if reason:
+            return {"key": key, "skipped": reason}
+        filters = _filters(xobj)
+        if scale >= 1 and any(name in LOSSY_FILTERS for name in filters):
+            return {"key": key, "skipped": "已是有损编码"}
+
+        from PIL import Image
+
+        image = xobj.decode_as_image()
+        if image is None:
+            return {"key": key, "skipped": "无法解码"}
+        # 透明度由原有的 /SMask 提供，这里只保留颜色
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("L" if image.mode in ("1", "LA", "I", "I;16") else "RGB")
+
+        graphic = image.getcolors(MAX_GRAPHIC_COLORS) is not None
+        if scale >= 1 and graphic:
+            return {"key": key, "skipped": "图形已无损压缩"}
+        if scale < 1:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+
+        if graphic:
+            data, filter_name = zlib.compress(image.tobytes(), 9), "/FlateDecode"
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=quality, optimize=True)
+            data, filter_name = buffer.getvalue(), "/DCTDecode"
+    except Exception as e:
+        return {"key": key, "error": f"{type(e).__name__}: {e}"}
+
+    if len(data) >= len(xobj._data):
+        return {"key": key, "skipped": "重新编码没有变小"}
+    return {
+        "key": key,
+        "data": data,
+        "filter": filter_name,
+        "width": image.width,
+        "height": image.height,
+        "color_space": "/DeviceGray" if image.mode == "L" else "/DeviceRGB",
+        "bytes": len(data),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _run_tasks(func, tasks, workers):
+    """执行任务并按完成顺序产出结果；workers <= 1 时在当前进程中串行执行"""
+    if workers <= 1:
+        for task in tasks:
+            yield func(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _open_reader(input_file):
+    from pypdf import PdfReader
+
+    reader = PdfReader(input_file)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return reader
+
+
+def _group_by_hash(images):
+    """按内容哈希分组，每组第一个对象作为代表"""
+    groups = {}
+    for key, info in images.items():
+        groups.setdefault(info["hash"], []).append(key)
+    return groups
+
+
+def extract_images(input_file, output_dir, workers=None, min_size=0, log=print):
+    """
+    导出 PDF 中的全部图片
+
+    Args:
+        input_file: 输入 PDF 文件
+        output_dir: 输出目录
+        workers: 并行解码的进程数（默认: CPU 核数）
+        min_size: 宽或高小于该像素数的图片不导出
+        log: 进度输出函数
+
+    Returns:
+        统计信息字典；导出清单写入 output_dir/images.json
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        return
+    workers = workers or os.cpu_count() or 1
+    page_log = page_logger(log)
+
+    with METRICS.stage("scan"):
+        reader = _open_reader(input_file)
+        images = scan_images(reader, log)
+    images = {key: info for key, info in images.items()
+              if info["width"] >= min_size and info["height"] >= min_size}
+    groups = _group_by_hash(images)
+    log(f"找到 {sum(len(info['placements']) for info in images.values())} 处图片引用，"
+        f"{len(images)} 个图片对象，{len(groups)} 张不同的图片")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for keys in groups.values():
+        info = images[keys[0]]
+        path_base = os.path.join(output_dir, f"page{info['page'] + 1}_obj{keys[0][0]}")
+        tasks.append((input_file, keys[0], path_base))
+
+    manifest = []
+    failed = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    with METRICS.stage("export"):
+        for result in _run_tasks(_export_image, tasks, workers):
+            info = images[result["key"]]
+            if "error" in result:
+                failed += 1
+                page_log(f"✗ 第 {info['page'] + 1} 页 {info['name']}: {result['error']}")
+                continue
+            duplicates = groups[info["hash"]]
+            total_bytes += result["bytes"]
+            manifest.append({
+                "file": os.path.basename(result["file"]),
+                "width": info["width"],
+                "height": info["height"],
+                "filters": info["filters"],
+                "pages": sorted(page + 1 for key in duplicates for page in images[key]["pages"]),
+                "objects": [f"{num} {gen} R" for num, gen in duplicates],
+                "dpi": round(effective_dpi(info) or 0),
+            })
+            page_log(f"✓ {result['file']}（{info['width']}x{info['height']}）")
+    elapsed = time.perf_counter() - start
+
+    manifest.sort(key=lambda item: (item["pages"][0] if item["pages"] else 0, item["file"]))
+    with open(os.path.join(output_dir, "images.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    METRICS.count("images", len(manifest))
+    stats = {
+        "references": sum(len(info["placements"]) for info in images.values()),
+        "objects": len(images),
+        "exported": len(manifest),
+        "failed": failed,
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"\n✅ 已导出 {len(manifest)} 张图片到: {output_dir}"
+          f"（跳过重复 {stats['references'] - len(manifest) - failed} 处，失败 {failed} 张）")
+    if elapsed > 0 and manifest:
+        print(f"吞吐: {len(manifest) / elapsed:.1f} 张/秒，{total_bytes / (1024 * 1024) / elapsed:.1f} MB/秒")
+    return stats
+
+
+def compress_pdf_images(input_file, output_file, dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY,
+                        workers=None, log=print):
+    """
+    降采样并重新压缩 PDF 中的图片，写出新文件
+
+    有效分辨率高于 dpi * DOWNSAMPLE_MARGIN 的图片缩放到 dpi；未被降采样的
+    无损照片转为 JPEG。内容相同的图片只处理一次，写出时合并为同一对象。
+
+    Args:
+        input_file: 输入 PDF 文件
+        output_file: 输出 PDF 文件
+        dpi: 目标分辨率
+        quality: JPEG 质量（1-95）
+        workers: 并行编码的进程数（默认: CPU 核数）
+        log: 进度输出函数
+
+    Returns:
+        统计信息字典
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        return
+    workers = workers or os.cpu_count() or 1
+    page_log = page_logger(log)
+
+    with METRICS.stage("scan"):
+        reader = _open_reader(input_file)
+        images = scan_images(reader, log)
+    groups = _group_by_hash(images)
+
+    tasks = []
+    for keys in groups.values():
+        info = images[keys[0]]
+        if min(info["width"], info["height"]) < MIN_IMAGE_PIXELS:
+            continue
+        # 同组对象共用处理结果，按所有绘制位置中最低的分辨率决定缩放
+        dpis = [value for value in (effective_dpi(images[key]) for key in keys) if value is not None]
+        current = min(dpis) if dpis else None
+        scale = 1.0
+        if current is not None and current > dpi * DOWNSAMPLE_MARGIN:
+            scale = dpi / current
+        tasks.append((input_file, keys[0], scale, quality))
+    log(f"找到 {len(images)} 个图片对象（{len(groups)} 张不同的图片），待处理 {len(tasks)} 张")
+
+    from pypdf import PdfWriter
+    from pypdf.generic import IndirectObject, NameObject, NumberObject
+
+    bytes_before = sum(info["bytes"] for info in images.values())
+    processed_bytes = 0
+    replaced = skipped = failed = 0
+    start = time.perf_counter()
+    with METRICS.stage("encode"):
+        for result in _run_tasks(_recompress_image, tasks, workers):
+            info = images[result["key"]]
+            label = f"第 {info['page'] + 1} 页 {info['name']}"
+            processed_bytes += info["bytes"]
+            if "error" in result:
+                failed += 1
+                page_log(f"✗ {label}: {result['error']}")
+                continue
+            if "skipped" in result:
+                skipped += 1
+                page_log(f"  {label}: 跳过（{result['skipped']}）")
+                continue
+            for key in groups[info["hash"]]:
+                xobj = IndirectObject(key[0], key[1], reader).get_object()
+                for name in ("/DecodeParms", "/Filter", "/SMaskInData"):
+                    xobj.pop(name, None)
+                xobj[NameObject("/Filter")] = NameObject(result["filter"])
+                xobj[NameObject("/Width")] = NumberObject(result["width"])
+                xobj[NameObject("/Height")] = NumberObject(result["height"])
+                xobj[NameObject("/BitsPerComponent")] = NumberObject(8)
+                xobj[NameObject("/ColorSpace")] = NameObject(result["color_space"])
+                xobj._data = result["data"]
+                if hasattr(xobj, "decoded_self"):
+                    xobj.decoded_self = None
+                images[key]["new_bytes"] = result["bytes"]
+            replaced += 1
+            page_log(f"✓ {label}: {info['width']}x{info['height']} -> "
+                     f"{result['width']}x{result['height']}，{info['bytes'] / 1024:.0f} KB -> "
+                     f"{result['bytes'] / 1024:.0f} KB")
+    elapsed = time.perf_counter() - start
+
+    with METRICS.stage("write"):
+        writer = PdfWriter(clone_from=reader)
+        # 内容相同的图片重新编码后数据一致，写出时合并为一个对象
+        writer.compress_identical_objects()
+        with open(output_file, "wb") as f:
+            writer.write(f)
+
+    bytes_after = sum(info.get("new_bytes", info["bytes"]) for info in images.values())
+    size_before = os.path.getsize(input_file)
+    size_after = os.path.getsize(output_file)
+    METRICS.count("images", replaced)
+    stats = {
+        "images": len(images),
+        "unique_images": len(groups),
+        "recompressed": replaced,
+        "skipped": skipped,
+        "failed": failed,
+        "image_bytes_before": bytes_before,
+        "image_bytes_after": bytes_after,
+        "size_before": size_before,
+        "size_after": size_after,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(f"\n✅ 压缩完成！输出文件: {output_file}")
+    print(f"重新压缩 {replaced} 张，跳过 {skipped} 张，失败 {failed} 张（目标 {dpi} DPI，质量 {quality}）")
+    print(f"图片数据: {bytes_before / 1024:.1f} KB -> {bytes_after / 1024:.1f} KB")
+    print(f"文件大小: {size_before / 1024:.1f} KB -> {size_after / 1024:.1f} KB"
+          f"（节省 {(size_before - size_after) / 1024:.1f} KB，{1 - size_after / size_before:.1%}）")
+    if elapsed > 0 and tasks:
+        print(f"吞吐: {len(tasks) / elapsed:.1f} 张/秒，{processed_bytes / (1024 * 1024) / elapsed:.1f} MB/秒"
+              f"（{workers} 个进程）")
+    if stats["peak_rss_mb"] is not None:
+        print(f"峰值内存: {stats['peak_rss_mb']:.1f} MB")
+    return stats
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="提取或压缩 PDF 中的图片",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python extract_images.py extract document.pdf -o images/
+  python extract_images.py extract document.pdf -o images/ --min-size 64 -w 8
+  python extract_images.py compress scanned.pdf -o smaller.pdf
+  python extract_images.py compress scanned.pdf -o smaller.pdf --dpi 100 --quality 60
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = subparsers.add_parser("extract", help="导出图片")
+    extract_parser.add_argument("input", help="输入 PDF 文件")
+    extract_parser.add_argument("-o", "--output", default="images", help="输出目录（默认: images）")
+    extract_parser.add_argument("--min-size", type=int, default=0, help="宽或高小于该像素数的图片不导出")
+
+    compress_parser = subparsers.add_parser("compress", help="降采样并重新压缩图片")
+    compress_parser.add_argument("input", help="输入 PDF 文件")
+    compress_parser.add_argument("-o", "--output", default="compressed.pdf", help="输出文件（默认: compressed.pdf）")
+    compress_parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="目标分辨率（默认: %(default)s）")
+    compress_parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                                 help="JPEG 质量 1-95（默认: %(default)s）")
+
+    for subparser in (extract_parser, compress_parser):
+        subparser.add_argument("-w", "--workers", type=int, help="并行处理的进程数（默认: CPU 核数）")
+        add_arguments(subparser)
+
+    args = parser.parse_args(argv)
+
+    with instrument(f"images_{args.command}", args):
+        if args.command == "extract":
+            extract_images(args.input, args.output, args.workers, args.min_size)
+        else:
+            compress_pdf_images(args.input, args.output, args.dpi, args.quality, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,51 +5,461 @@ PDF 表格提取工具
 从 PDF 文件中提取表格并导出到 Excel
 """
 
-import pdfplumber
-import pandas as pd
 import argparse
+import contextlib
 import os
+import re
 
+from pdf_cache import DEFAULT_MAX_BYTES, DocumentCache, PageCache
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger
 
-def extract_tables_from_pdf(input_file, output_file=None):
+# pdfplumber 与 pandas 导入较慢（pandas 还会带入 numpy），只在用到时导入，
+# --help 与参数错误等路径无需等待
+
+
+def tables_extractor():
+    """缓存中的提取器标识；提取逻辑变化时递增版本号，使旧缓存失效"""
+    from importlib.metadata import version
+
+    return f"tables-1-pdfplumber-{version('pdfplumber')}"
+
+
+# 内容流中的路径构造操作符（矩形、直线、贝塞尔曲线）
+PATH_OPERATORS = re.compile(rb"(?:^|\s)(?:re|l|c|v|y)(?=\s|$)")
+
+
+def _content_has_paths(page):
+    """
+    扫描原始内容流判断页面是否可能绘制了线条
+    
+    不解析布局，只做正则匹配；字符串中的误匹配只会导致继续做精确检查。
+    页面引用了 Form XObject 时无法只看页面内容流，保守地返回 True。
+    """
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.psparser import LIT
+    
+    page_obj = page.page_obj
+    xobjects = resolve1(resolve1(page_obj.resources or {}).get("XObject")) or {}
+    for xobject in xobjects.values():
+        if resolve1(xobject).attrs.get("Subtype") is LIT("Form"):
+            return True
+    for stream in page_obj.contents:
+        if PATH_OPERATORS.search(resolve1(stream).get_data()):
+            return True
+    return False
+
+
+def page_may_have_tables(page):
+    """
+    廉价预判页面是否可能包含表格
+    
+    默认的 lines 策略只从线条、矩形和曲线的边中构造单元格，一个单元格至少
+    需要两条水平边和两条竖直边。合并共线边只会减少边数，因此边数不足的页面
+    一定提取不到表格，可以安全跳过完整的表格分析。内容流中根本没有路径
+    操作符的页面（纯文本页）连布局解析都不需要。
+    """
+    if not _content_has_paths(page):
+        return False
+    from pdfplumber.table import TableSettings
+
+    min_length = TableSettings().edge_min_length_prefilter
+    horizontal = vertical = 0
+    for edge in page.edges:
+        if edge["orientation"] == "h":
+            if edge["width"] >= min_length:
+                horizontal += 1
+        elif edge["height"] >= min_length:
+            vertical += 1
+        if horizontal >= 2 and vertical >= 2:
+            return True
+    return False
+
+
+def iter_page_tables(input_file, cache=None, prefilter=True, verify_prefilter=False):
+    """
+    逐页产出 (page_idx, tables)，tables 为 page.extract_tables() 的结果
+    
+    Args:
+        input_file: 输入 PDF 文件
+        cache: PageCache 实例（可选），命中的页面不再重新分析
+        prefilter: 是否用 page_may_have_tables 跳过不可能含表格的页面
+        verify_prefilter: 对被跳过的页面仍做完整分析，统计预筛选的召回率
+    """
+    import pdfplumber
+
+    doc_cache = DocumentCache(cache, input_file, tables_extractor()) if cache else None
+    page_log = page_logger()
+    
+    with contextlib.ExitStack() as stack:
+        pdf = None
+        total_pages = doc_cache.page_count() if doc_cache else None
+        if total_pages is None:
+            with METRICS.stage("open"):
+                pdf = stack.enter_context(pdfplumber.open(input_file))
+                total_pages = len(pdf.pages)
+            if doc_cache:
+                doc_cache.set_page_count(total_pages)
+        print(f"PDF 总页数: {total_pages}")
+        
+        cached = doc_cache.cached_pages(range(total_pages)) if doc_cache else set()
+        missing = [page_idx for page_idx in range(total_pages) if page_idx not in cached]
+        if missing:
+            if pdf is None:
+                with METRICS.stage("open"):
+                    pdf = stack.enter_context(pdfplumber.open(input_file))
+            if doc_cache:
+                with METRICS.stage("fingerprint"):
+                    missing = doc_cache.resolve_by_fingerprint(pdf, missing)
+                cached = set(range(total_pages)).difference(missing)
+        if doc_cache:
+            METRICS.count("cache_hit_pages", total_pages - len(missing))
+            print(f"缓存命中 {total_pages - len(missing)}/{total_pages} 页")
+        
+        analyzed = skipped = missed = 0
+        for page_idx in range(total_pages):
+            # 本次写入的页面可能把尚未读取的缓存条目淘汰，读不到时按未命中重新分析
+            tables = doc_cache.get(page_idx) if page_idx in cached else None
+            if tables is None:
+                if pdf is None:
+                    with METRICS.stage("open"):
+                        pdf = stack.enter_context(pdfplumber.open(input_file))
+                page = pdf.pages[page_idx]
+                analyzed += 1
+                # 预筛选通过的页面在 prefilter 阶段已完成布局解析
+                with METRICS.time_page("prefilter", page_idx):
+                    may_have_tables = not prefilter or page_may_have_tables(page)
+                if not may_have_tables:
+                    skipped += 1
+                    tables = []
+                    if verify_prefilter and page.extract_tables():
+                        missed += 1
+                        page_log(f"  ⚠ 预筛选漏检第 {page_idx + 1} 页")
+                else:
+                    with METRICS.time_page("extract", page_idx):
+                        tables = page.extract_tables()
+                page.close()
+                if doc_cache:
+                    doc_cache.put(page_idx, tables)
+            yield page_idx, tables
+        
+        if prefilter and analyzed:
+            METRICS.count("prefilter_skipped_pages", skipped)
+            print(f"\n预筛选跳过 {skipped}/{analyzed} 页")
+            if verify_prefilter:
+                print(f"预筛选漏检 {missed} 页（被跳过页面中含表格的页数）")
+
+
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+
+
+def normalize_header(header):
+    """表头中的空单元格与重复列名补全为唯一的字符串"""
+    names = []
+    seen = {}
+    for col_idx, name in enumerate(header):
+        name = str(name).strip() if name is not None else ""
+        name = name or f"col{col_idx + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        names.append(name)
+    return tuple(names)
+
+
+def coerce_types(df):
+    """
+    按列向量化推断类型：整列可解析为数字的转为数值，可解析为日期的转为日期，
+    其余保留为字符串。空字符串视为缺失值。
+    """
+    import pandas as pd
+
+    for column in df.columns:
+        series = df[column]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        text = series.astype("string").str.strip().replace("", pd.NA)
+        present = text.notna()
+        if not present.any():
+            continue
+        numbers = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce")
+        if numbers[present].notna().all():
+            df[column] = numbers
+            continue
+        dates = pd.to_datetime(text, errors="coerce", format="mixed")
+        if dates[present].notna().all():
+            df[column] = dates
+            continue
+        df[column] = text
+    return df
+
+
+def group_tables(page_tables):
+    """
+    将表头相同的表格合并为一组，行数据直接累积为列表，最后一次性构建 DataFrame
+    
+    Args:
+        page_tables: 可迭代的 (page_idx, tables)
+    
+    Returns:
+        [{'header', 'pages', 'tables', 'data'}, ...]，按首次出现顺序排列
+    """
+    groups = {}
+    for page_idx, tables in page_tables:
+        for table in tables or []:
+            if not table:
+                continue
+            header = normalize_header(table[0])
+            group = groups.setdefault(header, {'header': header, 'pages': [], 'tables': 0, 'rows': []})
+            width = len(header)
+            group['rows'].extend(row + [None] * (width - len(row)) for row in table[1:])
+            group['tables'] += 1
+            if not group['pages'] or group['pages'][-1] != page_idx + 1:
+                group['pages'].append(page_idx + 1)
+    
+    import pandas as pd
+
+    result = []
+    for group in groups.values():
+        with METRICS.stage("dataframe"):
+            df = pd.DataFrame.from_records(group.pop('rows'), columns=list(group['header']))
+            group['data'] = coerce_types(df)
+        result.append(group)
+    return result
+
+
+# Excel 工作表名最长 31 个字符，不能包含 []:*?/\，且不区分大小写唯一
+SHEET_NAME_MAX = 31
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def unique_sheet_name(name, used):
+    """
+    将名称规范为合法且唯一的工作表名
+    
+    截断后与已有名称冲突时保留前缀并追加 ~2、~3……，结果只取决于名称
+    出现的顺序，同一份 PDF 每次导出的名称都相同。
+    
+    Args:
+        name: 原始名称
+        used: 已使用名称的小写集合，会被更新
+    """
+    name = INVALID_SHEET_CHARS.sub("_", str(name)).strip("'") or "Sheet"
+    candidate = name[:SHEET_NAME_MAX]
+    suffix = 1
+    while candidate.lower() in used:
+        suffix += 1
+        tag = f"~{suffix}"
+        candidate = name[:SHEET_NAME_MAX - len(tag)] + tag
+    used.add(candidate.lower())
+    return candidate
+
+
+# xlsxwriter 没有公开接口关闭已写完工作表的临时文件，常量内存模式下每个工作表
+# 占用一个文件句柄直到保存。私有的 _opt_close 只在验证过的主版本上调用，
+# 其他版本只使用公开接口（与 SKILL.md 中的版本约束一致）
+XLSXWRITER_FLUSH_MAJOR = "3"
+
+
+class TableWriter:
+    """
+    逐个写出表格：每个表格提取后立即写出，调用方随即丢弃 DataFrame，
+    内存占用与表格总数无关
+    
+    xlsx 优先使用 xlsxwriter 常量内存模式，未安装时使用 openpyxl 只写模式。
+    工作表按顺序写出，由 workbook.close() 统一保存；在验证过的 xlsxwriter
+    版本上，每个工作表写完即关闭其临时文件，数千个表格也不会耗尽文件句柄。
+    csv/parquet 每个表格写为 <文件名>_<名称>.<扩展名>，只有一个表格时
+    关闭时改名为输出文件本身。没有写出任何表格时不创建文件。
+    
+    Args:
+        output_file: 输出文件
+        output_format: xlsx、csv 或 parquet
+    """
+    
+    def __init__(self, output_file, output_format="xlsx"):
+        self.output_file = output_file
+        self.output_format = output_format
+        self.names = []
+        self.written = []
+        self._used_names = set()
+        self._workbook = None
+        self._worksheet = None
+        self._xlsxwriter = False
+        self._flush_sheets = False
+        self._closed = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def add(self, name, df):
+        """写出一个表格，返回实际使用的名称"""
+        name = unique_sheet_name(name, self._used_names)
+        self.names.append(name)
+        if self.output_format == "xlsx":
+            self._add_sheet(name, df)
+            return name
+        
+        base, ext = os.path.splitext(self.output_file)
+        path = f"{base}_{name}{ext}"
+        if self.output_format == "csv":
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+        else:
+            try:
+                df.to_parquet(path, index=False)
+            except ImportError:
+                raise ImportError("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+        self.written.append(path)
+        return name
+    
+    def _add_sheet(self, name, df):
+        if self._workbook is None:
+            self._open_workbook()
+        header = [str(column) for column in df.columns]
+        # 缺失值写为空单元格
+        values = df.astype(object).where(df.notna(), None)
+        if self._xlsxwriter:
+            previous = self._worksheet
+            if previous is not None and self._flush_sheets and hasattr(previous, "_opt_close"):
+                # 关闭上一个工作表的临时文件，保存时由 xlsxwriter 重新打开
+                previous._opt_close()
+            worksheet = self._worksheet = self._workbook.add_worksheet(name)
+            worksheet.write_row(0, 0, header)
+            # 常量内存模式要求按行顺序写出
+            for row_idx, row in enumerate(values.itertuples(index=False), 1):
+                worksheet.write_row(row_idx, 0, row)
+        else:
+            worksheet = self._workbook.create_sheet(title=name)
+            worksheet.append(header)
+            for row in values.itertuples(index=False):
+                worksheet.append(list(row))
+            worksheet.close()
+    
+    def _open_workbook(self):
+        try:
+            import xlsxwriter
+        except ImportError:
+            from openpyxl import Workbook
+            
+            self._workbook = Workbook(write_only=True)
+            return
+        self._xlsxwriter = True
+        self._flush_sheets = xlsxwriter.__version__.split(".")[0] == XLSXWRITER_FLUSH_MAJOR
+        self._workbook = xlsxwriter.Workbook(self.output_file, {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd",
+        })
+    
+    def close(self):
+        """完成写出，返回写出的文件列表"""
+        if self._closed:
+            return self.written
+        self._closed = True
+        if self._workbook is not None:
+            if self._xlsxwriter:
+                self._workbook.close()
+            else:
+                self._workbook.save(self.output_file)
+            self._workbook = None
+            self.written.append(self.output_file)
+        elif len(self.written) == 1 and self.output_format != "xlsx":
+            os.replace(self.written[0], self.output_file)
+            self.written = [self.output_file]
+        return self.written
+
+
+def write_tables(sheets, output_file, output_format):
+    """
+    导出多个表格
+    
+    Args:
+        sheets: 可迭代的 (名称, DataFrame)，可以是生成器
+        output_file: 输出文件；csv/parquet 有多个表格时以名称作为文件名后缀
+        output_format: xlsx、csv 或 parquet
+    
+    Returns:
+        写出的文件列表
+    """
+    with TableWriter(output_file, output_format) as writer:
+        for name, df in sheets:
+            writer.add(name, df)
+    return writer.written
+
+
+def extract_tables_from_pdf(input_file, output_file=None, cache=None, output_format=None, concat=False,
+                            prefilter=True, verify_prefilter=False):
     """
     从 PDF 提取所有表格
     
     Args:
         input_file: 输入 PDF 文件
-        output_file: 输出 Excel 文件（可选）
+        output_file: 输出文件（可选）
+        cache: PageCache 实例（可选）
+        output_format: xlsx、csv 或 parquet（默认按输出文件扩展名判断）
+        concat: 是否将表头相同的表格合并为一个带类型的表
+        prefilter: 是否跳过不可能含表格的页面（默认: 是）
+        verify_prefilter: 对跳过的页面仍做完整分析以统计漏检
+    
+    Returns:
+        表格列表 [{'page', 'table', ...}]；导出到文件时为 'sheet'、'rows'、'columns'
+        摘要（表格写出后即释放），否则为 'data'（DataFrame）
     """
     if not os.path.exists(input_file):
         print(f"错误: 文件不存在: {input_file}")
         return
     
+    if output_file and not output_format:
+        output_format = os.path.splitext(output_file)[1].lstrip(".").lower()
+        if output_format not in OUTPUT_FORMATS:
+            output_format = "xlsx"
+    
+    page_tables = iter_page_tables(input_file, cache, prefilter, verify_prefilter)
+    
+    if concat:
+        return _extract_grouped_tables(page_tables, output_file, output_format)
+    
+    import pandas as pd
+    
     all_tables = []
+    page_log = page_logger()
+    # 导出到文件时每个表格提取后立即写出，all_tables 只保留摘要
+    writer = TableWriter(output_file, output_format) if output_file else None
+    written = []
     
-    with pdfplumber.open(input_file) as pdf:
-        total_pages = len(pdf.pages)
-        print(f"PDF 总页数: {total_pages}")
-        
-        for page_idx, page in enumerate(pdf.pages):
-            print(f"\n正在处理第 {page_idx + 1} 页...")
-            
-            # 提取表格
-            tables = page.extract_tables()
+    try:
+        for page_idx, tables in page_tables:
+            page_log(f"\n正在处理第 {page_idx + 1} 页...")
             
             if tables:
-                print(f"  找到 {len(tables)} 个表格")
+                page_log(f"  找到 {len(tables)} 个表格")
                 
                 for table_idx, table in enumerate(tables):
                     if table and len(table) > 0:
                         # 第一行作为表头
-                        df = pd.DataFrame(table[1:], columns=table[0])
-                        all_tables.append({
+                        with METRICS.stage("dataframe"):
+                            df = pd.DataFrame(table[1:], columns=table[0])
+                        table_info = {
                             'page': page_idx + 1,
                             'table': table_idx + 1,
-                            'data': df
-                        })
-                        print(f"    ✓ 表格 {table_idx + 1}: {len(df)} 行 x {len(df.columns)} 列")
+                        }
+                        if writer:
+                            with METRICS.stage("write"):
+                                table_info['sheet'] = writer.add(f"Page{page_idx + 1}_Table{table_idx + 1}", df)
+                            table_info['rows'], table_info['columns'] = df.shape
+                        else:
+                            table_info['data'] = df
+                        all_tables.append(table_info)
+                        page_log(f"    ✓ 表格 {table_idx + 1}: {len(df)} 行 x {len(df.columns)} 列")
             else:
-                print(f"  未找到表格")
+                page_log(f"  未找到表格")
+    finally:
+        if writer:
+            with METRICS.stage("write"):
+                written = writer.close()
     
     if not all_tables:
         print("\n⚠ 未找到任何表格")
@@ -59,15 +469,9 @@ def extract_tables_from_pdf(input_file, output_file=None):
     print(f"共提取 {len(all_tables)} 个表格")
     print(f"{'='*60}")
     
-    # 导出到 Excel
     if output_file:
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            for idx, table_info in enumerate(all_tables):
-                sheet_name = f"Page{table_info['page']}_Table{table_info['table']}"
-                # 限制工作表名称长度
-                sheet_name = sheet_name[:31]
-                table_info['data'].to_excel(writer, sheet_name=sheet_name, index=False)
-                print(f"✓ 已导出: {sheet_name}")
+        for path in written:
+            print(f"✓ 已导出: {path}")
         
         print(f"\n✅ 表格已保存到: {output_file}")
     else:
@@ -81,14 +485,53 @@ def extract_tables_from_pdf(input_file, output_file=None):
     return all_tables
 
 
-def main():
+def _extract_grouped_tables(page_tables, output_file, output_format):
+    """合并模式：按表头分组拼接全部表格，统一推断列类型后导出"""
+    groups = group_tables(page_tables)
+    
+    if not groups:
+        print("\n⚠ 未找到任何表格")
+        return
+    
+    print(f"\n{'='*60}")
+    print(f"共 {sum(group['tables'] for group in groups)} 个表格，按表头合并为 {len(groups)} 组")
+    print(f"{'='*60}")
+    for group_idx, group in enumerate(groups, 1):
+        df = group['data']
+        types = ", ".join(f"{column}:{dtype}" for column, dtype in df.dtypes.items())
+        print(f"  组 {group_idx}: {group['tables']} 个表格, {len(df)} 行, 页 {group['pages'][0]}-{group['pages'][-1]}")
+        print(f"    列类型: {types}")
+    
+    if output_file:
+        sheets = [(f"Group{group_idx}", group['data']) for group_idx, group in enumerate(groups, 1)]
+        with METRICS.stage("write"):
+            written = write_tables(sheets, output_file, output_format)
+        for path in written:
+            print(f"✓ 已导出: {path}")
+        print(f"\n✅ 表格已保存到: {output_file}")
+    else:
+        for group_idx, group in enumerate(groups, 1):
+            print(f"\n{'='*60}")
+            print(f"组 {group_idx}（页 {', '.join(map(str, group['pages']))}）")
+            print(f"{'='*60}")
+            print(group['data'].to_string())
+    
+    return groups
+
+
+def main(argv=None, prog=None):
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="从 PDF 提取表格",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 示例:
   python extract_tables.py document.pdf
   python extract_tables.py document.pdf -o tables.xlsx
+  python extract_tables.py document.pdf -o tables.xlsx --no-cache
+  python extract_tables.py invoices.pdf --concat --format parquet
+  python extract_tables.py report.pdf --verify-prefilter --no-cache
+  python extract_tables.py report.pdf -q --metrics tables.json --profile cprofile
         """
     )
     
@@ -99,17 +542,67 @@ def main():
     
     parser.add_argument(
         "-o", "--output",
-        help="输出 Excel 文件（可选）"
+        help="输出文件（可选）"
+    )
+    
+    parser.add_argument(
+        "-f", "--format",
+        choices=OUTPUT_FORMATS,
+        help="输出格式（默认按输出文件扩展名判断，否则为 xlsx）"
+    )
+    
+    parser.add_argument(
+        "--concat",
+        action="store_true",
+        help="合并表头相同的表格并推断列类型"
+    )
+    
+    parser.add_argument(
+        "--no-prefilter",
+        action="store_true",
+        help="对每一页都做完整的表格分析"
+    )
+    
+    parser.add_argument(
+        "--verify-prefilter",
+        action="store_true",
+        help="对预筛选跳过的页面仍做完整分析，报告漏检页数"
+    )
+    
+    parser.add_argument(
+        "--cache-dir",
+        help="缓存目录（默认: ~/.cache/pdf-skill）"
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="缓存容量上限，单位 MB（默认: %(default)s）"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用提取结果缓存"
+    )
+    
+    add_arguments(parser)
+    
+    args = parser.parse_args(argv)
     
     # 默认输出文件名
     if not args.output:
         base_name = os.path.splitext(args.input)[0]
-        args.output = f"{base_name}_tables.xlsx"
+        args.output = f"{base_name}_tables.{args.format or 'xlsx'}"
+    
+    cache = None
+    if not args.no_cache:
+        cache = PageCache(args.cache_dir, args.cache_size * 1024 * 1024)
     
-    extract_tables_from_pdf(args.input, args.output)
+    with instrument("extract_tables", args):
+        extract_tables_from_pdf(args.input, args.output, cache, args.format, args.concat,
+                                not args.no_prefilter, args.verify_prefilter)
 
 
 if __name__ == "__main__":
@@ -5,29 +5,273 @@ PDF 文本提取工具
 从 PDF 文件中提取文本内容
 """
 
-import pdfplumber
 import argparse
+import base64
+import collections
+import contextlib
+import functools
+import io
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+from pdf_cache import DEFAULT_MAX_BYTES, DocumentCache, PageCache
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger
+from pdf_ocr import DEFAULT_OCR_DPI, DEFAULT_OCR_LANG, ocr_page, renderer_version, tesseract_version
 
-def extract_text_from_pdf(input_file, output_file=None, page_numbers=None):
+# pdfplumber 与 pypdf（pdf_lazy、pdf_stream）导入较慢，只在真正打开 PDF 时导入，
+# --help 与参数错误等路径无需等待
+
+
+def text_extractor():
+    """缓存中的提取器标识；提取逻辑变化时递增版本号，使旧缓存失效"""
+    from importlib.metadata import version
+
+    return f"text-1-pdfplumber-{version('pdfplumber')}"
+
+
+def _open_pdfplumber(source):
+    import pdfplumber
+
+    return pdfplumber.open(source)
+
+
+def _extract_page_range(input_file, page_indices):
+    """
+    子进程任务：打开独立的 pdfplumber 句柄，提取一段页面的文本
+    
+    Returns:
+        [(page_idx, text, 解析耗时, 提取耗时), ...]，顺序与 page_indices 一致
+    """
+    results = []
+    with _open_pdfplumber(input_file) as pdf:
+        for page_idx in page_indices:
+            page = pdf.pages[page_idx]
+            results.append((page_idx, *_timed_extract(page)))
+            page.close()
+    return results
+
+
+def _timed_extract(page):
+    """提取一页文本，分别计时 pdfminer 解析布局与文本拼接两个阶段"""
+    start = time.perf_counter()
+    page.objects
+    parsed = time.perf_counter()
+    text = page.extract_text()
+    return text, parsed - start, time.perf_counter() - parsed
+
+
+def _shard_pages(pages_to_process, workers):
+    """将页码列表切分为连续的分片，每个 worker 约分到 4 个分片以平衡负载"""
+    pages = list(pages_to_process)
+    num_shards = min(len(pages), workers * 4)
+    if num_shards == 0:
+        return []
+    size, extra = divmod(len(pages), num_shards)
+    shards = []
+    start = 0
+    for shard_idx in range(num_shards):
+        end = start + size + (1 if shard_idx < extra else 0)
+        shards.append(pages[start:end])
+        start = end
+    return shards
+
+
+class _PageSubset:
+    """
+    惰性读取的页面子集
+    
+    用 LazyPdf 只解析指定页面，写成内存中的小 PDF 后交给 pdfplumber，
+    不必解析整个文档的页面树。pages 以原页码为键；source 为子文档，
+    可传给子进程；index_map 为原页码到子文档页码的映射。
+    """
+    
+    def __init__(self, lazy, page_indices):
+        from pdf_stream import TemplateSource
+
+        page_indices = list(dict.fromkeys(page_indices))
+        self.source = io.BytesIO()
+        TemplateSource(lazy).write_pages(self.source, page_indices)
+        self.index_map = {page_idx: sub_idx for sub_idx, page_idx in enumerate(page_indices)}
+        self._pdf = _open_pdfplumber(io.BytesIO(self.source.getvalue()))
+        self.pages = {page_idx: self._pdf.pages[sub_idx] for page_idx, sub_idx in self.index_map.items()}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self._pdf.close()
+
+
+def _iter_page_text(pdf, input_file, pages_to_process, workers, index_map=None):
+    """
+    按页码顺序产出 (page_idx, text)，workers > 1 时由进程池并行提取
+    
+    index_map 不为空时 input_file 是页面子集，子进程按映射后的页码读取。
+    """
+    if workers <= 1:
+        for page_idx in pages_to_process:
+            page = pdf.pages[page_idx]
+            text, parse_s, extract_s = _timed_extract(page)
+            # 释放已处理页面的对象与布局缓存，保证内存不随页数增长
+            page.close()
+            METRICS.page("parse", page_idx, parse_s)
+            METRICS.page("extract", page_idx, extract_s)
+            yield page_idx, text
+        return
+    
+    shards = _shard_pages(pages_to_process, workers)
+    if not shards:
+        return
+    worker_shards = shards
+    if index_map:
+        worker_shards = [[index_map[page_idx] for page_idx in shard] for shard in shards]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map 按提交顺序返回结果，保证输出与串行路径一致
+        results = executor.map(_extract_page_range, [input_file] * len(shards), worker_shards)
+        for shard, shard_result in zip(shards, results):
+            for page_idx, (_, text, parse_s, extract_s) in zip(shard, shard_result):
+                METRICS.page("parse", page_idx, parse_s)
+                METRICS.page("extract", page_idx, extract_s)
+                yield page_idx, text
+
+
+def _ocr_empty_pages(page_texts, input_file, doc_cache, workers, dpi, lang, log):
+    """
+    对没有文本层的页面做 OCR，按原页码顺序产出 (page_idx, text)
+    
+    有文本的页面直接透传；空白页提交到进程池渲染并识别。进程池中同时在途的
+    页面数有上限，文本层提取与 OCR 重叠进行，先完成的页面不会越过前面
+    尚未识别完的页面输出。
+    
+    识别结果与渲染图只按文件哈希缓存：页面指纹不含图像像素，扫描页的内容流
+    往往完全相同，按指纹共用会把一页的识别结果错给另一页。渲染图体积大，
+    存放在缓存目录下单独限额的 renders 缓存中，不会挤掉文本条目。
+    """
+    ocr_cache = render_cache = render_store = None
+    if doc_cache:
+        ocr_cache = doc_cache.derive(f"ocr-tesseract-{tesseract_version()}", {"dpi": dpi, "lang": lang},
+                                     by_fingerprint=False)
+        render_store = PageCache(os.path.join(doc_cache.cache.cache_dir, "renders"), doc_cache.cache.max_bytes)
+        render_cache = doc_cache.derive(f"render-pypdfium2-{renderer_version()}", {"dpi": dpi},
+                                        cache=render_store, by_fingerprint=False)
+    else:
+        tesseract_version()  # 未安装时尽早报错
+    
+    page_log = page_logger(log)
+    max_in_flight = workers * 2
+    pending = collections.deque()
+    in_flight = 0
+    latencies = []
+    cache_hits = 0
+    
+    def finish(page_idx, text, future):
+        if future is None:
+            return text
+        result = future.result()
+        if ocr_cache:
+            ocr_cache.put(page_idx, result["text"])
+            if "png" in result:
+                render_cache.put(page_idx, base64.b64encode(result["png"]).decode("ascii"))
+        latency = result["render_s"] + result["ocr_s"]
+        latencies.append(latency)
+        METRICS.page("render", page_idx, result["render_s"])
+        METRICS.page("ocr", page_idx, result["ocr_s"])
+        page_log(f"  OCR 第 {page_idx + 1} 页: 渲染 {result['render_s']:.2f}s，"
+            f"识别 {result['ocr_s']:.2f}s，共 {latency:.2f}s")
+        return result["text"]
+    
+    with contextlib.ExitStack() as stack:
+        if render_store is not None:
+            stack.callback(render_store.close)
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+        for page_idx, text in page_texts:
+            future = None
+            if not text:
+                cached = ocr_cache.get(page_idx) if ocr_cache else None
+                if cached is not None:
+                    text = cached
+                    cache_hits += 1
+                else:
+                    png = render_cache.get(page_idx) if render_cache else None
+                    if png is not None:
+                        png = base64.b64decode(png)
+                    future = executor.submit(ocr_page, input_file, page_idx, dpi, lang, png)
+                    in_flight += 1
+            pending.append((page_idx, text, future))
+            
+            # 队首已就绪的页面立即输出；在途页面过多时阻塞等待队首完成
+            while pending and (pending[0][2] is None or pending[0][2].done() or in_flight >= max_in_flight):
+                page_idx, text, future = pending.popleft()
+                if future is not None:
+                    in_flight -= 1
+                yield page_idx, finish(page_idx, text, future)
+        
+        while pending:
+            page_idx, text, future = pending.popleft()
+            yield page_idx, finish(page_idx, text, future)
+    
+    if latencies or cache_hits:
+        summary = f"OCR: 识别 {len(latencies)} 页，缓存命中 {cache_hits} 页"
+        if latencies:
+            summary += (f"，平均 {sum(latencies) / len(latencies):.2f}s/页，"
+                        f"最长 {max(latencies):.2f}s")
+        log(summary)
+
+
+def iter_text_from_pdf(input_file, page_numbers=None, workers=1, log=print, cache=None,
+                       ocr=False, ocr_workers=None, ocr_dpi=DEFAULT_OCR_DPI, ocr_lang=DEFAULT_OCR_LANG,
+                       on_page=None, duplicates=None):
     """
-    从 PDF 提取文本
+    逐页产出待写出的文本片段（页眉与页面文本交替出现）
+    
+    将所有片段以 "\n" 连接即得到完整输出，调用方可边产出边写出，
+    无需在内存中保留整份文档。
     
     Args:
         input_file: 输入 PDF 文件
-        output_file: 输出文本文件（可选）
         page_numbers: 指定页码列表（可选）
+        workers: 并行提取的进程数
+        log: 进度输出函数
+        cache: PageCache 实例（可选），命中的页面不再重新提取
+        ocr: 是否对没有文本层的页面做 OCR（需安装 tesseract）
+        ocr_workers: OCR 进程数（默认: CPU 核数）
+        ocr_dpi: OCR 渲染分辨率
+        ocr_lang: tesseract 语言
+        on_page: 每个有文本的页面提取完成后调用 on_page(page_idx, text)（可选）
+        duplicates: {page_idx: 说明}（可选），这些页面不提取，只输出重复说明
     """
-    if not os.path.exists(input_file):
-        print(f"错误: 文件不存在: {input_file}")
-        return
+    duplicates = duplicates or {}
+    doc_cache = DocumentCache(cache, input_file, text_extractor()) if cache else None
     
-    all_text = []
+    page_log = page_logger(log)
     
-    with pdfplumber.open(input_file) as pdf:
-        total_pages = len(pdf.pages)
-        print(f"PDF 总页数: {total_pages}")
+    with contextlib.ExitStack() as stack:
+        pdf = None
+        lazy = None
+        source, index_map = input_file, None
+        if page_numbers:
+            # 只取部分页面时惰性打开，不解析整个文档；无法惰性解析时退回完整解析
+            from pdf_lazy import LazyPdf, LazyPdfError
+
+            try:
+                with METRICS.stage("open"):
+                    lazy = stack.enter_context(LazyPdf(input_file))
+            except LazyPdfError:
+                pass
+        
+        total_pages = doc_cache.page_count() if doc_cache else None
+        if total_pages is None:
+            if lazy is not None:
+                total_pages = len(lazy.pages)
+            else:
+                with METRICS.stage("open"):
+                    pdf = stack.enter_context(_open_pdfplumber(input_file))
+                    total_pages = len(pdf.pages)
+            if doc_cache:
+                doc_cache.set_page_count(total_pages)
+        log(f"PDF 总页数: {total_pages}")
         
         # 确定要处理的页面
         if page_numbers:
@@ -35,36 +279,180 @@ def extract_text_from_pdf(input_file, output_file=None, page_numbers=None):
         else:
             pages_to_process = range(total_pages)
         
-        for page_idx in pages_to_process:
-            page = pdf.pages[page_idx]
-            text = page.extract_text()
-            
-            if text:
-                page_header = f"\n{'='*60}\n第 {page_idx + 1} 页\n{'='*60}\n"
-                all_text.append(page_header)
-                all_text.append(text)
-                print(f"✓ 已提取第 {page_idx + 1} 页")
+        def open_pdf():
+            nonlocal pdf, source, index_map
+            if pdf is None:
+                with METRICS.stage("open"):
+                    if lazy is not None:
+                        pdf = stack.enter_context(_PageSubset(lazy, pages_to_process))
+                        source, index_map = pdf.source, pdf.index_map
+                    else:
+                        pdf = stack.enter_context(_open_pdfplumber(input_file))
+            return pdf
+        
+        cached = doc_cache.cached_pages(pages_to_process) if doc_cache else set()
+        missing = [page_idx for page_idx in pages_to_process
+                   if page_idx not in cached and page_idx not in duplicates]
+        if missing:
+            open_pdf()
+            if doc_cache:
+                with METRICS.stage("fingerprint"):
+                    missing = doc_cache.resolve_by_fingerprint(pdf, missing)
+                cached = set(pages_to_process).difference(missing, duplicates)
+        if doc_cache:
+            cache_hits = len(set(cached).difference(duplicates))
+            METRICS.count("cache_hit_pages", cache_hits)
+            log(f"缓存命中 {cache_hits}/{len(pages_to_process)} 页")
+        
+        def page_texts(extracted):
+            for page_idx in pages_to_process:
+                if page_idx in duplicates:
+                    text = f"[与 {duplicates[page_idx]} 重复，已省略]"
+                elif page_idx in cached:
+                    text = doc_cache.get(page_idx)
+                    if text is None:
+                        # 本次写入的页面可能把尚未读取的缓存条目淘汰，按未命中重新提取
+                        open_pdf()
+                        _, text = next(_iter_page_text(pdf, source, [page_idx], 1, index_map))
+                        doc_cache.put(page_idx, text or "")
+                else:
+                    _, text = next(extracted)
+                    if doc_cache:
+                        doc_cache.put(page_idx, text or "")
+                yield page_idx, text
+        
+        results = page_texts(_iter_page_text(pdf, source, missing, workers, index_map))
+        if ocr:
+            results = _ocr_empty_pages(results, input_file, doc_cache,
+                                       ocr_workers or os.cpu_count() or 1, ocr_dpi, ocr_lang, log)
+        
+        for page_idx, text in results:
+            if page_idx in duplicates:
+                yield f"\n{'='*60}\n第 {page_idx + 1} 页\n{'='*60}\n"
+                yield text
+                METRICS.count("duplicate_pages")
+                page_log(f"⚠ 第 {page_idx + 1} 页与 {duplicates[page_idx]} 重复，已省略")
+            elif text:
+                if on_page:
+                    on_page(page_idx, text)
+                yield f"\n{'='*60}\n第 {page_idx + 1} 页\n{'='*60}\n"
+                yield text
+                METRICS.count("pages_with_text")
+                page_log(f"✓ 已提取第 {page_idx + 1} 页")
             else:
-                print(f"⚠ 第 {page_idx + 1} 页无文本内容")
+                page_log(f"⚠ 第 {page_idx + 1} 页无文本内容")
+
+
+def write_text_stream(chunks, out):
+    """
+    将文本片段以 "\n" 分隔逐段写出
     
-    full_text = "\n".join(all_text)
+    Returns:
+        写出的片段数
+    """
+    count = 0
+    write_s = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        if count:
+            out.write("\n")
+        out.write(chunk)
+        write_s += time.perf_counter() - start
+        count += 1
+    METRICS.add("write", write_s)
+    return count
+
+
+def extract_text_from_pdf(input_file, output_file=None, page_numbers=None, workers=1, cache=None,
+                          ocr=False, ocr_workers=None, ocr_dpi=DEFAULT_OCR_DPI, ocr_lang=DEFAULT_OCR_LANG,
+                          index=None, dedup=None):
+    """
+    从 PDF 提取文本，逐页流式写出到文件或标准输出
     
-    # 输出到文件或控制台
-    if output_file:
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(full_text)
-        print(f"\n✅ 文本已保存到: {output_file}")
-    else:
-        print("\n" + "="*60)
-        print("提取的文本内容:")
-        print("="*60)
-        print(full_text)
+    Args:
+        input_file: 输入 PDF 文件
+        output_file: 输出文本文件（可选）
+        page_numbers: 指定页码列表（可选）
+        workers: 并行提取的进程数（默认 1，即串行）
+        cache: PageCache 实例（可选）
+        ocr: 是否对没有文本层的页面做 OCR
+        ocr_workers, ocr_dpi, ocr_lang: OCR 参数，见 iter_text_from_pdf
+        index: TextIndex 实例（可选），提取的页面同时写入全文索引
+        dedup: Deduplicator 实例（可选），跳过重复的文档，省略重复的页面（需启用缓存）
+    
+    Returns:
+        提取到文本的页数
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        return
     
-    return full_text
+    ocr_options = {"ocr": ocr, "ocr_workers": ocr_workers, "ocr_dpi": ocr_dpi, "ocr_lang": ocr_lang}
+    
+    if dedup is not None:
+        from pdf_dedup import describe_match, fingerprint_pdf
+        
+        # 计算指纹时提取的文本写入缓存，下面的正式提取直接命中
+        with METRICS.stage("dedup"):
+            fingerprint = fingerprint_pdf(input_file, page_numbers, cache, workers)
+            duplicate_of, duplicate_pages = dedup.check_document(input_file, fingerprint)
+        if duplicate_of:
+            METRICS.count("duplicate_documents")
+            print(f"⚠ 跳过: {input_file} 与 {describe_match(duplicate_of, score=duplicate_pages)} 重复",
+                  file=sys.stderr)
+            print(dedup.summary(), file=sys.stderr)
+            return 0
+        ocr_options["duplicates"] = {
+            page_idx: describe_match(*match) for page_idx, match in duplicate_pages.items()
+        }
+    
+    pages_with_text = 0
+    with contextlib.ExitStack() as stack:
+        add_page = None
+        if index is not None:
+            # 整个文档在一个事务中写入索引，提取失败时索引保持原样；
+            # 只提取部分页面或省略了重复页面时文档记为不完整，之后 add 仍会补全
+            complete = not page_numbers and not ocr_options.get("duplicates")
+            add_page = stack.enter_context(index.document(input_file, complete=complete))
+        
+        def on_page(page_idx, text):
+            nonlocal pages_with_text
+            pages_with_text += 1
+            if add_page is not None:
+                with METRICS.stage("index"):
+                    add_page(page_idx, text)
+        
+        ocr_options["on_page"] = on_page
+        
+        # 输出到文件或控制台
+        if output_file:
+            with open(output_file, "w", encoding="utf-8") as f:
+                write_text_stream(
+                    iter_text_from_pdf(input_file, page_numbers, workers, cache=cache, **ocr_options), f
+                )
+            print(f"\n✅ 文本已保存到: {output_file}")
+        else:
+            # 文本写到标准输出，进度信息改走标准错误，避免与正文交错
+            log = functools.partial(print, file=sys.stderr)
+            print("\n" + "="*60)
+            print("提取的文本内容:")
+            print("="*60)
+            write_text_stream(
+                iter_text_from_pdf(input_file, page_numbers, workers, log, cache, **ocr_options), sys.stdout
+            )
+            print()
+    
+    if index is not None:
+        print(f"✓ 已写入全文索引: {index.path}", file=sys.stderr)
+    if dedup is not None:
+        print(dedup.summary(), file=sys.stderr)
+    
+    return pages_with_text
 
 
-def main():
+def main(argv=None, prog=None):
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="从 PDF 提取文本",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -73,6 +461,12 @@ def main():
   python extract_text.py document.pdf -o output.txt
   python extract_text.py document.pdf -p 1 3 5
   python extract_text.py document.pdf -o output.txt -p 1-5
+  python extract_text.py document.pdf -o output.txt -w 8
+  python extract_text.py document.pdf -o output.txt --no-cache
+  python extract_text.py scanned.pdf -o output.txt --ocr --ocr-lang chi_sim+eng
+  python extract_text.py big.pdf -o output.txt -q --metrics extract_text.prom
+  python extract_text.py document.pdf -o output.txt --index archive.idx
+  python extract_text.py resent.pdf -o output.txt --dedup-db seen.sqlite
         """
     )
     
@@ -92,7 +486,78 @@ def main():
         help="指定页码（如: 1 3 5 或 1-5）"
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=1,
+        help="并行提取的进程数（默认: 1）"
+    )
+    
+    parser.add_argument(
+        "--cache-dir",
+        help="缓存目录（默认: ~/.cache/pdf-skill）"
+    )
+    
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="缓存容量上限，单位 MB（默认: %(default)s）"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用提取结果缓存"
+    )
+    
+    parser.add_argument(
+        "--ocr",
+        action="store_true",
+        help="对没有文本层的页面（扫描件）做 OCR，需安装 tesseract"
+    )
+    
+    parser.add_argument(
+        "--ocr-lang",
+        default=DEFAULT_OCR_LANG,
+        help="tesseract 识别语言（默认: %(default)s）"
+    )
+    
+    parser.add_argument(
+        "--ocr-dpi",
+        type=int,
+        default=DEFAULT_OCR_DPI,
+        help="OCR 渲染分辨率（默认: %(default)s）"
+    )
+    
+    parser.add_argument(
+        "--ocr-workers",
+        type=int,
+        help="OCR 进程数（默认: CPU 核数）"
+    )
+    
+    parser.add_argument(
+        "--index",
+        metavar="INDEX",
+        help="同时将提取的页面写入全文索引（查询见 pdf_index.py）"
+    )
+    
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="省略与前文重复或近似重复的页面"
+    )
+    
+    parser.add_argument(
+        "--dedup-db",
+        help="指纹索引文件，记录处理过的文档，与以往运行一起去重（隐含 --dedup）"
+    )
+    
+    add_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    if (args.dedup or args.dedup_db) and args.no_cache:
+        parser.error("--dedup 依赖页面缓存，不能与 --no-cache 同时使用")
     
     # 解析页码
     page_numbers = None
@@ -105,7 +570,34 @@ def main():
             else:
                 page_numbers.append(int(page_arg))
     
-    extract_text_from_pdf(args.input, args.output, page_numbers)
+    cache = None
+    if not args.no_cache:
+        cache = PageCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    
+    index = None
+    if args.index:
+        from pdf_index import TextIndex
+        
+        index = TextIndex(args.index)
+    
+    dedup = None
+    if args.dedup or args.dedup_db:
+        from pdf_dedup import Deduplicator
+        
+        dedup = Deduplicator(args.dedup_db)
+    
+    try:
+        with instrument("extract_text", args):
+            extract_text_from_pdf(args.input, args.output, page_numbers, args.workers, cache,
+                                  args.ocr, args.ocr_workers, args.ocr_dpi, args.ocr_lang, index, dedup)
+    except RuntimeError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if index is not None:
+            index.close()
+        if dedup is not None:
+            dedup.close()
 
 
 if __name__ == "__main__":
@@ -5,55 +5,351 @@ PDF 合并工具
 合并指定目录下的所有 PDF 文件
 """
 
-from pypdf import PdfWriter, PdfReader
 import glob
+import json
 import os
-import sys
+import time
 
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger, peak_rss_mb
 
-def merge_pdfs(input_pattern, output_file):
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(output_file):
+    """输出文件旁的清单文件路径"""
+    return output_file + MANIFEST_SUFFIX
+
+
+def load_manifest(output_file):
+    """
+    读取清单，并确认输出文件自上次合并后未被改动
+
+    Returns:
+        清单字典；清单缺失、损坏或与输出文件不符时返回 None
+    """
+    path = manifest_path(output_file)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        stat = os.stat(output_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"⚠ 清单无法读取，将完整重建: {e}")
+        return None
+    recorded = manifest.get("output", {})
+    if (recorded.get("size"), recorded.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+        print("⚠ 输出文件在上次合并后被改动，将完整重建")
+        return None
+    return manifest
+
+
+def save_manifest(output_file, entries):
+    """原子地写出清单（记录输出文件当前的大小与修改时间）"""
+    stat = os.stat(output_file)
+    manifest = {
+        "output": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "inputs": entries,
+    }
+    path = manifest_path(output_file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _input_entry(pdf_file, previous=None):
+    """
+    生成输入文件的清单条目
+
+    大小与修改时间都与上次相同时直接沿用上次的条目，否则重新计算 SHA-256。
+    内容未变（如只是被 touch）时返回的条目仍带有上次的节点号与页数。
+    """
+    from pdf_cache import hash_file
+
+    stat = os.stat(pdf_file)
+    if previous is not None and (previous["size"], previous["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return previous
+    entry = {
+        "path": os.path.abspath(pdf_file),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(pdf_file),
+    }
+    if previous is not None and previous["sha256"] == entry["sha256"]:
+        entry["node"], entry["pages"] = previous["node"], previous["pages"]
+    return entry
+
+
+def _is_output(path, output_file):
+    """path 是否为输出文件本身（包括经符号链接或硬链接指向它）或其清单"""
+    if os.path.abspath(path) in (os.path.abspath(output_file), os.path.abspath(manifest_path(output_file))):
+        return True
+    try:
+        return os.path.samefile(path, output_file)
+    except OSError:
+        return False
+
+
+def _add_file(writer, pdf_file, parent_id, duplicates, cache, page_log):
+    """
+    把一个输入文件的页面写成页面树中 parent_id 下的一个中间节点
+
+    Returns:
+        (节点对象号, 页数)；整个文件重复或没有可写的页面时返回 (None, 0)
+    """
+    from pypdf import PdfReader
+
+    duplicate_pages = {}
+    if duplicates is not None:
+        from pdf_dedup import describe_match, fingerprint_pdf
+        
+        with METRICS.stage("dedup"):
+            fingerprint = fingerprint_pdf(pdf_file, cache=cache)
+            duplicate_of, duplicate_pages = duplicates.check_document(pdf_file, fingerprint)
+        if duplicate_of:
+            page_log(f"⚠ 跳过: {pdf_file} 与 {describe_match(duplicate_of, score=duplicate_pages)} 重复")
+            return None, 0
+        for page_idx, match in sorted(duplicate_pages.items()):
+            page_log(f"  ⚠ 省略第 {page_idx + 1} 页: 与 {describe_match(*match)} 重复")
+    with METRICS.stage("open"):
+        reader = PdfReader(pdf_file)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        pages = [page for page_idx, page in enumerate(reader.pages) if page_idx not in duplicate_pages]
+    if not pages:
+        return None, 0
+    node_id = writer.reserve()
+    with METRICS.stage("copy"):
+        page_ids = writer.copy_pages(pages, node_id)
+    writer.write_pages_node(node_id, page_ids, len(page_ids), parent_id)
+    page_log(f"✓ 已添加: {pdf_file} ({len(page_ids)} 页)")
+    return node_id, len(page_ids)
+
+
+def merge_pdfs(input_pattern, output_file, dedup=True, duplicates=None, cache=None, incremental=False):
     """
     合并匹配模式的 PDF 文件
     
+    每个输入文件读完即写出并释放，相同的字体、图片等资源按内容哈希
+    只写出一份，内存占用不随输入总量增长。
+    
+    增量模式下在输出文件旁维护清单（路径、大小、修改时间、SHA-256）。
+    输出文件已存在且清单有效时只读取新增或变化的输入，以 PDF 增量更新的
+    方式追加到文件末尾，原有字节不被改写；否则完整合并并写出清单。
+    
     Args:
         input_pattern: 输入文件匹配模式，如 "*.pdf" 或 "doc*.pdf"
         output_file: 输出文件名
-    """
-    writer = PdfWriter()
+        dedup: 是否对相同资源去重（默认: 是）
+        duplicates: Deduplicator 实例（可选），跳过重复的文档与页面
+        cache: PageCache 实例（可选），计算重复检测指纹时复用提取的文本
+        incremental: 是否使用增量模式（默认: 否）
     
-    # 获取所有匹配的 PDF 文件
-    pdf_files = sorted(glob.glob(input_pattern))
+    Returns:
+        合并统计信息字典
+    """
+    # 获取所有匹配的 PDF 文件；输出文件与清单可能也匹配模式，不能作为输入
+    pdf_files = [pdf_file for pdf_file in sorted(glob.glob(input_pattern))
+                 if not _is_output(pdf_file, output_file)]
     
     if not pdf_files:
         print(f"未找到匹配的 PDF 文件: {input_pattern}")
         return
     
+    if incremental and os.path.exists(output_file):
+        manifest = load_manifest(output_file)
+        if manifest is not None:
+            stats = _append_pdfs(pdf_files, output_file, manifest, dedup, duplicates, cache)
+            if stats is not None:
+                return stats
+    
+    # pypdf 导入较慢，确认有输入文件后再导入
+    from pdf_stream import StreamingPdfWriter
+    
+    page_log = page_logger()
     print(f"找到 {len(pdf_files)} 个 PDF 文件:")
     for pdf_file in pdf_files:
-        print(f"  - {pdf_file}")
+        page_log(f"  - {pdf_file}")
     
-    # 合并文件
-    for pdf_file in pdf_files:
-        try:
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                writer.add_page(page)
-            print(f"✓ 已添加: {pdf_file} ({len(reader.pages)} 页)")
-        except Exception as e:
-            print(f"✗ 错误: 无法处理 {pdf_file}: {e}")
-    
-    # 保存合并后的文件
+    total_pages = 0
+    entries = []
     with open(output_file, "wb") as output:
-        writer.write(output)
+        writer = StreamingPdfWriter(output, dedup=dedup)
+        pages_id = writer.reserve()
+        kids = []
+        
+        # 合并文件：每个输入文件对应页面树中的一个中间节点
+        for pdf_file in pdf_files:
+            try:
+                entry = _input_entry(pdf_file) if incremental else {}
+                node_id, page_count = _add_file(writer, pdf_file, pages_id, duplicates, cache, page_log)
+            except Exception as e:
+                print(f"✗ 错误: 无法处理 {pdf_file}: {e}")
+                continue
+            entry.update(node=node_id, pages=page_count)
+            entries.append(entry)
+            if node_id is not None:
+                kids.append(node_id)
+                total_pages += page_count
+        
+        with METRICS.stage("write"):
+            writer.write_pages_node(pages_id, kids, total_pages)
+            output_size = writer.close(pages_id)
+    
+    if incremental:
+        save_manifest(output_file, entries)
+    
+    METRICS.count("pages", total_pages)
+    METRICS.count("duplicate_objects", writer.duplicates)
+    
+    stats = {
+        "files": len(kids),
+        "pages": total_pages,
+        "objects": writer.objects_written,
+        "duplicates": writer.duplicates,
+        "size_before_dedup": output_size + writer.bytes_saved,
+        "size": output_size,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if duplicates is not None:
+        METRICS.count("duplicate_documents", duplicates.stats["duplicate_documents"])
+        METRICS.count("duplicate_pages", duplicates.stats["duplicate_pages"])
+        stats["dedup"] = dict(duplicates.stats)
     
     print(f"\n✅ 合并完成！输出文件: {output_file}")
-    print(f"总页数: {len(writer.pages)}")
+    print(f"总页数: {total_pages}")
+    print(f"去重前大小: {stats['size_before_dedup'] / 1024:.1f} KB")
+    print(f"输出大小: {output_size / 1024:.1f} KB（去重 {writer.duplicates} 个对象）")
+    if duplicates is not None:
+        print(duplicates.summary())
+    if stats["peak_rss_mb"] is not None:
+        print(f"峰值内存: {stats['peak_rss_mb']:.1f} MB")
+    
+    return stats
 
 
-def main():
+def _append_pdfs(pdf_files, output_file, manifest, dedup, duplicates, cache):
+    """
+    以增量更新的方式把新增或变化的输入追加到已有的输出文件
+
+    新页面写成根页面节点下的新中间节点，根页面节点以原对象号重写一次，
+    再追加只含这些对象的交叉引用节（/Prev 指向原来的一节）。删除或变化的
+    输入只是从根节点的 /Kids 中去掉，其旧对象仍留在文件中。
+
+    Returns:
+        合并统计信息字典；输出文件结构与清单不符时返回 None（由调用方完整重建）
+    """
+    from pdf_lazy import LazyPdf, LazyPdfError
+    from pdf_stream import StreamingPdfWriter
+
+    start = time.perf_counter()
+    page_log = page_logger()
+    previous = {entry["path"]: entry for entry in manifest["inputs"]}
+    
+    with METRICS.stage("scan"):
+        entries = [_input_entry(pdf_file, previous.get(os.path.abspath(pdf_file))) for pdf_file in pdf_files]
+    pending = [(pdf_file, entry) for pdf_file, entry in zip(pdf_files, entries) if "node" not in entry]
+    current = {entry["path"] for entry in entries}
+    removed = [path for path in previous if path not in current]
+    
+    old_kids = [entry["node"] for entry in manifest["inputs"] if entry["node"] is not None]
+    kids = [entry["node"] for entry in entries if entry.get("node") is not None]
+    if not pending and kids == old_kids:
+        # 只有修改时间变化（内容未变）时同样刷新清单，下次不再重新计算哈希
+        if entries != manifest["inputs"]:
+            save_manifest(output_file, entries)
+        print(f"✓ 没有新增或变化的文件: {output_file} 保持不变")
+        return {"files": 0, "pages": 0, "appended": 0, "size": os.path.getsize(output_file)}
+    
+    try:
+        with LazyPdf(output_file) as pdf:
+            trailer = pdf.trailer
+            root_id = trailer.raw_get("/Root").idnum
+            pages_ref = trailer["/Root"].get_object().raw_get("/Pages")
+            pages_id = pages_ref.idnum
+            recorded_kids = [kid.idnum for kid in pages_ref.get_object()["/Kids"]]
+            info_id = trailer.raw_get("/Info").idnum if "/Info" in trailer else None
+            next_id, prev_xref, xref_stream = int(trailer["/Size"]), pdf.startxref, pdf.xref_stream
+    except (LazyPdfError, KeyError, AttributeError) as e:
+        print(f"⚠ 无法读取输出文件结构，将完整重建: {e}")
+        return None
+    if recorded_kids != old_kids or xref_stream:
+        print("⚠ 输出文件的页面树与清单不符，将完整重建")
+        return None
+    
+    print(f"增量合并: {len(pending)} 个新增或变化的文件，{len(entries) - len(pending)} 个已合并"
+          + (f"，{len(removed)} 个已删除" if removed else ""))
+    
+    added_files = added_pages = 0
+    with open(output_file, "r+b") as output:
+        original_size = output.seek(0, os.SEEK_END)
+        writer = StreamingPdfWriter(output, dedup=dedup, next_id=next_id, position=original_size)
+        try:
+            for pdf_file, entry in pending:
+                try:
+                    node_id, page_count = _add_file(writer, pdf_file, pages_id, duplicates, cache, page_log)
+                except Exception as e:
+                    print(f"✗ 错误: 无法处理 {pdf_file}: {e}")
+                    entries.remove(entry)
+                    continue
+                entry.update(node=node_id, pages=page_count)
+                if node_id is not None:
+                    added_files += 1
+                    added_pages += page_count
+            
+            total_pages = sum(entry["pages"] for entry in entries if entry["node"] is not None)
+            with METRICS.stage("write"):
+                writer.write_pages_node(pages_id, [entry["node"] for entry in entries if entry["node"] is not None],
+                                        total_pages)
+                output_size = writer.close_update(root_id, prev_xref, info_id)
+        except BaseException:
+            # 追加到一半失败时截回原长度，文件保持上一次的完整状态
+            output.truncate(original_size)
+            raise
+    
+    save_manifest(output_file, entries)
+    
+    METRICS.count("pages", added_pages)
+    METRICS.count("duplicate_objects", writer.duplicates)
+    
+    stats = {
+        "files": added_files,
+        "pages": added_pages,
+        "total_pages": total_pages,
+        "objects": writer.objects_written,
+        "duplicates": writer.duplicates,
+        "appended": output_size - original_size,
+        "size": output_size,
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if duplicates is not None:
+        METRICS.count("duplicate_documents", duplicates.stats["duplicate_documents"])
+        METRICS.count("duplicate_pages", duplicates.stats["duplicate_pages"])
+        stats["dedup"] = dict(duplicates.stats)
+    
+    print(f"\n✅ 增量合并完成！输出文件: {output_file}")
+    print(f"新增: {added_files} 个文件，{added_pages} 页（共 {total_pages} 页）")
+    print(f"追加 {stats['appended'] / 1024:.1f} KB，原有 {original_size / 1024:.1f} KB 未改写"
+          f"（去重 {writer.duplicates} 个对象），用时 {stats['seconds']:.2f} 秒")
+    if removed or any(path in previous for path in (entry["path"] for _, entry in pending)):
+        print("⚠ 已删除或变化的文件不再出现在页面树中，但旧内容仍占用空间；"
+              "需要压缩时删除输出文件后重新合并")
+    if duplicates is not None:
+        print(duplicates.summary())
+    if stats["peak_rss_mb"] is not None:
+        print(f"峰值内存: {stats['peak_rss_mb']:.1f} MB")
+    
+    return stats
+
+
+def main(argv=None, prog=None):
     import argparse
     
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="合并 PDF 文件",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -61,6 +357,9 @@ def main():
   python merge_pdfs.py "*.pdf" -o combined.pdf
   python merge_pdfs.py "doc*.pdf" -o merged.pdf
   python merge_pdfs.py "report_*.pdf" -o final_report.pdf
+  python merge_pdfs.py "scans/*.pdf" -o all.pdf -q --metrics merge.prom
+  python merge_pdfs.py "inbox/*.pdf" -o merged.pdf --dedup
+  python merge_pdfs.py "archive/*.pdf" -o combined.pdf --incremental
         """
     )
     
@@ -75,9 +374,49 @@ def main():
         help="输出文件名 (默认: merged.pdf)"
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="不对相同资源去重"
+    )
+    
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="跳过重复或近似重复的文档，省略重复的页面"
+    )
+    
+    parser.add_argument(
+        "--dedup-db",
+        help="指纹索引文件，与以往运行一起去重（隐含 --dedup）"
+    )
+    
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="只把新增或变化的文件以增量更新追加到已有输出（清单保存在 <输出>.manifest.json）"
+    )
+    
+    add_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    
+    duplicates = cache = None
+    if args.dedup or args.dedup_db:
+        from pdf_cache import PageCache
+        from pdf_dedup import Deduplicator
+        
+        duplicates = Deduplicator(args.dedup_db)
+        cache = PageCache()
     
-    merge_pdfs(args.pattern, args.output)
+    try:
+        with instrument("merge_pdfs", args):
+            merge_pdfs(args.pattern, args.output, dedup=not args.no_dedup, duplicates=duplicates, cache=cache,
+                       incremental=args.incremental)
+    finally:
+        if duplicates is not None:
+            duplicates.close()
+            cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步 PDF 提取流水线
+读取、解析、写出三个阶段之间用有界 asyncio 队列连接：读取与写出在线程中
+完成，解析在进程池中完成，I/O 与解析相互重叠而不阻塞事件循环。
+
+- 背压：任一队列满时上游阶段等待，submit() 也会等待，内存中的文档数有上限
+- 超时：单个文档解析超时后记为 timeout；工作进程卡死时回收整个进程池，
+  受影响的其他文档自动重试
+- 取消：取消流水线时未完成的文档记为 cancelled，工作进程立即终止
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PIPELINE_OPERATIONS = ("text", "tables")
+
+DEFAULT_QUEUE_SIZE = 4
+DEFAULT_TIMEOUT = 300
+
+# 读取与写出阶段的并发数（线程）
+READERS = 2
+WRITERS = 2
+
+# 软超时后再等待的秒数；仍未返回说明工作进程卡在无法中断的代码中，回收进程池
+HARD_TIMEOUT_GRACE = 10
+
+# 进程池崩溃或被回收时，同一文档最多尝试的次数
+MAX_ATTEMPTS = 3
+
+_DONE = object()
+
+
+class DocumentTimeout(BaseException):
+    """文档解析超时；继承 BaseException，避免被解析库中宽泛的 except Exception 吞掉"""
+
+
+def _raise_timeout(signum, frame):
+    raise DocumentTimeout()
+
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """在工作进程中用 SIGALRM 中断超时的解析（不支持的平台上只依赖硬超时）"""
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _table_sheets(page_tables, concat=False):
+    """与 extract_tables_from_pdf 相同的工作表划分：逐表一页，或按表头合并"""
+    from extract_tables import group_tables
+
+    if concat:
+        return [(f"Group{group_idx}", group["data"]) for group_idx, group in enumerate(group_tables(page_tables), 1)]
+
+    import pandas as pd
+
+    sheets = []
+    for page_idx, tables in page_tables:
+        for table_idx, table in enumerate(tables or []):
+            if table:
+                sheets.append((f"Page{page_idx + 1}_Table{table_idx + 1}", pd.DataFrame(table[1:], columns=table[0])))
+    return sheets
+
+
+def parse_document(operation, data, options=None, timeout=None):
+    """
+    工作进程任务：从内存中的 PDF 提取文本或表格
+
+    Args:
+        operation: text 或 tables
+        data: PDF 文件内容
+        options: text 传给 iter_text_from_pdf；tables 支持 prefilter 与 concat
+        timeout: 软超时（秒）
+
+    Returns:
+        (结果, {"stages", "counters"})；text 的结果为完整文本，tables 为 [(名称, DataFrame), ...]
+    """
+    from pdf_metrics import METRICS, set_quiet
+
+    set_quiet(True)
+    METRICS.reset(operation)
+    options = dict(options or {})
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), _time_limit(timeout):
+        if operation == "text":
+            from extract_text import iter_text_from_pdf
+
+            options.pop("log", None)
+            result = "\n".join(iter_text_from_pdf(io.BytesIO(data), log=lambda *args: None, **options))
+        else:
+            from extract_tables import iter_page_tables
+
+            page_tables = iter_page_tables(io.BytesIO(data), prefilter=options.get("prefilter", True))
+            result = _table_sheets(page_tables, options.get("concat", False))
+    return result, {"stages": METRICS.stage_summary(), "counters": dict(METRICS.counters)}
+
+
+def _read_document(input_file):
+    with open(input_file, "rb") as f:
+        data = f.read()
+    if b"%PDF-" not in data[:1024]:
+        raise ValueError("不是 PDF 文件")
+    return data
+
+
+def _write_result(operation, result, output_file, options):
+    """写出一个文档的结果"""
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if operation == "text":
+        # 先写临时文件，取消或出错时不会留下不完整的输出
+        tmp_path = f"{output_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(result)
+        os.replace(tmp_path, output_file)
+        return
+
+    from extract_tables import OUTPUT_FORMATS, write_tables
+
+    if result:
+        output_format = os.path.splitext(output_file)[1].lstrip(".").lower()
+        if output_format not in OUTPUT_FORMATS:
+            output_format = "xlsx"
+        write_tables(result, output_file, options.get("output_format") or output_format)
+
+
+def _kill_executor(executor):
+    """立即终止进程池中的所有工作进程（包括卡死的进程）"""
+    # ProcessPoolExecutor 没有公开终止单个工作进程的接口
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+
+
+class PdfPipeline:
+    """
+    有界队列连接的异步提取流水线
+
+    用法:
+        async with PdfPipeline("text", workers=4, timeout=60) as pipeline:
+            async for input_file, output_file in incoming():
+                await pipeline.submit(input_file, output_file)   # 队列满时等待
+        print(pipeline.records)
+
+    正常退出 async with 时等待所有已提交文档完成；因异常或取消退出时
+    终止工作进程，未完成的文档记为 cancelled。
+
+    Args:
+        operation: text 或 tables
+        workers: 解析进程数（默认: CPU 核数）
+        queue_size: 各阶段之间队列的容量
+        timeout: 单个文档的解析超时（秒），None 表示不限
+        options: 传给提取函数的默认参数
+        on_record: 每个文档完成时的回调，参数为状态字典
+        max_tasks_per_child: 每个解析进程处理多少个文档后重建（可选，用于限制内存增长）
+    """
+
+    def __init__(self, operation="text", workers=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 timeout=DEFAULT_TIMEOUT, options=None, on_record=None, max_tasks_per_child=None):
+        if operation not in PIPELINE_OPERATIONS:
+            raise ValueError(f"不支持的操作: {operation}")
+        self.operation = operation
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.options = options or {}
+        self.on_record = on_record
+        self.max_tasks_per_child = max_tasks_per_child
+        self.records = []
+        self.recycled = 0
+        self._pending = {}
+        self._executor = None
+        self._generation = 0
+        self._main = None
+
+    # ---- 生命周期 ----
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.cancel()
+
+    def start(self):
+        self._executor = self._new_executor()
+        self._intake = asyncio.Queue(self.queue_size)
+        self._parse_queue = asyncio.Queue(self.queue_size)
+        self._write_queue = asyncio.Queue(self.queue_size)
+        self._closed = False
+        self._main = asyncio.ensure_future(asyncio.gather(
+            self._run_stage(self._read, self._intake, self._parse_queue, READERS, self.workers),
+            self._run_stage(self._parse, self._parse_queue, self._write_queue, self.workers, WRITERS),
+            self._run_stage(self._write, self._write_queue, None, WRITERS, 0),
+        ))
+
+    async def submit(self, input_file, output_file, options=None):
+        """提交一个文档；读取队列已满时等待（背压）"""
+        if self._main is None or self._closed:
+            raise RuntimeError("流水线未启动或已关闭")
+        job = {
+            "input": input_file,
+            "output": output_file,
+            "options": {**self.options, **(options or {})},
+            "start": time.perf_counter(),
+            "stages": {},
+        }
+        self._pending[id(job)] = job
+        await self._intake.put(job)
+
+    async def close(self):
+        """不再接收新文档，等待已提交的文档全部完成"""
+        if not self._closed:
+            self._closed = True
+            for _ in range(READERS):
+                await self._intake.put(_DONE)
+        try:
+            await self._main
+        except asyncio.CancelledError:
+            # 等待期间被取消：按取消处理剩余文档
+            await self.cancel()
+            raise
+        self._executor.shutdown(wait=True)
+
+    async def cancel(self):
+        """立即停止：取消各阶段，终止工作进程，未完成的文档记为 cancelled"""
+        self._closed = True
+        self._main.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._main
+        _kill_executor(self._executor)
+        for job in list(self._pending.values()):
+            self._finish(job, "cancelled", "流水线已取消")
+
+    # ---- 阶段 ----
+
+    async def _run_stage(self, handler, inbox, outbox, concurrency, downstream):
+        """运行一个阶段的 concurrency 个消费者；全部结束后通知下游阶段结束"""
+        async def consume():
+            while True:
+                job = await inbox.get()
+                if job is _DONE:
+                    return
+                if await handler(job) and outbox is not None:
+                    # 下游队列满时在此等待，背压逐级传递到 submit()
+                    await outbox.put(job)
+
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
+        for _ in range(downstream):
+            await outbox.put(_DONE)
+
+    async def _read(self, job):
+        start = time.perf_counter()
+        try:
+            job["data"] = await asyncio.to_thread(_read_document, job["input"])
+        except (OSError, ValueError) as e:
+            self._finish(job, "error", f"{type(e).__name__}: {e}")
+            return False
+        job["stages"]["read"] = round(time.perf_counter() - start, 4)
+        return True
+
+    async def _parse(self, job):
+        data = job.pop("data")
+        start = time.perf_counter()
+        hard_timeout = self.timeout + HARD_TIMEOUT_GRACE if self.timeout else None
+        for _ in range(MAX_ATTEMPTS):
+            generation = self._generation
+            try:
+                future = self._executor.submit(parse_document, self.operation, data, job["options"], self.timeout)
+                job["result"], job["worker_metrics"] = await asyncio.wait_for(
+                    asyncio.wrap_future(future), hard_timeout
+                )
+            except asyncio.TimeoutError:
+                # 工作进程没有响应软超时，只能回收进程池
+                self._recycle(generation)
+                self._finish(job, "timeout", f"解析超过 {self.timeout}s 未返回，已回收工作进程")
+                return False
+            except DocumentTimeout:
+                self._finish(job, "timeout", f"解析超过 {self.timeout}s")
+                return False
+            except BrokenProcessPool:
+                # 可能是其他文档导致的崩溃或回收，在新进程池中重试
+                self._recycle(generation)
+                continue
+            except Exception as e:
+                self._finish(job, "error", f"{type(e).__name__}: {e}")
+                return False
+            job["stages"]["parse"] = round(time.perf_counter() - start, 4)
+            return True
+        self._finish(job, "error", "工作进程异常退出")
+        return False
+
+    async def _write(self, job):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(
+                _write_result, self.operation, job["result"], job["output"], job["options"]
+            )
+        except Exception as e:
+            self._finish(job, "error", f"{type(e).__name__}: {e}")
+            return False
+        job["stages"]["write"] = round(time.perf_counter() - start, 4)
+        self._finish(job, "ok")
+        return True
+
+    # ---- 内部 ----
+
+    def _new_executor(self):
+        if self.max_tasks_per_child:
+            return ProcessPoolExecutor(max_workers=self.workers, max_tasks_per_child=self.max_tasks_per_child)
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _recycle(self, generation):
+        """终止并重建进程池；同一代进程池只回收一次"""
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self.recycled += 1
+        old = self._executor
+        self._executor = self._new_executor()
+        _kill_executor(old)
+
+    def _finish(self, job, status, error=None):
+        if self._pending.pop(id(job), None) is None:
+            return
+        record = {
+            "input": job["input"],
+            "output": job["output"],
+            "status": status,
+            "elapsed": round(time.perf_counter() - job["start"], 4),
+            "stages": job["stages"],
+        }
+        if status == "ok":
+            worker_metrics = job["worker_metrics"]
+            # 与 batch_pdf 一致：text 记录有文本的页数，tables 记录表格数
+            if self.operation == "text":
+                record["result"] = worker_metrics["counters"].get("pages_with_text", 0)
+            else:
+                record["result"] = len(job["result"])
+            record["worker_stages"] = worker_metrics["stages"]
+        if error:
+            record["error"] = error
+        self.records.append(record)
+        if self.on_record:
+            self.on_record(record)
+
+
+async def run_pipeline(operation, jobs, **kwargs):
+    """
+    用流水线处理一组文档
+
+    Args:
+        operation: text 或 tables
+        jobs: 可迭代或异步可迭代的 {"input", "output", "options"（可选）}
+        **kwargs: 传给 PdfPipeline
+
+    Returns:
+        PdfPipeline（records 为各文档的状态）
+    """
+    async with PdfPipeline(operation, **kwargs) as pipeline:
+        if hasattr(jobs, "__aiter__"):
+            async for job in jobs:
+                await pipeline.submit(job["input"], job["output"], job.get("options"))
+        else:
+            for job in jobs:
+                await pipeline.submit(job["input"], job["output"], job.get("options"))
+    return pipeline
+
+
+def main():
+    from batch_pdf import collect_inputs, parse_options, plan_jobs
+
+    parser = argparse.ArgumentParser(
+        description="异步流水线批量提取 PDF 文本或表格",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python pdf_async.py text inputs/ -o out/
+  python pdf_async.py tables "reports/**/*.pdf" -o out/ -w 8 --timeout 60
+  python pdf_async.py text inputs/ -o out/ --queue-size 2 --max-tasks-per-child 50
+        """
+    )
+
+    parser.add_argument(
+        "operation",
+        choices=PIPELINE_OPERATIONS,
+        help="要执行的操作"
+    )
+
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="输入目录或通配符"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        default="pipeline_output",
+        help="输出目录（默认: pipeline_output）"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="解析进程数（默认: CPU 核数）"
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"各阶段之间队列的容量（默认: {DEFAULT_QUEUE_SIZE}）"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"单个文档的解析超时秒数，0 表示不限（默认: {DEFAULT_TIMEOUT}）"
+    )
+
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        help="每个解析进程处理多少个文档后重建"
+    )
+
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="传给提取函数的参数，值按 JSON 解析（可重复）"
+    )
+
+    parser.add_argument(
+        "--summary",
+        help="汇总 JSON 文件（默认: 输出目录/pipeline_summary.json）"
+    )
+
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = plan_jobs(collect_inputs(args.sources, args.operation), [], args.operation, args.output, {})
+    if not jobs:
+        print("未找到需要处理的文件")
+        return 1
+    print(f"找到 {len(jobs)} 个文档，操作: {args.operation}")
+
+    def on_record(record):
+        if record["status"] == "ok":
+            print(f"✓ {record['input']} ({record['elapsed']:.2f}s)")
+        else:
+            print(f"✗ {record['input']}: [{record['status']}] {record['error']}")
+
+    start = time.perf_counter()
+    pipeline = asyncio.run(run_pipeline(
+        args.operation, jobs,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        timeout=args.timeout or None,
+        options=parse_options(args.option),
+        on_record=on_record,
+        max_tasks_per_child=args.max_tasks_per_child,
+    ))
+
+    order = {job["input"]: idx for idx, job in enumerate(jobs)}
+    records = sorted(pipeline.records, key=lambda record: order[record["input"]])
+    failed = sum(1 for record in records if record["status"] != "ok")
+    summary = {
+        "operation": args.operation,
+        "workers": pipeline.workers,
+        "total": len(records),
+        "ok": len(records) - failed,
+        "failed": failed,
+        "recycled_pools": pipeline.recycled,
+        "elapsed": round(time.perf_counter() - start, 4),
+        "files": records,
+    }
+    summary_file = args.summary or os.path.join(args.output, "pipeline_summary.json")
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"共处理 {summary['total']} 个，成功 {summary['ok']} 个，失败 {failed} 个，"
+          f"耗时 {summary['elapsed']:.2f}s")
+    if pipeline.recycled:
+        print(f"⚠ 进程池因超时或崩溃回收 {pipeline.recycled} 次")
+    print(f"汇总已保存到: {summary_file}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
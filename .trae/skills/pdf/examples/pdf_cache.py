@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 提取结果缓存
+按文件内容哈希 + 页码 + 提取器版本 + 选项缓存逐页结果，存储在 SQLite 中，
+超过容量上限时按最近最少使用（LRU）淘汰。
+
+除了以文件哈希为键的快速路径，每页还以"页面指纹"（内容流与所引用资源的
+内容哈希）为键再存一份。文件追加了页面或被增量更新后，文件哈希虽然变了，
+未改动页面的指纹不变，仍可直接命中缓存，只有新页面需要重新提取。
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# 缓存格式或页面指纹算法变化时递增，使旧条目自然失效
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir():
+    """默认缓存目录，遵循 XDG_CACHE_HOME"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdf-skill")
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageFingerprinter:
+    """
+    计算 pdfminer 页面的内容指纹
+
+    指纹覆盖页面尺寸、旋转、解码后的内容流，以及递归解析后的资源字典
+    （字体、Form XObject 等）。对象编号不参与计算，因此同一页面在重写后的
+    文件中仍得到相同指纹。默认图像只计入尺寸等属性，不读取像素数据；
+    结果依赖像素（如判定页面完全相同）时传入 image_data=True，图像的
+    原始流数据也参与计算。
+
+    Args:
+        image_data: 是否计入图像流数据（默认: 否）
+    """
+
+    def __init__(self, image_data=False):
+        self.image_data = image_data
+        self._memo = {}
+
+    def page(self, page_obj):
+        digest = hashlib.sha256()
+        digest.update(repr((page_obj.mediabox, page_obj.rotate)).encode())
+        for stream in page_obj.contents:
+            digest.update(self._stream_data(stream))
+        digest.update(self._hash_obj(page_obj.resources, depth=0).encode())
+        return digest.hexdigest()
+
+    def _stream_data(self, stream):
+        from pdfminer.pdftypes import resolve1
+
+        stream = resolve1(stream)
+        try:
+            return stream.get_data()
+        except Exception:
+            return repr(stream.attrs).encode()
+
+    def _hash_obj(self, obj, depth):
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        from pdfminer.psparser import LIT
+
+        if depth > 12:
+            return "..."
+        if isinstance(obj, PDFObjRef):
+            key = obj.objid
+            if key not in self._memo:
+                # 先占位，防止循环引用无限递归
+                self._memo[key] = "cycle"
+                self._memo[key] = self._hash_obj(obj.resolve(), depth + 1)
+            return self._memo[key]
+        if isinstance(obj, PDFStream):
+            attrs = self._hash_obj(obj.attrs, depth + 1)
+            if obj.attrs.get("Subtype") is LIT("Image"):
+                digest = hashlib.sha256(attrs.encode())
+                if self.image_data:
+                    # 未解码的原始数据即可区分图像，省去解压
+                    data = obj.get_rawdata()
+                    digest.update(data if data is not None else self._stream_data(obj))
+                return digest.hexdigest()
+            digest = hashlib.sha256(attrs.encode())
+            digest.update(self._stream_data(obj))
+            return digest.hexdigest()
+        if isinstance(obj, dict):
+            items = sorted((str(k), self._hash_obj(v, depth + 1)) for k, v in obj.items())
+            return hashlib.sha256(repr(items).encode()).hexdigest()
+        if isinstance(obj, (list, tuple)):
+            return hashlib.sha256(repr([self._hash_obj(v, depth + 1) for v in obj]).encode()).hexdigest()
+        return repr(obj)
+
+
+class PageCache:
+    """
+    基于 SQLite 的逐页结果缓存
+
+    Args:
+        cache_dir: 缓存目录（默认: ~/.cache/pdf-skill）
+        max_bytes: 缓存容量上限（字节）
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "cache.sqlite"), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                atime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_atime ON entries(atime);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta VALUES ('total_size', 0);
+        """)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def file_hash(self, path):
+        """文件内容哈希；大小与修改时间未变时直接复用上次的结果"""
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (abs_path,)
+        ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        sha256 = hash_file(path)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (abs_path, stat.st_size, stat.st_mtime_ns, sha256),
+            )
+        return sha256
+
+    @staticmethod
+    def make_key(namespace, content_id, page_idx, extractor, options=None):
+        """
+        组装缓存键
+
+        Args:
+            namespace: "doc"（文件哈希）或 "page"（页面指纹）
+            content_id: 文件哈希或页面指纹
+            page_idx: 页码（0 起始），页面指纹键传 None
+            extractor: 提取器名称与版本
+            options: 影响结果的提取选项
+        """
+        opts = json.dumps(options or {}, sort_keys=True, ensure_ascii=False)
+        return f"v{CACHE_FORMAT_VERSION}:{namespace}:{content_id}:{page_idx}:{extractor}:{opts}"
+
+    def contains(self, keys):
+        """返回 keys 中已缓存的键集合"""
+        found = set()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key FROM entries WHERE key IN ({placeholders})", chunk
+            )
+            found.update(row[0] for row in rows)
+        return found
+
+    def get(self, key):
+        """读取缓存值，未命中返回 None"""
+        row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._conn:
+            self._conn.execute("UPDATE entries SET atime = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """写入缓存值（需可 JSON 序列化），超出容量时淘汰最久未使用的条目"""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8")) + len(key)
+        with self._conn:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._conn.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'total_size'",
+                (size - (old[0] if old else 0),),
+            )
+        self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 一次淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = self.max_bytes * 0.9
+        with self._conn:
+            rows = self._conn.execute("SELECT key, size FROM entries ORDER BY atime")
+            victims = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+            self._conn.execute("UPDATE meta SET value = ? WHERE name = 'total_size'", (total,))
+
+
+class DocumentCache:
+    """
+    单个文档的逐页缓存视图
+
+    先按文件哈希查找，未命中时再按页面指纹查找；写入时两种键各存一份。
+    """
+
+    def __init__(self, cache, input_file, extractor, options=None):
+        self.cache = cache
+        self.extractor = extractor
+        self.options = options
+        self.file_hash = cache.file_hash(input_file)
+        self.by_fingerprint = True
+        self._fingerprinter = PageFingerprinter()
+        self._fingerprints = {}
+
+    def derive(self, extractor, options=None, cache=None, by_fingerprint=True):
+        """
+        同一文档另一种提取结果的缓存视图，共用文件哈希与已算出的页面指纹
+
+        页面指纹不含图像像素，渲染图、OCR 文本等依赖像素的结果应传入
+        by_fingerprint=False，只按文件哈希读写。cache 指定时视图改用另一个
+        PageCache（如单独限额的渲染图缓存）。
+        """
+        view = copy.copy(self)
+        view.extractor = extractor
+        view.options = options
+        view.by_fingerprint = by_fingerprint
+        if cache is not None:
+            view.cache = cache
+        return view
+
+    def _doc_key(self, page_idx):
+        return PageCache.make_key("doc", self.file_hash, page_idx, self.extractor, self.options)
+
+    def _page_key(self, fingerprint):
+        return PageCache.make_key("page", fingerprint, None, self.extractor, self.options)
+
+    def page_count(self):
+        """已缓存的文档页数，未知时返回 None"""
+        return self.cache.get(PageCache.make_key("doc", self.file_hash, "count", "pdf"))
+
+    def set_page_count(self, count):
+        self.cache.put(PageCache.make_key("doc", self.file_hash, "count", "pdf"), count)
+
+    def cached_pages(self, page_indices):
+        """按文件哈希快速判断哪些页已有缓存（无需打开 PDF）"""
+        keys = {self._doc_key(idx): idx for idx in page_indices}
+        return {keys[key] for key in self.cache.contains(keys)}
+
+    def resolve_by_fingerprint(self, pdf, page_indices):
+        """
+        对文件哈希未命中的页面计算指纹并查找缓存，命中的结果回填到文件哈希键
+
+        Returns:
+            仍需提取的页码列表
+        """
+        if not self.by_fingerprint:
+            return list(page_indices)
+        remaining = []
+        for page_idx in page_indices:
+            fingerprint = self._fingerprints.get(page_idx)
+            if fingerprint is None:
+                fingerprint = self._fingerprinter.page(pdf.pages[page_idx].page_obj)
+                self._fingerprints[page_idx] = fingerprint
+            value = self.cache.get(self._page_key(fingerprint))
+            if value is None:
+                remaining.append(page_idx)
+            else:
+                self.cache.put(self._doc_key(page_idx), value)
+        return remaining
+
+    def get(self, page_idx):
+        return self.cache.get(self._doc_key(page_idx))
+
+    def put(self, page_idx, value):
+        self.cache.put(self._doc_key(page_idx), value)
+        fingerprint = self._fingerprints.get(page_idx)
+        if fingerprint is not None and self.by_fingerprint:
+            self.cache.put(self._page_key(fingerprint), value)
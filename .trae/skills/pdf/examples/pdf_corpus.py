@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成 PDF 语料生成器
+用 reportlab 生成内容确定、字节可复现的测试 PDF，供基准测试使用：
+纯文本、表格密集、图片密集与中文（CJK）四类，页数任意。
+"""
+
+import argparse
+import io
+import os
+import random
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+CORPUS_KINDS = ("prose", "tables", "images", "cjk")
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+# 图片页从固定数量的图片中轮换取用，相同图片只嵌入一次
+IMAGE_VARIANTS = 16
+
+CJK_TEXT = (
+    "本季度营业收入同比增长百分之十二，主要来自华东与华南地区的新客户。"
+    "毛利率保持稳定，研发投入继续增加，预计下一季度将推出两款新产品。"
+    "管理层认为市场需求依然旺盛，但原材料价格波动带来一定的不确定性。"
+)
+
+
+def _draw_prose(c, page_idx, rng, lines_per_page=40):
+    width, height = A4
+    y = height - 50
+    for line_idx in range(lines_per_page):
+        c.drawString(50, y, f"Page {page_idx + 1} line {line_idx + 1}: "
+                            f"The quick brown fox jumps over the lazy dog {page_idx * line_idx}")
+        y -= 18
+
+
+def _draw_tables(c, page_idx, rng, rows=12, cols=5):
+    """每页两个带完整边框的表格，表头固定，便于跨页按表头合并"""
+    width, height = A4
+    col_width = (width - 100) / cols
+    row_height = 18
+    headers = ["Region", "Product", "Date", "Units", "Revenue"]
+    top = height - 60
+    for table_idx in range(2):
+        left = 50
+        for row_idx in range(rows + 1):
+            y = top - row_idx * row_height
+            for col_idx in range(cols):
+                x = left + col_idx * col_width
+                if row_idx == 0:
+                    text = headers[col_idx]
+                elif col_idx == 0:
+                    text = rng.choice(("North", "South", "East", "West"))
+                elif col_idx == 1:
+                    text = f"SKU-{rng.randint(100, 999)}"
+                elif col_idx == 2:
+                    text = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                elif col_idx == 3:
+                    text = str(rng.randint(1, 500))
+                else:
+                    text = f"{rng.randint(1000, 99999):,}.{rng.randint(0, 99):02d}"
+                c.drawString(x + 4, y - 13, text)
+        # 网格线
+        bottom = top - (rows + 1) * row_height
+        for row_idx in range(rows + 2):
+            y = top - row_idx * row_height
+            c.line(left, y, left + cols * col_width, y)
+        for col_idx in range(cols + 1):
+            x = left + col_idx * col_width
+            c.line(x, top, x, bottom)
+        top = bottom - 60
+    c.drawString(50, 40, f"Page {page_idx + 1}")
+
+
+def _make_image(seed, size=(320, 240)):
+    """确定性的渐变加噪点图片（PNG）"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient("L")
+    noise = Image.frombytes("L", size, rng.randbytes(size[0] * size[1]))
+    channels = [
+        Image.blend(gradient.rotate(rng.choice((0, 90, 180, 270))).resize(size), noise, rng.uniform(0.1, 0.4))
+        for _ in range(3)
+    ]
+    image = Image.merge("RGB", channels)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    buf.seek(0)
+    return ImageReader(buf)
+
+
+def _draw_images(c, page_idx, rng, images):
+    width, height = A4
+    c.drawString(50, height - 50, f"Page {page_idx + 1} photo report")
+    for slot in range(4):
+        image = images[(page_idx * 4 + slot) % len(images)]
+        x = 50 + (slot % 2) * 260
+        y = height - 320 - (slot // 2) * 250
+        c.drawImage(image, x, y, width=240, height=180)
+        c.drawString(x, y - 14, f"Figure {page_idx + 1}.{slot + 1}")
+
+
+def _draw_cjk(c, page_idx, rng, lines_per_page=30):
+    width, height = A4
+    c.setFont("STSong-Light", 12)
+    y = height - 50
+    for line_idx in range(lines_per_page):
+        offset = rng.randint(0, len(CJK_TEXT) - 30)
+        c.drawString(50, y, f"第{page_idx + 1}页 第{line_idx + 1}行：{CJK_TEXT[offset:offset + 28]}")
+        y -= 20
+
+
+def make_corpus_pdf(output_file, kind, num_pages, seed=0):
+    """
+    生成一个合成 PDF；相同参数生成的文件字节完全相同
+
+    Args:
+        output_file: 输出文件
+        kind: prose、tables、images 或 cjk
+        num_pages: 页数
+        seed: 随机种子
+    """
+    if kind not in CORPUS_KINDS:
+        raise ValueError(f"未知的语料类型: {kind}")
+    rng = random.Random(f"{kind}-{seed}")
+    # invariant 固定创建时间与文档 ID，保证输出可复现
+    c = canvas.Canvas(output_file, pagesize=A4, invariant=1)
+
+    images = None
+    if kind == "images":
+        images = [_make_image(f"{seed}-{idx}") for idx in range(IMAGE_VARIANTS)]
+    elif kind == "cjk":
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
+
+    for page_idx in range(num_pages):
+        if kind == "prose":
+            _draw_prose(c, page_idx, rng)
+        elif kind == "tables":
+            _draw_tables(c, page_idx, rng)
+        elif kind == "images":
+            _draw_images(c, page_idx, rng, images)
+        else:
+            _draw_cjk(c, page_idx, rng)
+        c.showPage()
+    c.save()
+
+
+def corpus_path(corpus_dir, kind, num_pages):
+    return os.path.join(corpus_dir, f"{kind}_{num_pages}.pdf")
+
+
+def generate_corpus(corpus_dir, kinds=CORPUS_KINDS, sizes=DEFAULT_SIZES, seed=0, log=print):
+    """
+    生成语料目录，已存在的文件直接复用
+
+    Returns:
+        {(kind, num_pages): 文件路径}
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    files = {}
+    for kind in kinds:
+        for num_pages in sizes:
+            path = corpus_path(corpus_dir, kind, num_pages)
+            if not os.path.exists(path):
+                # 先写临时文件，中断时不会留下不完整的语料
+                tmp_path = path + ".tmp"
+                make_corpus_pdf(tmp_path, kind, num_pages, seed)
+                os.replace(tmp_path, path)
+                log(f"✓ 已生成: {path}")
+            files[(kind, num_pages)] = path
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="生成合成 PDF 语料",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python pdf_corpus.py corpus/
+  python pdf_corpus.py corpus/ --kinds prose cjk --sizes 10 10000
+        """
+    )
+    parser.add_argument("output", help="语料目录")
+    parser.add_argument("--kinds", nargs="+", choices=CORPUS_KINDS, default=list(CORPUS_KINDS),
+                        help="语料类型（默认: 全部）")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="页数列表（默认: 10 100 1000）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（默认: 0）")
+    args = parser.parse_args()
+
+    generate_corpus(args.output, args.kinds, args.sizes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
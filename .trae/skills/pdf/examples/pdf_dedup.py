@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 近似重复检测
+为每页计算两种指纹：内容流指纹（见 pdf_cache.PageFingerprinter，完全相同的
+页面指纹相同）与提取文本的 MinHash 签名（文本相近的页面签名相近）。文档的
+MinHash 签名由各页签名逐位取最小值得到，等价于对全文计算。
+
+签名按 LSH 分段（band）写入 SQLite：两个签名只要有一段完全相同即成为候选，
+再用完整签名估计 Jaccard 相似度，达到阈值才判定为重复。因此查找只需
+几次索引查询，与已登记的文档数量无关。索引可以保存在文件中，跨批次识别
+重复投递的文档。
+"""
+
+import argparse
+import array
+import glob
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+
+from pdf_cache import PageFingerprinter, hash_file
+
+# 签名长度 = BANDS * ROWS；相似度约为 (1/BANDS)^(1/ROWS) ≈ 0.5 时开始成为候选
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.85
+
+MASK64 = (1 << 64) - 1
+_rng = random.Random(0x5EED)
+# (a * x + b) mod 2^64，a 为奇数时是 64 位整数上的一个置换
+PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_PERM)]
+
+
+def normalize(text):
+    """忽略大小写与空白的差异；数字保留，只有数字不同的表格页面不视为重复"""
+    return " ".join(text.lower().split())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """字符 n-gram 集合（对中文与英文同样适用），每个 n-gram 哈希为 64 位整数"""
+    text = normalize(text)
+    if not text:
+        return set()
+    grams = {text[idx:idx + size] for idx in range(max(1, len(text) - size + 1))}
+    return {int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little") for gram in grams}
+
+
+def minhash(text):
+    """文本的 MinHash 签名，没有文本时返回 None"""
+    values = shingles(text)
+    if not values:
+        return None
+    try:
+        import numpy as np
+    except ImportError:
+        return tuple(min((a * value + b) & MASK64 for value in values) for a, b in PERMUTATIONS)
+    # numpy 的 uint64 乘加按 2^64 回绕，结果与纯 Python 分支一致
+    hashes = np.fromiter(values, dtype=np.uint64, count=len(values))
+    a = np.array([a for a, _ in PERMUTATIONS], dtype=np.uint64)[:, None]
+    b = np.array([b for _, b in PERMUTATIONS], dtype=np.uint64)[:, None]
+    return tuple((hashes[None, :] * a + b).min(axis=1).tolist())
+
+
+def combine(signatures):
+    """多页签名合并为文档签名（逐位取最小值）"""
+    signatures = [signature for signature in signatures if signature]
+    if not signatures:
+        return None
+    return tuple(map(min, zip(*signatures)))
+
+
+def similarity(sig_a, sig_b):
+    """按相同位置的比例估计 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def _band_hashes(signature):
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(chunk).encode(), digest_size=8).digest()
+        yield band, int.from_bytes(digest, "little", signed=True)
+
+
+def fingerprint_pdf(input_file, page_numbers=None, cache=None, workers=1):
+    """
+    计算 PDF 的文件哈希、逐页指纹与文档签名
+
+    文本经 extract_text 的提取路径获得，启用缓存时结果写入缓存，随后的
+    正式提取全部命中缓存，不会重复解析。
+
+    Returns:
+        {"sha256", "pages": [{"page", "exact", "signature", "chars"}, ...], "signature"}
+    """
+    from extract_text import _open_pdfplumber, iter_text_from_pdf
+
+    texts = {}
+    for _ in iter_text_from_pdf(input_file, page_numbers, workers, log=lambda *args: None,
+                                cache=cache, on_page=texts.__setitem__):
+        pass
+
+    # 完全相同的判定必须覆盖图像数据，否则内容流相同的不同扫描页会被误判
+    fingerprinter = PageFingerprinter(image_data=True)
+    pages = []
+    with _open_pdfplumber(input_file) as pdf:
+        total_pages = len(pdf.pages)
+        if page_numbers:
+            page_indices = [p - 1 for p in page_numbers if 1 <= p <= total_pages]
+        else:
+            page_indices = range(total_pages)
+        for page_idx in page_indices:
+            text = texts.get(page_idx, "")
+            pages.append({
+                "page": page_idx,
+                "exact": fingerprinter.page(pdf.pages[page_idx].page_obj),
+                "signature": minhash(text),
+                "chars": len(text),
+            })
+    return {
+        "sha256": hash_file(input_file),
+        "pages": pages,
+        "signature": combine(page["signature"] for page in pages),
+    }
+
+
+class Deduplicator:
+    """
+    文档与页面的重复检测，并统计检测到的重复内容
+
+    检测本身需要提取文本计算签名，统计的是从输出中省略的重复内容，
+    而不是省去的提取工作。
+
+    Args:
+        path: 指纹索引文件（默认只保存在内存中，仅在本次运行内去重）
+        threshold: 判定为近似重复的相似度下限
+    """
+
+    def __init__(self, path=None, threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                doc TEXT NOT NULL,
+                page INTEGER,
+                exact TEXT NOT NULL,
+                signature BLOB
+            );
+            CREATE INDEX IF NOT EXISTS items_exact ON items (kind, exact);
+            CREATE INDEX IF NOT EXISTS items_doc ON items (doc);
+            CREATE TABLE IF NOT EXISTS bands (
+                kind TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                item_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands (kind, band, bucket);
+            CREATE INDEX IF NOT EXISTS bands_item ON bands (item_id);
+        """)
+        self.stats = {
+            "documents": 0,
+            "duplicate_documents": 0,
+            "pages": 0,
+            "duplicate_pages": 0,
+            "duplicate_content_pages": 0,
+            "duplicate_chars": 0,
+            "duplicate_bytes": 0,
+        }
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _find(self, kind, exact, signature):
+        """返回 (文档, 页码, 相似度)，未找到返回 None；内容指纹相同时相似度为 None"""
+        row = self._conn.execute(
+            "SELECT doc, page FROM items WHERE kind = ? AND exact = ? LIMIT 1", (kind, exact)
+        ).fetchone()
+        if row:
+            return row[0], row[1], None
+        if signature is None:
+            return None
+        candidates = set()
+        for band, bucket in _band_hashes(signature):
+            candidates.update(item_id for item_id, in self._conn.execute(
+                "SELECT item_id FROM bands WHERE kind = ? AND band = ? AND bucket = ?", (kind, band, bucket)
+            ))
+        best = None
+        for item_id in candidates:
+            doc, page, blob = self._conn.execute(
+                "SELECT doc, page, signature FROM items WHERE id = ?", (item_id,)
+            ).fetchone()
+            score = similarity(signature, array.array("Q", blob))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (doc, page, score)
+        return best
+
+    def _add(self, kind, doc, page, exact, signature):
+        blob = array.array("Q", signature).tobytes() if signature else None
+        item_id = self._conn.execute(
+            "INSERT INTO items (kind, doc, page, exact, signature) VALUES (?, ?, ?, ?, ?)",
+            (kind, doc, page, exact, blob),
+        ).lastrowid
+        if signature:
+            self._conn.executemany(
+                "INSERT INTO bands (kind, band, bucket, item_id) VALUES (?, ?, ?, ?)",
+                [(kind, band, bucket, item_id) for band, bucket in _band_hashes(signature)],
+            )
+
+    def _forget(self, doc):
+        """重新处理同一路径时先移除其旧条目，避免与自己的旧版本比对"""
+        self._conn.execute("DELETE FROM bands WHERE item_id IN (SELECT id FROM items WHERE doc = ?)", (doc,))
+        self._conn.execute("DELETE FROM items WHERE doc = ?", (doc,))
+
+    def check_document(self, input_file, fingerprint):
+        """
+        检查整份文档是否与已登记的文档重复
+
+        不重复时登记文档及其各页，并返回各页的判定结果。
+
+        Returns:
+            (重复的文档, 相似度) 或 (None, {page_idx: (重复的文档, 页码, 相似度)})
+        """
+        doc = os.path.abspath(input_file)
+        pages = fingerprint["pages"]
+        with self._conn:
+            self._forget(doc)
+            self.stats["documents"] += 1
+            self.stats["pages"] += len(pages)
+            match = self._find("doc", fingerprint["sha256"], fingerprint["signature"])
+            if match:
+                self.stats["duplicate_documents"] += 1
+                self.stats["duplicate_content_pages"] += len(pages)
+                self.stats["duplicate_chars"] += sum(page["chars"] for page in pages)
+                self.stats["duplicate_bytes"] += os.path.getsize(input_file)
+                return match[0], match[2]
+            self._add("doc", doc, None, fingerprint["sha256"], fingerprint["signature"])
+
+            duplicates = {}
+            for page in pages:
+                match = self._find("page", page["exact"], page["signature"])
+                if match:
+                    duplicates[page["page"]] = match
+                    self.stats["duplicate_pages"] += 1
+                    self.stats["duplicate_content_pages"] += 1
+                    self.stats["duplicate_chars"] += page["chars"]
+                else:
+                    self._add("page", doc, page["page"], page["exact"], page["signature"])
+        return None, duplicates
+
+    def summary(self):
+        stats = self.stats
+        return (f"去重: 检查 {stats['documents']} 个文档 / {stats['pages']} 页，"
+                f"跳过重复文档 {stats['duplicate_documents']} 个、重复页面 {stats['duplicate_pages']} 页，"
+                f"检测到重复内容共 {stats['duplicate_content_pages']} 页（{stats['duplicate_chars']} 字符，"
+                f"重复文档 {stats['duplicate_bytes'] / 1024:.1f} KB）")
+
+
+def describe_match(doc, page=None, score=None):
+    where = os.path.basename(doc) + (f" 第 {page + 1} 页" if page is not None else "")
+    return f"{where}（{'内容相同' if score is None else f'文本相似度 {score:.0%}'}）"
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="检测重复与近似重复的 PDF 文档和页面",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python pdf_dedup.py "inbox/*.pdf"
+  python pdf_dedup.py "inbox/*.pdf" --db seen.sqlite      # 与以往批次一起去重
+  python pdf_dedup.py "inbox/*.pdf" --threshold 0.9
+  python merge_pdfs.py "inbox/*.pdf" -o merged.pdf --dedup
+  python extract_text.py report.pdf -o report.txt --dedup --dedup-db seen.sqlite
+        """
+    )
+    parser.add_argument("sources", nargs="+", help="PDF 文件或通配符")
+    parser.add_argument("--db", help="指纹索引文件（默认: 仅本次运行）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="近似重复的相似度下限（默认: %(default)s）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用页面缓存")
+    args = parser.parse_args(argv)
+
+    from pdf_cache import PageCache
+    from pdf_metrics import set_quiet
+
+    set_quiet(True)
+    cache = None if args.no_cache else PageCache()
+    files = []
+    for source in args.sources:
+        files.extend(sorted(glob.glob(source, recursive=True)) or [source])
+
+    with Deduplicator(args.db, args.threshold) as dedup:
+        for input_file in files:
+            if not os.path.exists(input_file):
+                print(f"✗ 文件不存在: {input_file}")
+                continue
+            try:
+                fingerprint = fingerprint_pdf(input_file, cache=cache)
+            except Exception as e:
+                print(f"✗ {input_file}: {type(e).__name__}: {e}")
+                continue
+            duplicate_of, result = dedup.check_document(input_file, fingerprint)
+            if duplicate_of:
+                print(f"⚠ {input_file}: 与 {describe_match(duplicate_of, score=result)} 重复")
+                continue
+            print(f"✓ {input_file}（{len(fingerprint['pages'])} 页，重复 {len(result)} 页）")
+            for page_idx, match in sorted(result.items()):
+                print(f"    第 {page_idx + 1} 页 ≈ {describe_match(*match)}")
+        print(f"\n{dedup.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
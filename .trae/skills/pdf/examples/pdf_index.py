@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 全文索引
+将逐页提取的文本写入 SQLite FTS5 索引，查询时按 BM25 排序返回
+(文档, 页码, 偏移) 命中。
+
+FTS5 自带的 unicode61 分词器把一串连续的汉字当作一个词，无法检索其中的
+词语。写入前先把中日韩文字切分为重叠的二元组（"营业收入" -> "营业 业收 收入"），
+查询词做同样的切分后按短语匹配，任意长度的词语都能命中；每段文字末尾的
+单字也单独索引，单字查询按前缀匹配。
+
+原文保存在 pages 表中，用于计算命中偏移与摘要，FTS 表本身不保存内容。
+文档按路径登记大小、修改时间与内容哈希：未变化的文档不会重复索引，
+变化的文档在一个事务内替换，查询方看到的总是完整的旧版本或新版本。
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from pdf_cache import hash_file
+
+# 切分规则变化时递增；版本不符的索引需要重建
+TOKENIZER_VERSION = 1
+
+CJK_RUN = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]+")
+TOKEN = re.compile(r"[^\W_]+")
+QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+# 每个词最多报告的命中偏移数与摘要前后的字符数
+MAX_OFFSETS = 5
+SNIPPET_CONTEXT = 40
+
+
+def _bigrams(run, tail):
+    if len(run) == 1:
+        return run
+    grams = [run[idx:idx + 2] for idx in range(len(run) - 1)]
+    if tail:
+        grams.append(run[-1])
+    return " ".join(grams)
+
+
+def segment(text, tail=True):
+    """
+    将中日韩文字切分为空格分隔的二元组，其余文字保持不变
+
+    Args:
+        text: 原文
+        tail: 是否在每段末尾追加单字（写入索引时为 True，构造短语查询时为 False）
+    """
+    return CJK_RUN.sub(lambda match: f" {_bigrams(match.group(), tail)} ", text)
+
+
+def build_query(query):
+    """
+    将用户查询转换为 FTS5 查询
+
+    空格分隔的词之间为 AND，双引号括起的内容按短语匹配。每个词都先切分
+    再以短语形式传给 FTS5，用户输入中的 FTS5 语法字符不会生效。
+
+    Returns:
+        (FTS5 查询, 原始词列表)；没有可检索的词时查询为 None
+    """
+    clauses = []
+    terms = []
+    for quoted, word in QUERY_TERM.findall(query):
+        term = quoted or word
+        tokens = TOKEN.findall(segment(term.lower(), tail=False))
+        if not tokens:
+            continue
+        terms.append(" ".join(TOKEN.findall(term)))
+        if len(tokens) == 1 and CJK_RUN.fullmatch(tokens[0]) and len(tokens[0]) == 1:
+            # 单字：匹配以该字开头的二元组及段末单字
+            clauses.append(f'"{tokens[0]}"*')
+        else:
+            clauses.append('"' + " ".join(tokens) + '"')
+    return (" AND ".join(clauses) or None), terms
+
+
+def _term_pattern(term):
+    """原文中定位查询词的正则：字符之间允许空白与标点（提取的文本可能在词中间换行）"""
+    chars = "".join(TOKEN.findall(term))
+    return re.compile(r"[\W_]*".join(map(re.escape, chars)), re.IGNORECASE)
+
+
+class TextIndex:
+    """
+    基于 SQLite FTS5 的逐页全文索引
+
+    Args:
+        path: 索引文件路径
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                indexed_at REAL NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                doc_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE (doc_id, page)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5(
+                body, content='', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]
+        if "complete" not in columns:
+            # 旧版索引没有记录文档是否完整，全部视为不完整，下次 add 时重新索引
+            with self._conn:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN complete INTEGER NOT NULL DEFAULT 0")
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'tokenizer'").fetchone()
+        if row is None:
+            with self._conn:
+                self._conn.execute("INSERT INTO meta VALUES ('tokenizer', ?)", (TOKENIZER_VERSION,))
+        elif row[0] != TOKENIZER_VERSION:
+            self.rebuild()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 写入 ----
+
+    def _registered(self, path):
+        return self._conn.execute(
+            "SELECT id, size, mtime_ns, sha256, complete FROM documents WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+
+    def is_current(self, input_file):
+        """文档的所有页面都已索引且之后未被修改"""
+        row = self._registered(input_file)
+        if row is None or not row[4]:
+            return False
+        stat = os.stat(input_file)
+        if row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+            return True
+        return row[3] == hash_file(input_file)
+
+    @contextlib.contextmanager
+    def document(self, input_file, complete=False):
+        """
+        在一个事务中写入一个文档的页面，产出 add_page(page_idx, text)
+
+        文档内容变化时先清除旧页面；内容未变时只替换本次写入的页面，
+        因此可以分多次按页码范围补全。出错时回滚，索引保持原样。
+        只有处理了全部页面的写入才应传入 complete=True，之后 is_current
+        才会认为文档无需重新索引。
+        """
+        abs_path = os.path.abspath(input_file)
+        stat = os.stat(input_file)
+        row = self._registered(input_file)
+        if row and row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+            sha256 = row[3]
+        else:
+            sha256 = hash_file(input_file)
+
+        with self._conn:
+            if row is None:
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (path, size, mtime_ns, sha256, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                    (abs_path, stat.st_size, stat.st_mtime_ns, sha256, time.time()),
+                ).lastrowid
+            else:
+                doc_id = row[0]
+                if row[3] != sha256:
+                    self._delete_pages(doc_id)
+                    self._conn.execute("UPDATE documents SET complete = 0 WHERE id = ?", (doc_id,))
+                self._conn.execute(
+                    "UPDATE documents SET size = ?, mtime_ns = ?, sha256 = ?, indexed_at = ? WHERE id = ?",
+                    (stat.st_size, stat.st_mtime_ns, sha256, time.time(), doc_id),
+                )
+
+            def add_page(page_idx, text):
+                self._delete_pages(doc_id, page_idx)
+                page_id = self._conn.execute(
+                    "INSERT INTO pages (doc_id, page, text) VALUES (?, ?, ?)", (doc_id, page_idx, text)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO page_fts (rowid, body) VALUES (?, ?)", (page_id, segment(text))
+                )
+
+            yield add_page
+            if complete:
+                self._conn.execute("UPDATE documents SET complete = 1 WHERE id = ?", (doc_id,))
+
+    def _delete_pages(self, doc_id, page_idx=None):
+        """删除文档的页面；FTS 表不保存内容，删除时需提供原先写入的分词文本"""
+        if page_idx is None:
+            rows = self._conn.execute("SELECT id, text FROM pages WHERE doc_id = ?", (doc_id,)).fetchall()
+        else:
+            rows = self._conn.execute(
+                "SELECT id, text FROM pages WHERE doc_id = ? AND page = ?", (doc_id, page_idx)
+            ).fetchall()
+        for page_id, text in rows:
+            self._conn.execute(
+                "INSERT INTO page_fts (page_fts, rowid, body) VALUES ('delete', ?, ?)", (page_id, segment(text))
+            )
+            self._conn.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+
+    def remove_missing(self):
+        """移除文件已不存在的文档，返回移除的数量"""
+        removed = 0
+        with self._conn:
+            for doc_id, path in self._conn.execute("SELECT id, path FROM documents").fetchall():
+                if not os.path.exists(path):
+                    self._delete_pages(doc_id)
+                    self._conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+                    removed += 1
+        return removed
+
+    def rebuild(self):
+        """按当前切分规则从 pages 表重建全文索引"""
+        with self._conn:
+            self._conn.execute("INSERT INTO page_fts (page_fts) VALUES ('delete-all')")
+            for page_id, text in self._conn.execute("SELECT id, text FROM pages").fetchall():
+                self._conn.execute("INSERT INTO page_fts (rowid, body) VALUES (?, ?)", (page_id, segment(text)))
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('tokenizer', ?)", (TOKENIZER_VERSION,))
+
+    # ---- 查询 ----
+
+    def search(self, query, limit=10):
+        """
+        按相关度返回命中的页面
+
+        Returns:
+            [{"path", "page"（从 1 开始）, "score", "offsets"（{词: [偏移, ...]}）, "snippet"}, ...]
+        """
+        fts_query, terms = build_query(query)
+        if fts_query is None:
+            return []
+        rows = self._conn.execute("""
+            SELECT documents.path, pages.page, pages.text, bm25(page_fts) AS rank
+            FROM page_fts
+            JOIN pages ON pages.id = page_fts.rowid
+            JOIN documents ON documents.id = pages.doc_id
+            WHERE page_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """, (fts_query, limit)).fetchall()
+
+        patterns = [(term, _term_pattern(term)) for term in terms]
+        hits = []
+        for path, page_idx, text, rank in rows:
+            offsets = {}
+            first = None
+            for term, pattern in patterns:
+                matches = []
+                for match in pattern.finditer(text):
+                    matches.append(match.start())
+                    if first is None or match.start() < first.start():
+                        first = match
+                    if len(matches) >= MAX_OFFSETS:
+                        break
+                offsets[term] = matches
+            snippet = ""
+            if first is not None:
+                start = max(0, first.start() - SNIPPET_CONTEXT)
+                snippet = " ".join(text[start:first.end() + SNIPPET_CONTEXT].split())
+            hits.append({
+                "path": path,
+                "page": page_idx + 1,
+                "score": round(-rank, 4),
+                "offsets": offsets,
+                "snippet": snippet,
+            })
+        return hits
+
+    def stats(self):
+        documents, = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        pages, = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+        return {"documents": documents, "pages": pages, "bytes": os.path.getsize(self.path)}
+
+
+def index_pdf(index, input_file, cache=None, workers=1):
+    """
+    提取一个 PDF 的文本并写入索引（不输出文本）
+
+    Returns:
+        写入的页数
+    """
+    from extract_text import iter_text_from_pdf
+
+    pages = 0
+    with index.document(input_file, complete=True) as add_page:
+        def on_page(page_idx, text):
+            nonlocal pages
+            add_page(page_idx, text)
+            pages += 1
+
+        for _ in iter_text_from_pdf(input_file, workers=workers, log=lambda *args: None,
+                                    cache=cache, on_page=on_page):
+            pass
+    return pages
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="PDF 全文索引：建立索引与查询",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python pdf_index.py add archive.idx "archive/**/*.pdf"
+  python pdf_index.py query archive.idx 违约 赔偿
+  python pdf_index.py query archive.idx '"force majeure"' -n 20 --json
+  python pdf_index.py stats archive.idx
+  python extract_text.py document.pdf -o output.txt --index archive.idx   # 提取时顺便索引
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="索引 PDF 文件（已索引且未修改的文件跳过）")
+    add_parser.add_argument("index", help="索引文件")
+    add_parser.add_argument("sources", nargs="+", help="PDF 文件或通配符")
+    add_parser.add_argument("-w", "--workers", type=int, default=1, help="每个文件的提取进程数（默认: 1）")
+    add_parser.add_argument("--no-cache", action="store_true", help="不使用页面缓存")
+    add_parser.add_argument("--prune", action="store_true", help="同时移除文件已不存在的文档")
+
+    query_parser = subparsers.add_parser("query", help="查询索引")
+    query_parser.add_argument("index", help="索引文件")
+    query_parser.add_argument("query", nargs="+", help="查询词，空格分隔为 AND，双引号括起为短语")
+    query_parser.add_argument("-n", "--limit", type=int, default=10, help="返回的命中数（默认: 10）")
+    query_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+
+    stats_parser = subparsers.add_parser("stats", help="索引统计")
+    stats_parser.add_argument("index", help="索引文件")
+
+    args = parser.parse_args(argv)
+
+    if args.command != "add" and not os.path.exists(args.index):
+        print(f"错误: 索引不存在: {args.index}", file=sys.stderr)
+        return 1
+
+    with TextIndex(args.index) as index:
+        if args.command == "query":
+            start = time.perf_counter()
+            hits = index.search(" ".join(args.query), args.limit)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(hits, ensure_ascii=False, indent=2))
+                return 0
+            for rank, hit in enumerate(hits, 1):
+                offsets = ", ".join(f"{term}@{','.join(map(str, positions))}"
+                                    for term, positions in hit["offsets"].items() if positions)
+                print(f"{rank:3d}. {hit['path']} 第 {hit['page']} 页  得分 {hit['score']:.2f}  偏移 {offsets}")
+                print(f"     {hit['snippet']}")
+            print(f"\n共 {len(hits)} 条命中，耗时 {elapsed_ms:.1f} ms")
+            return 0
+
+        if args.command == "stats":
+            stats = index.stats()
+            print(f"文档: {stats['documents']}  页面: {stats['pages']}  "
+                  f"索引大小: {stats['bytes'] / (1024 * 1024):.1f} MB")
+            return 0
+
+        from pdf_cache import PageCache
+        from pdf_metrics import set_quiet
+
+        set_quiet(True)
+        cache = None if args.no_cache else PageCache()
+        files = []
+        for source in args.sources:
+            files.extend(sorted(glob.glob(source, recursive=True)) or [source])
+        added = skipped = failed = 0
+        for input_file in files:
+            if not os.path.exists(input_file):
+                print(f"✗ 文件不存在: {input_file}")
+                failed += 1
+                continue
+            if index.is_current(input_file):
+                skipped += 1
+                continue
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    pages = index_pdf(index, input_file, cache, args.workers)
+            except Exception as e:
+                print(f"✗ {input_file}: {type(e).__name__}: {e}")
+                failed += 1
+                continue
+            added += 1
+            print(f"✓ {input_file}（{pages} 页）")
+        if args.prune:
+            removed = index.remove_missing()
+            if removed:
+                print(f"已移除 {removed} 个不存在的文档")
+        print(f"\n新增或更新 {added} 个，未变化跳过 {skipped} 个，失败 {failed} 个")
+        return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
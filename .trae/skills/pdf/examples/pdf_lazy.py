@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+惰性 PDF 页面访问
+以内存映射方式打开文件，交叉引用表与页面树都只在用到时读取：
+经典交叉引用表的条目定长，按对象号直接定位，无需逐行解析；取第 N 页时
+按各节点的 /Count 逐层下降，不遍历整棵页面树。因此取 10000 页文件的
+第 9000 页与取第 1 页的开销基本相同。
+
+返回的都是 pypdf 通用对象，其中的间接引用指向 LazyPdf 本身，
+可直接交给 pdf_stream 中的 TemplateSource / StreamingPdfWriter 写出。
+加密或结构损坏的文件抛出 LazyPdfError，调用方应退回 pypdf 完整解析。
+"""
+
+import io
+import mmap
+import os
+import re
+
+from pypdf import PdfReader
+from pypdf.errors import PdfReadError
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject, read_object
+
+# 页面可从祖先节点继承的属性
+INHERITABLE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# 页面树最大深度，防止循环引用
+MAX_TREE_DEPTH = 64
+
+OBJECT_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\s*")
+XREF_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)\s*?(\r\n|\r|\n)")
+WHITESPACE = re.compile(rb"\s*")
+
+
+class LazyPdfError(Exception):
+    """文件无法惰性解析（加密、交叉引用损坏等）"""
+
+
+class _XrefTable:
+    """经典交叉引用表的一节：只记录各小节位置，条目按需读取"""
+
+    def __init__(self, data, subsections):
+        self.data = data
+        self.subsections = subsections  # [(起始对象号, 条目数, 条目起始偏移, 条目长度)]
+
+    def lookup(self, num):
+        for start, count, offset, entry_len in self.subsections:
+            if start <= num < start + count:
+                pos = offset + (num - start) * entry_len
+                entry = self.data[pos:pos + 18]
+                if entry[17:18] != b"n":
+                    return ("f",)
+                return ("n", int(entry[:10]), int(entry[11:16]))
+        return None
+
+
+class _XrefStream:
+    """交叉引用流的一节：解码后的定宽二进制条目，按对象号直接定位"""
+
+    def __init__(self, data, widths, index):
+        self.data = data
+        self.widths = widths
+        self.row_len = sum(widths)
+        self.index = index  # [(起始对象号, 条目数, 起始行号)]
+
+    def _field(self, row, field_idx, default):
+        width = self.widths[field_idx]
+        if width == 0:
+            return default
+        start = row * self.row_len + sum(self.widths[:field_idx])
+        return int.from_bytes(self.data[start:start + width], "big")
+
+    def lookup(self, num):
+        for start, count, first_row in self.index:
+            if start <= num < start + count:
+                row = first_row + num - start
+                kind = self._field(row, 0, 1)
+                if kind == 1:
+                    return ("n", self._field(row, 1, 0), self._field(row, 2, 0))
+                if kind == 2:
+                    return ("c", self._field(row, 1, 0), self._field(row, 2, 0))
+                return ("f",)
+        return None
+
+
+class LazyPages:
+    """按需定位的页面序列，len() 取自根节点的 /Count"""
+
+    def __init__(self, pdf, root):
+        self.pdf = pdf
+        self.root = root
+        self._count = int(root.get("/Count", 0))
+        self._cache = {}
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for page_idx in range(self._count):
+            yield self[page_idx]
+
+    def __getitem__(self, page_idx):
+        if page_idx < 0:
+            page_idx += self._count
+        if not 0 <= page_idx < self._count:
+            raise IndexError(f"页码超出范围: {page_idx}")
+        page = self._cache.get(page_idx)
+        if page is None:
+            page = self._cache[page_idx] = self._locate(page_idx)
+        return page
+
+    def _locate(self, page_idx):
+        node = self.root
+        inherited = {}
+        remaining = page_idx
+        for _ in range(MAX_TREE_DEPTH):
+            for key in INHERITABLE_ATTRIBUTES:
+                if key in node:
+                    inherited[key] = node.raw_get(key)
+            if node.get("/Type") == "/Page" or "/Kids" not in node:
+                # 继承属性写入页面字典，与 pypdf 展开页面树的行为一致
+                for key, value in inherited.items():
+                    if key not in node:
+                        node[NameObject(key)] = value
+                return node
+
+            kids = node["/Kids"]
+            if node.get("/Count") == len(kids):
+                # 页数与子节点数相同：每个子节点恰好一页，直接按下标取
+                node = kids[remaining].get_object()
+                remaining = 0
+                continue
+            for kid_ref in kids:
+                kid = kid_ref.get_object()
+                size = int(kid.get("/Count", 0)) if kid.get("/Type") == "/Pages" else 1
+                if remaining < size:
+                    node = kid
+                    break
+                remaining -= size
+            else:
+                raise LazyPdfError(f"页面树 /Count 与实际页数不符（第 {page_idx + 1} 页）")
+        raise LazyPdfError("页面树层级过深")
+
+
+class LazyPdf:
+    """
+    内存映射、按需解析的只读 PDF
+
+    对外提供 pypdf 读取对象所需的最小接口（get_object、strict），以及
+    pages（LazyPages）、trailer 与最新一节交叉引用的位置（startxref，
+    xref_stream 表示该节是否为交叉引用流）。已解析的对象按对象号缓存。非线程安全。
+
+    Args:
+        input_file: PDF 文件路径，或内存中的 PDF（bytes、BytesIO 等文件对象）
+    """
+
+    strict = False
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self._file = None
+        if isinstance(input_file, (str, os.PathLike)):
+            self._file = open(input_file, "rb")
+            try:
+                self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                self._file.close()
+                raise LazyPdfError(f"无法映射文件: {e}") from e
+        else:
+            # 内存中的文档复制到匿名映射，之后的读取方式与文件映射相同
+            if hasattr(input_file, "read"):
+                input_file.seek(0)
+                data = input_file.read()
+            else:
+                data = bytes(input_file)
+            if not data:
+                raise LazyPdfError("文档为空")
+            self._data = mmap.mmap(-1, len(data))
+            self._data.write(data)
+            self._data.seek(0)
+        self._objects = {}
+        self._object_streams = {}
+        self._sections = []
+        try:
+            self.trailer = self._load_xref()
+            self.xref_stream = not isinstance(self._sections[0], _XrefTable)
+            if "/Encrypt" in self.trailer:
+                raise LazyPdfError("加密文档需要完整解析")
+            root = self.trailer["/Root"].get_object()
+            self.pages = LazyPages(self, root["/Pages"].get_object())
+        except LazyPdfError:
+            self.close()
+            raise
+        except (PdfReadError, KeyError, ValueError, TypeError, AttributeError) as e:
+            self.close()
+            raise LazyPdfError(f"交叉引用或文档结构无法解析: {e}") from e
+
+    def close(self):
+        if not self._data.closed:
+            self._data.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 交叉引用 ----
+
+    def _load_xref(self):
+        tail = self._data[-1024:]
+        pos = tail.rfind(b"startxref")
+        if pos < 0:
+            raise LazyPdfError("未找到 startxref")
+        offset = int(tail[pos + 9:].split()[0])
+        self.startxref = offset
+
+        trailer = DictionaryObject()
+        pending = [offset]
+        seen = set()
+        while pending:
+            offset = pending.pop(0)
+            if offset in seen:
+                continue
+            seen.add(offset)
+            section, section_trailer = self._read_xref_section(offset)
+            self._sections.append(section)
+            for key, value in section_trailer.items():
+                if key not in trailer:
+                    trailer[key] = value
+            # 混合引用文件：/XRefStm 中的条目优先于 /Prev 指向的旧节
+            if "/XRefStm" in section_trailer:
+                pending.insert(0, int(section_trailer["/XRefStm"]))
+            if "/Prev" in section_trailer:
+                pending.append(int(section_trailer["/Prev"]))
+        return trailer
+
+    def _read_xref_section(self, offset):
+        data = self._data
+        start = WHITESPACE.match(data, offset).end()
+        if data[start:start + 4] == b"xref":
+            pos = start + 4
+            subsections = []
+            while True:
+                pos = WHITESPACE.match(data, pos).end()
+                if data[pos:pos + 7] == b"trailer":
+                    break
+                match = XREF_SUBSECTION.match(data, pos)
+                if match is None:
+                    raise LazyPdfError(f"交叉引用表格式错误 @{pos}")
+                first, count = int(match.group(1)), int(match.group(2))
+                entries = match.end()
+                # 标准条目 20 字节；部分生成器只写单字节换行，条目为 19 字节
+                entry_len = 20 if data[entries + 18:entries + 20] in (b" \n", b" \r", b"\r\n") else 19
+                subsections.append((first, count, entries, entry_len))
+                pos = entries + count * entry_len
+            data.seek(pos + 7)
+            trailer = read_object(_skip_whitespace(data), self)
+            return _XrefTable(data, subsections), trailer
+
+        obj = self._parse_at(offset)
+        if not isinstance(obj, StreamObject) or obj.get("/Type") != "/XRef":
+            raise LazyPdfError(f"startxref 指向的不是交叉引用表 @{offset}")
+        widths = [int(width) for width in obj["/W"]]
+        index = obj.get("/Index", ArrayObject([0, obj["/Size"]]))
+        rows = []
+        first_row = 0
+        for idx in range(0, len(index), 2):
+            first, count = int(index[idx]), int(index[idx + 1])
+            rows.append((first, count, first_row))
+            first_row += count
+        return _XrefStream(obj.get_data(), widths, rows), obj
+
+    def _lookup(self, num):
+        for section in self._sections:
+            entry = section.lookup(num)
+            if entry is not None:
+                return entry
+        return ("f",)
+
+    # ---- 对象 ----
+
+    def _parse_at(self, offset):
+        match = OBJECT_HEADER.match(self._data, offset)
+        if match is None:
+            raise LazyPdfError(f"对象头格式错误 @{offset}")
+        self._data.seek(match.end())
+        return read_object(self._data, self)
+
+    def _from_object_stream(self, stream_num, index):
+        stream = self._object_streams.get(stream_num)
+        if stream is None:
+            obj = self.get_object(stream_num)
+            data = obj.get_data()
+            first = int(obj["/First"])
+            header = data[:first].split()
+            offsets = [first + int(header[idx]) for idx in range(1, len(header), 2)]
+            stream = self._object_streams[stream_num] = (data, offsets)
+        data, offsets = stream
+        buf = io.BytesIO(data)
+        buf.seek(offsets[index])
+        return read_object(_skip_whitespace(buf), self)
+
+    def get_object(self, ref):
+        """按间接引用或对象号读取对象，对象不存在时返回 None"""
+        num = ref.idnum if isinstance(ref, IndirectObject) else int(ref)
+        if num in self._objects:
+            return self._objects[num]
+
+        entry = self._lookup(num)
+        if entry[0] == "n":
+            position = self._data.tell()
+            obj = self._parse_at(entry[1])
+            self._data.seek(position)
+            generation = entry[2]
+        elif entry[0] == "c":
+            obj = self._from_object_stream(entry[1], entry[2])
+            generation = 0
+        else:
+            obj = None
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            obj.indirect_reference = IndirectObject(num, generation, self)
+        self._objects[num] = obj
+        return obj
+
+
+def _skip_whitespace(stream):
+    while stream.read(1).isspace():
+        pass
+    stream.seek(-1, 1)
+    return stream
+
+
+def open_page_source(input_file):
+    """
+    打开 PDF 供按页访问：优先使用 LazyPdf，无法惰性解析时退回 pypdf 完整解析
+
+    Returns:
+        LazyPdf 或已解密的 PdfReader，二者都提供 pages 序列
+    """
+    try:
+        return LazyPdf(input_file)
+    except LazyPdfError:
+        reader = PdfReader(input_file)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        return reader
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 工具的性能指标
+记录各阶段（打开、解析、提取、DataFrame 构建、写出等）与逐页耗时、峰值内存，
+导出为 JSON 或 Prometheus 文本文件格式（供 node_exporter textfile collector 采集），
+并可选用 cProfile / pyinstrument 做函数级剖析。
+
+各工具共用模块级的 METRICS 记录器；--quiet 关闭逐页输出，只保留汇总信息。
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+METRIC_FORMATS = ("json", "prometheus")
+PROFILERS = ("cprofile", "pyinstrument")
+
+# 逐页耗时汇总中列出的最慢页面数
+SLOWEST_PAGES = 10
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Metrics:
+    """
+    阶段与逐页耗时记录器
+
+    阶段耗时按名称累计调用次数、总耗时与单次最长耗时；逐页耗时按
+    (阶段, 页码) 累计，同时计入对应阶段。
+    """
+
+    def __init__(self, tool=None):
+        self.reset(tool)
+
+    def reset(self, tool=None):
+        self.tool = tool
+        self.stages = {}
+        self.pages = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def add(self, name, seconds):
+        """累计一次阶段耗时"""
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """计时一个阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def page(self, name, page_idx, seconds):
+        """累计某一页在某阶段的耗时（页码 0 起始）"""
+        self.add(name, seconds)
+        per_page = self.pages.setdefault(name, {})
+        per_page[page_idx] = per_page.get(page_idx, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def time_page(self, name, page_idx):
+        """计时某一页的一个阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.page(name, page_idx, time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_summary(self):
+        """{阶段: {"calls", "seconds", "max_seconds"}}"""
+        return {
+            name: {"calls": calls, "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+            for name, (calls, total, longest) in self.stages.items()
+        }
+
+    def page_summary(self):
+        """{阶段: {"pages", "mean", "p50", "p95", "max", "slowest"}}，slowest 中页码从 1 开始"""
+        summary = {}
+        for name, per_page in self.pages.items():
+            values = sorted(per_page.values())
+            slowest = sorted(per_page.items(), key=lambda item: -item[1])[:SLOWEST_PAGES]
+            summary[name] = {
+                "pages": len(values),
+                "mean": round(sum(values) / len(values), 6),
+                "p50": round(_quantile(values, 0.5), 6),
+                "p95": round(_quantile(values, 0.95), 6),
+                "max": round(values[-1], 6),
+                "slowest": [[page_idx + 1, round(seconds, 6)] for page_idx, seconds in slowest],
+            }
+        return summary
+
+    def to_dict(self):
+        return {
+            "tool": self.tool,
+            "wall_seconds": round(time.perf_counter() - self._start, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stage_summary(),
+            "pages": self.page_summary(),
+            "counters": dict(self.counters),
+        }
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        data = self.to_dict()
+        tool = _label(data["tool"] or "pdf")
+        lines = [
+            "# HELP pdf_tool_wall_seconds 本次运行的总耗时",
+            "# TYPE pdf_tool_wall_seconds gauge",
+            f'pdf_tool_wall_seconds{{tool="{tool}"}} {data["wall_seconds"]}',
+        ]
+        if data["peak_rss_mb"] is not None:
+            lines += [
+                "# HELP pdf_tool_peak_rss_bytes 进程峰值常驻内存",
+                "# TYPE pdf_tool_peak_rss_bytes gauge",
+                f'pdf_tool_peak_rss_bytes{{tool="{tool}"}} {int(data["peak_rss_mb"] * 1024 * 1024)}',
+            ]
+        lines += [
+            "# HELP pdf_tool_stage_seconds_total 各阶段累计耗时",
+            "# TYPE pdf_tool_stage_seconds_total counter",
+        ]
+        for name, entry in data["stages"].items():
+            lines.append(f'pdf_tool_stage_seconds_total{{tool="{tool}",stage="{_label(name)}"}} {entry["seconds"]}')
+        lines += [
+            "# HELP pdf_tool_stage_calls_total 各阶段调用次数",
+            "# TYPE pdf_tool_stage_calls_total counter",
+        ]
+        for name, entry in data["stages"].items():
+            lines.append(f'pdf_tool_stage_calls_total{{tool="{tool}",stage="{_label(name)}"}} {entry["calls"]}')
+        if self.pages:
+            lines += [
+                "# HELP pdf_tool_page_seconds 逐页耗时",
+                "# TYPE pdf_tool_page_seconds summary",
+            ]
+            for name, per_page in self.pages.items():
+                labels = f'tool="{tool}",stage="{_label(name)}"'
+                values = sorted(per_page.values())
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'pdf_tool_page_seconds{{{labels},quantile="{q}"}} {_quantile(values, q):.6f}')
+                lines.append(f"pdf_tool_page_seconds_sum{{{labels}}} {sum(values):.6f}")
+                lines.append(f"pdf_tool_page_seconds_count{{{labels}}} {len(values)}")
+        for name, value in data["counters"].items():
+            metric = f"pdf_tool_{_label(name)}_total"
+            lines += [f"# TYPE {metric} counter", f'{metric}{{tool="{tool}"}} {value}']
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, metrics_format=None):
+        """
+        写出指标；未指定格式时 .prom 文件按 Prometheus 格式，其余按 JSON
+
+        先写临时文件再改名，textfile collector 不会读到写了一半的文件。
+        """
+        if metrics_format is None:
+            metrics_format = "prometheus" if path.endswith(".prom") else "json"
+        if metrics_format == "prometheus":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def _label(value):
+    return "".join(char if char.isalnum() or char == "_" else "_" for char in str(value))
+
+
+METRICS = Metrics()
+
+_quiet = False
+
+
+def set_quiet(quiet):
+    global _quiet
+    _quiet = bool(quiet)
+
+
+def is_quiet():
+    return _quiet
+
+
+def _discard(*args, **kwargs):
+    pass
+
+
+def page_logger(log=print):
+    """逐页输出函数：--quiet 时丢弃"""
+    return _discard if _quiet else log
+
+
+@contextlib.contextmanager
+def profiled(profiler=None, output=None, tool="pdf"):
+    """
+    可选的函数级剖析
+
+    cprofile 将统计结果写到 output（默认 <tool>.prof），可用 snakeviz 等工具查看；
+    pyinstrument 写出 HTML 报告（默认 <tool>.profile.html）。两者都在标准错误输出摘要。
+    """
+    if profiler is None:
+        yield
+        return
+
+    if profiler == "cprofile":
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            output = output or f"{tool}.prof"
+            profile.dump_stats(output)
+            pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+            print(f"剖析结果已保存到: {output}", file=sys.stderr)
+        return
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise ImportError("使用 pyinstrument 剖析需要安装: pip install pyinstrument")
+    profile = Profiler()
+    profile.start()
+    try:
+        yield
+    finally:
+        profile.stop()
+        output = output or f"{tool}.profile.html"
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(profile.output_html())
+        print(profile.output_text(), file=sys.stderr)
+        print(f"剖析结果已保存到: {output}", file=sys.stderr)
+
+
+def add_arguments(parser):
+    """为命令行工具添加 --quiet、--metrics 与 --profile 参数"""
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="不输出逐页进度，只保留汇总信息"
+    )
+
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="将阶段与逐页耗时写入文件（.prom 为 Prometheus 格式，其余为 JSON）"
+    )
+
+    parser.add_argument(
+        "--metrics-format",
+        choices=METRIC_FORMATS,
+        help="指标文件格式（默认按扩展名判断）"
+    )
+
+    parser.add_argument(
+        "--profile",
+        choices=PROFILERS,
+        help="对本次运行做函数级剖析"
+    )
+
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="剖析结果文件（默认: <工具名>.prof 或 <工具名>.profile.html）"
+    )
+
+
+@contextlib.contextmanager
+def instrument(tool, args):
+    """
+    在命令行入口中包裹整次运行：按参数设置静默模式、启动剖析，结束后写出指标
+
+    Args:
+        tool: 工具名，作为指标的 tool 标签
+        args: 经 add_arguments 添加过参数的 argparse 结果
+    """
+    set_quiet(args.quiet)
+    METRICS.reset(tool)
+    try:
+        with profiled(args.profile, args.profile_output, tool):
+            yield METRICS
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics, args.metrics_format)
+            print(f"指标已保存到: {args.metrics}", file=sys.stderr)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描页 OCR
+用 pypdfium2（pdfplumber 的依赖）将页面渲染为图片，再交给本机安装的
+Tesseract 命令行识别。渲染与识别都在子进程中完成，结果由调用方按页码顺序合并。
+"""
+
+import functools
+import io
+import os
+import shutil
+import subprocess
+import time
+
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_LANG = "chi_sim+eng"
+
+# 单页识别超时（秒），防止异常图片拖住整个进程池
+OCR_TIMEOUT = 120
+
+
+def find_tesseract():
+    """返回 tesseract 可执行文件路径，未安装时抛出 RuntimeError"""
+    path = shutil.which("tesseract")
+    if path is None:
+        raise RuntimeError("未找到 tesseract，请先安装（如: apt install tesseract-ocr tesseract-ocr-chi-sim）")
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def tesseract_version():
+    """Tesseract 版本号，作为 OCR 缓存键的一部分"""
+    output = subprocess.run(
+        [find_tesseract(), "--version"], capture_output=True, text=True, check=True
+    )
+    # 旧版本将版本信息输出到标准错误
+    first_line = (output.stdout or output.stderr).splitlines()[0]
+    return first_line.split()[-1]
+
+
+def renderer_version():
+    """渲染器版本号，作为渲染缓存键的一部分"""
+    from importlib.metadata import version
+
+    return version("pypdfium2")
+
+
+@functools.lru_cache(maxsize=4)
+def _open_document(input_file):
+    """每个工作进程对同一文件只打开一次"""
+    import pypdfium2
+
+    return pypdfium2.PdfDocument(input_file)
+
+
+def render_page(input_file, page_idx, dpi=DEFAULT_OCR_DPI):
+    """将一页渲染为灰度 PNG 字节"""
+    page = _open_document(input_file)[page_idx]
+    try:
+        image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+    finally:
+        page.close()
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def run_tesseract(png, lang=DEFAULT_OCR_LANG, dpi=DEFAULT_OCR_DPI):
+    """识别 PNG 图片中的文本"""
+    result = subprocess.run(
+        [find_tesseract(), "stdin", "stdout", "-l", lang, "--dpi", str(dpi)],
+        input=png, capture_output=True, timeout=OCR_TIMEOUT,
+        # 并行由进程池负责，避免每个 tesseract 再各自开满 OpenMP 线程
+        env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"tesseract 失败: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout.decode("utf-8").strip()
+
+
+def ocr_page(input_file, page_idx, dpi=DEFAULT_OCR_DPI, lang=DEFAULT_OCR_LANG, png=None):
+    """
+    子进程任务：渲染（未提供 png 时）并识别一页
+
+    Returns:
+        {"text", "png"（本次新渲染时）, "render_s", "ocr_s"}
+    """
+    result = {"render_s": 0.0}
+    if png is None:
+        start = time.perf_counter()
+        png = render_page(input_file, page_idx, dpi)
+        result["render_s"] = time.perf_counter() - start
+        result["png"] = png
+    start = time.perf_counter()
+    result["text"] = run_tesseract(png, lang, dpi)
+    result["ocr_s"] = time.perf_counter() - start
+    return result
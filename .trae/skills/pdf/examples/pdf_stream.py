@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式 PDF 写出引擎
+从 pypdf 读取的对象按需复制到输出文件，每个对象序列化后立即写出，
+不在内存中构建完整文档。相同内容的对象（字体、图片、共享资源等）
+按内容哈希去重，只写出一份。
+"""
+
+import hashlib
+import io
+
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    StreamObject,
+)
+
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+# 模板中的占位符：页面的 /Parent 引用在写出时才确定
+PARENT = object()
+
+
+class Ref:
+    """模板中的间接引用，key 为源文件中的 (对象号, 代号)"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+
+def ref_key(indirect):
+    return (indirect.idnum, indirect.generation)
+
+
+def build_template(obj, is_page=False):
+    """
+    将 pypdf 对象序列化为模板：字节片段与 Ref/PARENT 占位符交替的列表
+
+    页面对象省略原有的 /Parent，改为 PARENT 占位符。
+    """
+    parts = []
+    buf = io.BytesIO()
+
+    def flush():
+        if buf.tell():
+            parts.append(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+
+    def emit(value):
+        if isinstance(value, IndirectObject):
+            flush()
+            parts.append(Ref(ref_key(value)))
+        elif isinstance(value, DictionaryObject):
+            emit_dict(value)
+        elif isinstance(value, ArrayObject):
+            buf.write(b"[")
+            for idx, item in enumerate(value):
+                if idx:
+                    buf.write(b" ")
+                emit(item)
+            buf.write(b"]")
+        else:
+            value.write_to_stream(buf)
+
+    def emit_dict(value, skip_parent=False):
+        buf.write(b"<<")
+        if skip_parent:
+            buf.write(b"/Parent ")
+            flush()
+            parts.append(PARENT)
+        is_stream = isinstance(value, StreamObject)
+        for key, item in value.items():
+            if (skip_parent and key == "/Parent") or (is_stream and key == "/Length"):
+                continue
+            buf.write(b" ")
+            key.write_to_stream(buf)
+            buf.write(b" ")
+            emit(item)
+        if is_stream:
+            buf.write(b" /Length %d" % len(value._data))
+        buf.write(b" >>")
+        if is_stream:
+            buf.write(b"\nstream\n")
+            buf.write(value._data)
+            buf.write(b"\nendstream")
+
+    if isinstance(obj, DictionaryObject):
+        emit_dict(obj, skip_parent=is_page)
+    else:
+        emit(obj)
+    flush()
+    return parts
+
+
+def template_refs(template):
+    """模板引用的源对象 key 列表"""
+    return [part.key for part in template if isinstance(part, Ref)]
+
+
+def render_template(template, ref_ids, parent_id=None):
+    """
+    将模板渲染为对象正文字节
+
+    Args:
+        template: build_template 的结果
+        ref_ids: 源对象 key -> 新对象号（None 表示写为 null）
+        parent_id: 页面的父节点对象号
+    """
+    out = []
+    for part in template:
+        if isinstance(part, bytes):
+            out.append(part)
+        elif part is PARENT:
+            out.append(b"%d 0 R" % parent_id)
+        else:
+            new_id = ref_ids.get(part.key)
+            out.append(b"null" if new_id is None else b"%d 0 R" % new_id)
+    return b"".join(out)
+
+
+def _type_of(obj):
+    if isinstance(obj, DictionaryObject):
+        return obj.get("/Type")
+    return None
+
+
+class StreamingPdfWriter:
+    """
+    增量写出 PDF 文件
+
+    对象写出后只保留其偏移量（以及去重用的内容哈希），因此内存占用与
+    输出文档总大小无关。
+
+    指定 position 时为增量更新：fp 已定位到现有文件末尾，不再写文件头，
+    新对象从 next_id 开始编号，最后用 close_update 写出只含新对象的交叉引用节。
+
+    Args:
+        fp: 以二进制写模式打开的输出文件
+        dedup: 是否按内容哈希去重相同的对象（增量更新时只在新对象之间去重）
+        next_id: 第一个新对象的对象号
+        position: 现有文件的长度（增量更新时）
+    """
+
+    def __init__(self, fp, dedup=True, next_id=1, position=None):
+        self.fp = fp
+        self.dedup = dedup
+        self.offsets = {}
+        self.next_id = next_id
+        self.objects_written = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self._hashes = {}
+        self._memo = {}
+        self._page_ids = {}
+        self._position = position or 0
+        if position is None:
+            self._write(PDF_HEADER)
+
+    def _write(self, data):
+        self.fp.write(data)
+        self._position += len(data)
+
+    def reserve(self):
+        """预留一个对象号"""
+        num = self.next_id
+        self.next_id += 1
+        return num
+
+    def write_object(self, num, body):
+        """以指定对象号写出对象正文"""
+        self.offsets[num] = self._position
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+        self.objects_written += 1
+
+    def add_object(self, body, dedup=None):
+        """
+        写出新对象，内容相同的对象复用已有对象号
+
+        Returns:
+            对象号
+        """
+        if dedup is None:
+            dedup = self.dedup
+        if dedup:
+            digest = hashlib.sha256(body).digest()
+            existing = self._hashes.get(digest)
+            if existing is not None:
+                self.duplicates += 1
+                self.bytes_saved += len(body) + len(b"%d 0 obj\n\nendobj\n" % existing)
+                return existing
+        num = self.reserve()
+        self.write_object(num, body)
+        if dedup:
+            self._hashes[digest] = num
+        return num
+
+    def copy_pages(self, pages, parent_id):
+        """
+        复制同一源文件中的一组页面及其引用的全部对象
+
+        页面之间的引用（如链接注释的目标）在本组内保持有效，指向组外页面或
+        页面树节点的引用写为 null。每次调用都会清空源对象映射，因此应当
+        一次传入同一个源文件需要的全部页面。
+
+        Args:
+            pages: pypdf PageObject 列表（需来自同一 PdfReader）
+            parent_id: 这些页面的父节点对象号
+
+        Returns:
+            新页面对象号列表
+        """
+        self._memo = {}
+        self._page_ids = {}
+        page_ids = []
+        for page in pages:
+            num = self.reserve()
+            self._page_ids[ref_key(page.indirect_reference)] = num
+            page_ids.append(num)
+
+        for page, num in zip(pages, page_ids):
+            template = build_template(page, is_page=True)
+            ref_ids = {key: self._copy(page.indirect_reference.pdf, key) for key in template_refs(template)}
+            self.write_object(num, render_template(template, ref_ids, parent_id))
+
+        self._memo = {}
+        self._page_ids = {}
+        return page_ids
+
+    def _copy(self, pdf, key):
+        """复制源对象（后序遍历，子对象先写出），返回新对象号或 None"""
+        if key in self._page_ids:
+            return self._page_ids[key]
+        state = self._memo.get(key)
+        if state is not None:
+            if state is _PENDING:
+                # 循环引用：提前为该对象分配对象号，且不参与去重
+                state = self._memo[key] = _Reserved(self.reserve())
+            return state.num if isinstance(state, _Reserved) else state
+
+        obj = IndirectObject(key[0], key[1], pdf).get_object()
+        if obj is None or _type_of(obj) in ("/Page", "/Pages", "/Catalog"):
+            self._memo[key] = _NULL
+            return None
+
+        self._memo[key] = _PENDING
+        template = build_template(obj)
+        ref_ids = {child: self._copy(pdf, child) for child in template_refs(template)}
+        body = render_template(template, ref_ids)
+
+        state = self._memo[key]
+        if isinstance(state, _Reserved):
+            self.write_object(state.num, body)
+            num = state.num
+        else:
+            num = self.add_object(body)
+        self._memo[key] = num
+        return num
+
+    def write_pages_node(self, num, kids, count, parent_id=None):
+        """写出页面树节点"""
+        body = b"<< /Type /Pages"
+        if parent_id is not None:
+            body += b" /Parent %d 0 R" % parent_id
+        body += b" /Kids [" + b" ".join(b"%d 0 R" % kid for kid in kids) + b"]"
+        body += b" /Count %d >>" % count
+        self.write_object(num, body)
+
+    def close(self, pages_id):
+        """写出目录、交叉引用表和文件尾"""
+        root_id = self.add_object(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id, dedup=False)
+        xref_offset = self._position
+        size = self.next_id
+        lines = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for num in range(1, size):
+            offset = self.offsets.get(num)
+            if offset is None:
+                lines.append(b"0000000000 00000 f \n")
+            else:
+                lines.append(b"%010d 00000 n \n" % offset)
+        self._write(b"".join(lines))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (size, root_id, xref_offset))
+        return self._position
+
+    def close_update(self, root_id, prev_xref, info_id=None):
+        """
+        写出增量更新的交叉引用节与文件尾
+
+        交叉引用节只列出本次写出（包括以原对象号重写）的对象，/Prev 指向
+        上一节，文件原有字节保持不变。与常见写法一致，节首保留 0 号对象的
+        空闲项，避免部分阅读器把不从 0 开始的表当作编号错误来“修正”。
+
+        Args:
+            root_id: 目录对象号（沿用原文件的目录）
+            prev_xref: 原文件最后一节交叉引用的偏移（startxref）
+            info_id: 原文件尾中的 /Info 对象号（可选）
+
+        Returns:
+            文件总长度
+        """
+        xref_offset = self._position
+        nums = sorted(self.offsets)
+        lines = [b"xref\n0 1\n0000000000 65535 f \n"]
+        start = 0
+        while start < len(nums):
+            end = start
+            while end + 1 < len(nums) and nums[end + 1] == nums[end] + 1:
+                end += 1
+            lines.append(b"%d %d\n" % (nums[start], end - start + 1))
+            lines.extend(b"%010d 00000 n \n" % self.offsets[num] for num in nums[start:end + 1])
+            start = end + 1
+        self._write(b"".join(lines))
+        info = b" /Info %d 0 R" % info_id if info_id is not None else b""
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R%s /Prev %d >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (self.next_id, root_id, info, prev_xref, xref_offset))
+        return self._position
+
+
+class TemplateSource:
+    """
+    源文件只解析一次，之后可反复写出任意页面子集
+
+    所有对象在首次用到时序列化为模板并缓存，每页可达的对象集合也只计算
+    一次。写出子文档时只需重新编号并拼接字节，不再访问源文件，因此
+    write_pages 可以在多个线程中并发调用。页面按下标按需读取，配合
+    pdf_lazy.LazyPdf 时只解析实际用到的页面。
+
+    Args:
+        pdf: pypdf PdfReader（需已解密）或 pdf_lazy.LazyPdf
+    """
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.pages = pdf.pages
+        self.page_keys = {}
+        self._templates = {}
+        self._page_templates = {}
+        self._closures = {}
+
+    def __len__(self):
+        return len(self.pages)
+
+    def _template(self, key):
+        template = self._templates.get(key)
+        if template is None:
+            obj = IndirectObject(key[0], key[1], self.pdf).get_object()
+            if obj is None or _type_of(obj) in ("/Page", "/Pages", "/Catalog"):
+                # 页面与页面树节点不随引用复制，写出时按是否在子集中决定
+                template = ()
+            else:
+                template = build_template(obj)
+            self._templates[key] = template
+        return template
+
+    def prepare(self, page_idx):
+        """序列化一页并计算其可达对象集合（需在主线程中调用）"""
+        if page_idx in self._closures:
+            return
+        page = self.pages[page_idx]
+        template = build_template(page, is_page=True)
+        closure = {}
+        stack = list(reversed(template_refs(template)))
+        while stack:
+            key = stack.pop()
+            if key in closure:
+                continue
+            child_template = self._template(key)
+            closure[key] = None
+            stack.extend(reversed(template_refs(child_template)))
+        self.page_keys[page_idx] = ref_key(page.indirect_reference)
+        self._page_templates[page_idx] = template
+        self._closures[page_idx] = tuple(key for key in closure if self._templates[key])
+
+    def write_pages(self, fp, page_indices):
+        """
+        将指定页面（0 起始）写为独立的 PDF
+
+        Returns:
+            输出字节数
+        """
+        for page_idx in page_indices:
+            self.prepare(page_idx)
+
+        writer = StreamingPdfWriter(fp, dedup=False)
+        ref_ids = {}
+        page_ids = []
+        for page_idx in page_indices:
+            key = self.page_keys[page_idx]
+            if key not in ref_ids:
+                ref_ids[key] = writer.reserve()
+            page_ids.append(ref_ids[key])
+        for page_idx in page_indices:
+            for key in self._closures[page_idx]:
+                if key not in ref_ids:
+                    ref_ids[key] = writer.reserve()
+        pages_id = writer.reserve()
+
+        written = set()
+        for page_idx, page_id in zip(page_indices, page_ids):
+            if page_id in written:
+                continue
+            written.add(page_id)
+            writer.write_object(page_id, render_template(self._page_templates[page_idx], ref_ids, pages_id))
+            for key in self._closures[page_idx]:
+                num = ref_ids[key]
+                if num not in written:
+                    written.add(num)
+                    writer.write_object(num, render_template(self._templates[key], ref_ids))
+
+        writer.write_pages_node(pages_id, page_ids, len(page_ids))
+        return writer.close(pages_id)
+
+
+class _Reserved:
+    __slots__ = ("num",)
+
+    def __init__(self, num):
+        self.num = num
+
+
+_PENDING = object()
+_NULL = _Reserved(None)
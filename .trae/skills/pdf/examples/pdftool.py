@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 工具统一入口
+按子命令分发到各示例脚本，只导入用到的那一个；各脚本的重量级依赖
+（pdfplumber、pypdf、pandas）也都推迟到真正处理文件时才导入。
+"""
+
+import argparse
+import importlib
+import sys
+
+# 子命令 -> (模块, 说明)
+SUBCOMMANDS = {
+    "text": ("extract_text", "从 PDF 提取文本"),
+    "tables": ("extract_tables", "从 PDF 提取表格"),
+    "split": ("split_pdf", "拆分 PDF 文件"),
+    "merge": ("merge_pdfs", "合并 PDF 文件"),
+    "images": ("extract_images", "提取或压缩 PDF 中的图片"),
+    "watermark": ("watermark_pdf", "添加文字水印"),
+    "index": ("pdf_index", "建立与查询全文索引"),
+    "dedup": ("pdf_dedup", "检测重复与近似重复的文档和页面"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="PDF 工具统一入口",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="子命令:\n" + "\n".join(
+            f"  {name:<8}{description}" for name, (_, description) in SUBCOMMANDS.items()
+        ) + """
+
+示例:
+  python pdftool.py text document.pdf -o output.txt
+  python pdftool.py tables report.pdf -o tables.xlsx
+  python pdftool.py split document.pdf -n 10
+  python pdftool.py merge "*.pdf" -o combined.pdf
+  python pdftool.py images compress scanned.pdf -o smaller.pdf --dpi 150
+  python pdftool.py index query archive.idx 营业收入
+  python pdftool.py text --help                  # 查看子命令参数
+        """
+    )
+
+    parser.add_argument(
+        "command",
+        choices=SUBCOMMANDS,
+        metavar="command",
+        help="子命令: " + ", ".join(SUBCOMMANDS)
+    )
+
+    parser.add_argument(
+        "args",
+        nargs=argparse.REMAINDER,
+        help="子命令参数"
+    )
+
+    args = parser.parse_args(argv)
+
+    module_name, _ = SUBCOMMANDS[args.command]
+    module = importlib.import_module(module_name)
+    return module.main(args.args, prog=f"{parser.prog} {args.command}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,19 +5,57 @@ PDF 拆分工具
 将 PDF 文件按页拆分为多个文件
 """
 
-from pypdf import PdfReader, PdfWriter
 import os
 import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger
 
-def split_pdf(input_file, output_dir=None, pages_per_file=1):
+
+def plan_chunks(total_pages, pages_per_file=None, ranges=None):
     """
-    拆分 PDF 文件
+    计算输出分片
+    
+    Args:
+        total_pages: 总页数
+        pages_per_file: 按固定页数分片（可选）
+        ranges: 页码范围列表，如 [(1, 5), (6, 10)]，可以重叠（可选）
+    
+    Returns:
+        [(start, end, 命名方式), ...]，页码从 1 开始，无效范围被跳过
+    """
+    chunks = []
+    if pages_per_file:
+        for start in range(1, total_pages + 1, pages_per_file):
+            end = min(start + pages_per_file - 1, total_pages)
+            chunks.append((start, end, "page" if pages_per_file == 1 else "pages"))
+    for start, end in ranges or []:
+        # 验证页码范围
+        if start < 1 or end > total_pages or start > end:
+            print(f"⚠ 跳过无效范围: {start}-{end}")
+            continue
+        chunks.append((start, end, "pages"))
+    return chunks
+
+
+def split_pdf_multi(input_file, output_dir=None, pages_per_file=None, ranges=None, workers=None):
+    """
+    单次解析源文件，同时完成按页数拆分与按范围拆分
+    
+    源文件只读取一次，每页引用的对象只序列化一次；各分片只需重新编号
+    并拼接字节，由线程池并发写出。源文件经 LazyPdf 惰性打开，按范围拆分
+    时只解析范围内的页面。
     
     Args:
         input_file: 输入 PDF 文件
         output_dir: 输出目录（可选）
-        pages_per_file: 每个输出文件的页数
+        pages_per_file: 每个输出文件的页数（可选）
+        ranges: 页码范围列表（可选），可与 pages_per_file 同时使用
+        workers: 写出线程数（默认由线程池决定）
+    
+    Returns:
+        生成的文件路径列表
     """
     if not os.path.exists(input_file):
         print(f"错误: 文件不存在: {input_file}")
@@ -29,46 +67,79 @@ def split_pdf(input_file, output_dir=None, pages_per_file=1):
     
     os.makedirs(output_dir, exist_ok=True)
     
+    # pypdf 导入较慢，确认输入文件存在后再导入
+    from pdf_lazy import open_page_source
+    from pdf_stream import TemplateSource
+    
+    start_time = time.perf_counter()
+    
     # 读取 PDF
-    reader = PdfReader(input_file)
-    total_pages = len(reader.pages)
+    with METRICS.stage("open"):
+        source = TemplateSource(open_page_source(input_file))
+    total_pages = len(source)
     
     print(f"PDF 总页数: {total_pages}")
-    print(f"每文件页数: {pages_per_file}")
+    if pages_per_file:
+        print(f"每文件页数: {pages_per_file}")
     print(f"输出目录: {output_dir}")
     print()
     
-    # 计算输出文件数量
-    num_files = (total_pages + pages_per_file - 1) // pages_per_file
-    
-    file_count = 0
-    for file_idx in range(num_files):
-        writer = PdfWriter()
-        
-        start_page = file_idx * pages_per_file
-        end_page = min(start_page + pages_per_file, total_pages)
-        
-        for page_idx in range(start_page, end_page):
-            writer.add_page(reader.pages[page_idx])
-        
-        # 生成输出文件名
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
-        if pages_per_file == 1:
-            output_file = os.path.join(output_dir, f"{base_name}_page_{start_page + 1}.pdf")
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    
+    # 生成输出文件名；同名分片内容相同，只写一次
+    jobs = {}
+    for start, end, style in plan_chunks(total_pages, pages_per_file, ranges):
+        if style == "page":
+            name = f"{base_name}_page_{start}.pdf"
         else:
-            output_file = os.path.join(output_dir, f"{base_name}_pages_{start_page + 1}-{end_page}.pdf")
-        
-        # 保存文件
+            name = f"{base_name}_pages_{start}-{end}.pdf"
+        jobs.setdefault(os.path.join(output_dir, name), (start, end))
+    
+    # 解析与序列化在主线程完成，写出线程只做拼接与 I/O
+    for start, end in jobs.values():
+        for page_idx in range(start - 1, end):
+            with METRICS.time_page("parse", page_idx):
+                source.prepare(page_idx)
+    
+    def write_chunk(item):
+        output_file, (start, end) = item
+        chunk_start = time.perf_counter()
         with open(output_file, "wb") as output:
-            writer.write(output)
-        
-        file_count += 1
-        print(f"✓ 已创建: {os.path.basename(output_file)} ({end_page - start_page} 页)")
+            source.write_pages(output, list(range(start - 1, end)))
+        return output_file, end - start + 1, time.perf_counter() - chunk_start
+    
+    page_log = page_logger()
+    pages_written = 0
+    created = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for output_file, page_count, write_s in executor.map(write_chunk, jobs.items()):
+            METRICS.add("write", write_s)
+            pages_written += page_count
+            created.append(output_file)
+            page_log(f"✓ 已创建: {os.path.basename(output_file)} ({page_count} 页)")
+    
+    METRICS.count("pages_written", pages_written)
+    elapsed = time.perf_counter() - start_time
+    print(f"\n✅ 拆分完成！共生成 {len(created)} 个文件")
+    print(f"耗时 {elapsed:.2f}s，吞吐 {pages_written / elapsed if elapsed else 0:.1f} 页/秒")
+    
+    return created
+
+
+def split_pdf(input_file, output_dir=None, pages_per_file=1, workers=None):
+    """
+    拆分 PDF 文件
     
-    print(f"\n✅ 拆分完成！共生成 {file_count} 个文件")
+    Args:
+        input_file: 输入 PDF 文件
+        output_dir: 输出目录（可选）
+        pages_per_file: 每个输出文件的页数
+        workers: 写出线程数（可选）
+    """
+    return split_pdf_multi(input_file, output_dir, pages_per_file=pages_per_file, workers=workers)
 
 
-def split_pdf_by_ranges(input_file, ranges, output_dir=None):
+def split_pdf_by_ranges(input_file, ranges, output_dir=None, workers=None):
     """
     按指定页码范围拆分 PDF
     
@@ -76,50 +147,14 @@ def split_pdf_by_ranges(input_file, ranges, output_dir=None):
         input_file: 输入 PDF 文件
         ranges: 页码范围列表，如 [(1, 5), (6, 10)]
         output_dir: 输出目录
+        workers: 写出线程数（可选）
     """
-    if not os.path.exists(input_file):
-        print(f"错误: 文件不存在: {input_file}")
-        return
-    
-    # 设置输出目录
-    if not output_dir:
-        output_dir = os.path.splitext(input_file)[0] + "_split"
-    
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 读取 PDF
-    reader = PdfReader(input_file)
-    total_pages = len(reader.pages)
-    
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
-    
-    file_count = 0
-    for range_idx, (start, end) in enumerate(ranges):
-        # 验证页码范围
-        if start < 1 or end > total_pages or start > end:
-            print(f"⚠ 跳过无效范围: {start}-{end}")
-            continue
-        
-        writer = PdfWriter()
-        
-        for page_idx in range(start - 1, end):
-            writer.add_page(reader.pages[page_idx])
-        
-        # 生成输出文件名
-        output_file = os.path.join(output_dir, f"{base_name}_pages_{start}-{end}.pdf")
-        
-        # 保存文件
-        with open(output_file, "wb") as output:
-            writer.write(output)
-        
-        file_count += 1
-        print(f"✓ 已创建: {os.path.basename(output_file)} ({end - start + 1} 页)")
-    
-    print(f"\n✅ 拆分完成！共生成 {file_count} 个文件")
+    return split_pdf_multi(input_file, output_dir, ranges=ranges, workers=workers)
 
 
-def main():
+def main(argv=None, prog=None):
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="拆分 PDF 文件",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -130,8 +165,14 @@ def main():
   # 每 5 页拆分为一个文件
   python split_pdf.py document.pdf -n 5
   
-  # 指定页码范围
+  # 指定页码范围（可重叠）
   python split_pdf.py document.pdf -r 1-5 6-10 11-15
+  
+  # 同一次运行中既按页数又按范围拆分
+  python split_pdf.py document.pdf -n 10 -r 1-3 2-8
+  
+  # 静默运行并导出耗时指标
+  python split_pdf.py document.pdf -n 100 -q --metrics split.json
         """
     )
     
@@ -148,8 +189,7 @@ def main():
     parser.add_argument(
         "-n", "--pages-per-file",
         type=int,
-        default=1,
-        help="每个文件的页数（默认: 1）"
+        help="每个文件的页数（未指定范围时默认: 1）"
     )
     
     parser.add_argument(
@@ -158,19 +198,29 @@ def main():
         help="页码范围（如: 1-5 6-10）"
     )
     
-    args = parser.parse_args()
-    
-    if args.ranges:
-        # 解析页码范围
-        ranges = []
-        for range_str in args.ranges:
-            if "-" in range_str:
-                start, end = map(int, range_str.split("-"))
-                ranges.append((start, end))
-        
-        split_pdf_by_ranges(args.input, ranges, args.output)
-    else:
-        split_pdf(args.input, args.output, args.pages_per_file)
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="写出线程数（默认: 自动）"
+    )
+    
+    add_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    
+    # 解析页码范围
+    ranges = []
+    for range_str in args.ranges or []:
+        if "-" in range_str:
+            start, end = map(int, range_str.split("-"))
+            ranges.append((start, end))
+    
+    pages_per_file = args.pages_per_file
+    if not pages_per_file and not args.ranges:
+        pages_per_file = 1
+    
+    with instrument("split_pdf", args):
+        split_pdf_multi(args.input, args.output, pages_per_file, ranges, args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 批量水印工具
+每种页面尺寸只用 reportlab 渲染一次水印，作为共享的 Form XObject 写入输出文件。
+各页只在内容流数组首尾各加一个共享的小流（"q" 与 "Q q 矩阵 cm /名称 Do Q"），
+原有内容流不解码、不改写。与逐页 merge_page 相比，水印在输出中只有一份，
+耗时也不随水印内容的复杂度增长。
+
+带 /Rotate 的页面按显示方向渲染水印，再用矩阵转回页面坐标，看到的水印总是正的。
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import io
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_metrics import METRICS, add_arguments, instrument, page_logger, peak_rss_mb
+
+DEFAULT_TEXT = "CONFIDENTIAL"
+DEFAULT_OPACITY = 0.3
+DEFAULT_ANGLE = 45
+DEFAULT_COLOR = "#808080"
+
+# 未指定字号时，水印文字约占页面对角线的这一比例
+DIAGONAL_FRACTION = 0.6
+
+# 含非 ASCII 字符的水印使用 reportlab 内置的 CID 字体，无需字体文件
+CJK_FONT = "STSong-Light"
+
+
+def _font_for(text):
+    if text.isascii():
+        return "Helvetica-Bold"
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    if CJK_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+    return CJK_FONT
+
+
+@functools.lru_cache(maxsize=32)
+def render_overlay(width, height, text, font_size=None, opacity=DEFAULT_OPACITY,
+                   angle=DEFAULT_ANGLE, color=DEFAULT_COLOR):
+    """
+    渲染一页水印 PDF（以页面中心为原点旋转的文字）
+
+    同一进程内相同参数只渲染一次。
+
+    Returns:
+        PDF 字节
+    """
+    from reportlab.lib.colors import toColor
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    font = _font_for(text)
+    if font_size is None:
+        diagonal = (width ** 2 + height ** 2) ** 0.5
+        font_size = DIAGONAL_FRACTION * diagonal / max(stringWidth(text, font, 1), 1e-6)
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(width, height))
+    c.setFont(font, font_size)
+    c.setFillColor(toColor(color))
+    c.setFillAlpha(opacity)
+    c.translate(width / 2, height / 2)
+    c.rotate(angle)
+    c.drawCentredString(0, -font_size / 3, text)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _display_matrix(rotate, llx, lly, urx, ury):
+    """水印坐标（按显示方向，原点在左下角）到页面坐标的变换矩阵"""
+    if rotate == 90:
+        return (0, 1, -1, 0, urx, lly)
+    if rotate == 180:
+        return (-1, 0, 0, -1, urx, ury)
+    if rotate == 270:
+        return (0, -1, 1, 0, llx, ury)
+    return (1, 0, 0, 1, llx, lly)
+
+
+def _number(value):
+    return ("%.4f" % value).rstrip("0").rstrip(".")
+
+
+class _Stamper:
+    """
+    为一个输出文档管理共享对象：每种显示尺寸一个水印 Form XObject，
+    每种页面框/旋转组合一对首尾内容流
+    """
+
+    def __init__(self, writer, overlay_options, under=False):
+        self.writer = writer
+        self.overlay_options = overlay_options
+        self.under = under
+        self.forms = {}
+        self.streams = {}
+        self._open = None
+
+    def _stream(self, data):
+        from pypdf.generic import StreamObject
+
+        stream = StreamObject()
+        stream.set_data(data)
+        return self.writer._add_object(stream)
+
+    def _form(self, width, height):
+        """返回 (Form XObject 引用, 资源名)；每种显示尺寸只渲染并写入一次"""
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, FloatObject, NameObject, StreamObject
+
+        key = (round(width, 2), round(height, 2))
+        form = self.forms.get(key)
+        if form is None:
+            with METRICS.stage("render"):
+                overlay = PdfReader(io.BytesIO(render_overlay(*key, **self.overlay_options))).pages[0]
+                form_obj = StreamObject()
+                form_obj.set_data(overlay.get_contents().get_data())
+                form_obj = form_obj.flate_encode()
+                form_obj.update({
+                    NameObject("/Type"): NameObject("/XObject"),
+                    NameObject("/Subtype"): NameObject("/Form"),
+                    NameObject("/BBox"): ArrayObject([FloatObject(0), FloatObject(0),
+                                                      FloatObject(key[0]), FloatObject(key[1])]),
+                    NameObject("/Resources"): overlay["/Resources"].clone(self.writer),
+                })
+                form = self.forms[key] = (self.writer._add_object(form_obj), f"/Wm{len(self.forms)}")
+        return form
+
+    def stamp(self, page):
+        """在页面内容流数组首尾加入共享的水印流"""
+        from pypdf.generic import ArrayObject, DictionaryObject, NameObject
+
+        rotate = page.rotation % 360
+        box = page.cropbox
+        llx, lly, urx, ury = (float(value) for value in (box.left, box.bottom, box.right, box.top))
+        width, height = urx - llx, ury - lly
+        if rotate in (90, 270):
+            width, height = height, width
+        form_ref, name = self._form(width, height)
+
+        resources = page.get("/Resources")
+        if resources is None:
+            page[NameObject("/Resources")] = DictionaryObject()
+            resources = page["/Resources"]
+        resources = resources.get_object()
+        xobjects = resources.get("/XObject")
+        if xobjects is None:
+            resources[NameObject("/XObject")] = DictionaryObject()
+            xobjects = resources["/XObject"]
+        xobjects = xobjects.get_object()
+        # 与页面自有资源重名时换一个名称，首尾流按名称区分
+        base = name
+        suffix = 0
+        while name in xobjects and xobjects.raw_get(name) != form_ref:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        xobjects[NameObject(name)] = form_ref
+
+        matrix = _display_matrix(rotate, llx, lly, urx, ury)
+        key = (name, matrix)
+        streams = self.streams.get(key)
+        if streams is None:
+            draw = b"q %s cm %s Do Q\n" % (" ".join(map(_number, matrix)).encode(), name.encode())
+            if self._open is None:
+                self._open = self._stream(b"q\n")
+            if self.under:
+                streams = (self._stream(draw + b"q\n"), self._stream(b"Q\n"))
+            else:
+                streams = (self._open, self._stream(b"Q\n" + draw))
+            self.streams[key] = streams
+
+        contents = []
+        if "/Contents" in page:
+            raw = page.raw_get("/Contents")
+            resolved = raw.get_object()
+            contents = list(resolved) if isinstance(resolved, list) else [raw]
+        page[NameObject("/Contents")] = ArrayObject([streams[0], *contents, streams[1]])
+
+
+def watermark_pdf(input_file, output_file, text=DEFAULT_TEXT, font_size=None, opacity=DEFAULT_OPACITY,
+                  angle=DEFAULT_ANGLE, color=DEFAULT_COLOR, under=False):
+    """
+    为 PDF 的每一页添加文字水印
+
+    Args:
+        input_file: 输入 PDF 文件
+        output_file: 输出 PDF 文件
+        text: 水印文字
+        font_size: 字号（默认按页面对角线自动计算）
+        opacity: 不透明度（0-1）
+        angle: 旋转角度
+        color: 颜色（如 "#808080"、"red"）
+        under: 水印放在页面内容下方（默认覆盖在上方）
+
+    Returns:
+        统计信息字典
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        return
+
+    from pypdf import PdfWriter
+
+    page_log = page_logger()
+    start = time.perf_counter()
+    with METRICS.stage("open"):
+        writer = PdfWriter(clone_from=input_file)
+    overlay_options = {"text": text, "font_size": font_size, "opacity": opacity, "angle": angle, "color": color}
+    stamper = _Stamper(writer, overlay_options, under)
+
+    with METRICS.stage("stamp"):
+        for page_idx, page in enumerate(writer.pages):
+            stamper.stamp(page)
+            page_log(f"✓ 第 {page_idx + 1} 页")
+
+    with METRICS.stage("write"):
+        with open(output_file, "wb") as f:
+            writer.write(f)
+
+    pages = len(writer.pages)
+    METRICS.count("pages", pages)
+    stats = {
+        "pages": pages,
+        "overlays": len(stamper.forms),
+        "size_before": os.path.getsize(input_file),
+        "size": os.path.getsize(output_file),
+        "seconds": round(time.perf_counter() - start, 4),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"✅ {output_file}: {pages} 页，{len(stamper.forms)} 种页面尺寸，"
+          f"{stats['size_before'] / 1024:.1f} KB -> {stats['size'] / 1024:.1f} KB，{stats['seconds']:.2f}s")
+    return stats
+
+
+def _watermark_job(input_file, output_file, options):
+    """工作进程任务：处理一个文件并捕获所有异常"""
+    record = {"input": input_file, "output": output_file, "status": "ok"}
+    try:
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"文件不存在: {input_file}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            record["result"] = watermark_pdf(input_file, output_file, **options)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+    return record
+
+
+def watermark_files(jobs, workers=None, **options):
+    """
+    在进程池中为多个文件添加水印，每个工作进程内水印只渲染一次
+
+    Args:
+        jobs: [(输入文件, 输出文件), ...]
+        workers: 进程数（默认: CPU 核数）
+        options: 传给 watermark_pdf 的参数
+
+    Returns:
+        每个文件的状态列表，顺序与 jobs 一致
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+    # 按任务序号记录结果，同一输入出现多次时不会互相覆盖
+    records = {}
+    start = time.perf_counter()
+    if workers <= 1:
+        results = ((job_idx, _watermark_job(input_file, output_file, options))
+                   for job_idx, (input_file, output_file) in enumerate(jobs))
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = {executor.submit(_watermark_job, input_file, output_file, options): job_idx
+                   for job_idx, (input_file, output_file) in enumerate(jobs)}
+        results = ((futures[future], future.result()) for future in as_completed(futures))
+    try:
+        for job_idx, record in results:
+            records[job_idx] = record
+            if record["status"] == "ok":
+                result = record["result"]
+                print(f"✓ {record['input']} -> {record['output']}（{result['pages']} 页，{result['seconds']:.2f}s）")
+            else:
+                print(f"✗ {record['input']}: {record['error']}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    done = [record for record in records.values() if record["status"] == "ok"]
+    pages = sum(record["result"]["pages"] for record in done)
+    print(f"\n完成 {len(done)}/{len(jobs)} 个文件，共 {pages} 页，耗时 {elapsed:.2f}s"
+          + (f"（{pages / elapsed:.0f} 页/秒，{workers} 个进程）" if elapsed > 0 else ""))
+    return [records[job_idx] for job_idx in range(len(jobs))]
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="为 PDF 添加文字水印",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python watermark_pdf.py document.pdf
+  python watermark_pdf.py document.pdf -o stamped.pdf -t 机密 --opacity 0.2
+  python watermark_pdf.py document.pdf -t DRAFT --angle 30 --color red --under
+  python watermark_pdf.py "contracts/*.pdf" -o stamped/ -w 8   # 输出为 stamped/<名称>_watermarked.pdf
+        """
+    )
+
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="输入 PDF 文件或通配符"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        help="输出文件（单个输入，默认: <名称>_watermarked.pdf）或目录（多个输入，默认: watermarked）"
+    )
+
+    parser.add_argument(
+        "-t", "--text",
+        default=DEFAULT_TEXT,
+        help="水印文字（默认: %(default)s）"
+    )
+
+    parser.add_argument(
+        "--font-size",
+        type=float,
+        help="字号（默认按页面大小自动计算）"
+    )
+
+    parser.add_argument(
+        "--opacity",
+        type=float,
+        default=DEFAULT_OPACITY,
+        help="不透明度 0-1（默认: %(default)s）"
+    )
+
+    parser.add_argument(
+        "--angle",
+        type=float,
+        default=DEFAULT_ANGLE,
+        help="旋转角度（默认: %(default)s）"
+    )
+
+    parser.add_argument(
+        "--color",
+        default=DEFAULT_COLOR,
+        help="颜色（默认: %(default)s）"
+    )
+
+    parser.add_argument(
+        "--under",
+        action="store_true",
+        help="水印放在页面内容下方"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="并行处理的进程数（默认: CPU 核数）"
+    )
+
+    add_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    files = []
+    for pattern in args.inputs:
+        files.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    options = {"text": args.text, "font_size": args.font_size, "opacity": args.opacity,
+               "angle": args.angle, "color": args.color, "under": args.under}
+
+    with instrument("watermark_pdf", args):
+        if len(files) == 1:
+            stem = os.path.splitext(os.path.basename(files[0]))[0]
+            watermark_pdf(files[0], args.output or f"{stem}_watermarked.pdf", **options)
+            return
+        from batch_pdf import plan_jobs
+
+        output_dir = args.output or "watermarked"
+        os.makedirs(output_dir, exist_ok=True)
+        # 与 batch_pdf 相同的命名：不同目录下的同名文件依次加序号，不会写到同一个输出
+        planned = plan_jobs(list(dict.fromkeys(files)), [], "watermark", output_dir, {})
+        jobs = [(job["input"], job["output"]) for job in planned]
+        records = watermark_files(jobs, args.workers, **options)
+    if any(record["status"] != "ok" for record in records):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
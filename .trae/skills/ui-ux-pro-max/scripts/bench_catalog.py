@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部设计目录基准测试
+生成不同规模的合成风格库，对比"载入 JSON 并在内存中建索引"与
+"内存映射 SQLite 目录"两种方式的启动耗时、首次查询耗时和峰值内存
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from design_catalog import build_catalog
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 在独立子进程中测量，避免互相影响峰值内存
+PROBE = r"""
+import json, resource, sys, time
+sys.path.insert(0, {script_dir!r})
+start = time.perf_counter()
+if {mode!r} == "sqlite":
+    from design_catalog import DesignCatalog
+    catalog = DesignCatalog({path!r})
+else:
+    from design_index import DesignIndex
+    with open({path!r}, encoding="utf-8") as f:
+        styles = json.load(f)["styles"]
+    catalog = DesignIndex(styles)
+loaded = time.perf_counter()
+catalog.search("modern saas dashboard analytics", 5)
+queried = time.perf_counter()
+try:
+    # ru_maxrss 在 Linux 上会继承 fork 前父进程的峰值，优先读取本进程的 VmHWM
+    with open("/proc/self/status") as f:
+        rss_mb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{"startup": loaded - start, "query": queried - loaded, "rss_mb": rss_mb}}))
+"""
+
+WORDS = [
+    "clean", "minimal", "professional", "b2b", "playful", "colorful", "energetic", "sales",
+    "elegant", "creative", "artistic", "showcase", "data", "analytics", "admin", "functional",
+    "marketing", "conversion", "secure", "trustworthy", "medical", "financial", "friendly",
+    "learning", "dark", "immersive", "modern", "saas", "dashboard", "retail", "travel", "food",
+]
+
+
+def make_source(path, count, seed=42):
+    """生成含 count 个风格的合成 JSON 源文件"""
+    rng = random.Random(seed)
+    styles = {}
+    for idx in range(count):
+        words = rng.sample(WORDS, 6)
+        styles[f"style{idx}"] = {
+            "name": f"风格 {idx}",
+            "keywords": words[:4] + [f"tag{rng.randrange(count)}"],
+            "colors": ["科技蓝"],
+            "fonts": ["Inter"],
+            "description": f"适合 {' '.join(words[4:])} 场景 variant{idx}",
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"styles": styles}, f, ensure_ascii=False)
+
+
+def probe(mode, path):
+    code = PROBE.format(script_dir=SCRIPT_DIR, mode=mode, path=path)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外部设计目录基准测试")
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="风格库规模列表（默认: 10000 100000 1000000）")
+    args = parser.parse_args()
+
+    print(f"{'规模':>10} {'方式':>8} {'启动(ms)':>10} {'查询(ms)':>10} {'峰值内存(MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            source = os.path.join(tmp_dir, f"styles_{size}.json")
+            catalog = os.path.join(tmp_dir, f"catalog_{size}.db")
+            make_source(source, size)
+            build_catalog([source], catalog)
+            for mode, path in (("json", source), ("sqlite", catalog)):
+                result = probe(mode, path)
+                print(f"{size:>10} {mode:>8} {result['startup'] * 1000:>10.1f} "
+                      f"{result['query'] * 1000:>10.1f} {result['rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
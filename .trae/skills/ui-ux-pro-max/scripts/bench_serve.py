@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+search.py 延迟基准测试
+对比每次启动进程的一次性 CLI 与常驻 --serve 模式的单次查询耗时
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SEARCH_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search.py")
+
+QUERIES = [
+    "saas dashboard b2b",
+    "ecommerce fashion",
+    "portfolio creative",
+    "fintech secure payments",
+    "healthcare medical clinic",
+    "education learning platform",
+    "gaming dark immersive",
+    "landing page marketing",
+]
+
+
+def summarize(label, samples):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(f"{label:<14} 平均 {statistics.mean(samples_ms):8.3f} ms  "
+          f"中位 {statistics.median(samples_ms):8.3f} ms  P95 {p95:8.3f} ms")
+    return statistics.mean(samples_ms)
+
+
+def bench_cli(queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SEARCH_SCRIPT, query, "--json"],
+                       check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_serve(queries, batch_size):
+    process = subprocess.Popen(
+        [sys.executable, SEARCH_SCRIPT, "--serve"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding="utf-8",
+    )
+    try:
+        # 预热：确保服务已启动并完成索引构建
+        process.stdin.write(json.dumps({"query": "warmup"}) + "\n")
+        process.stdin.flush()
+        process.stdout.readline()
+
+        samples = []
+        for start_idx in range(0, len(queries), batch_size):
+            batch = queries[start_idx:start_idx + batch_size]
+            if batch_size == 1:
+                request = {"query": batch[0]}
+            else:
+                request = {"queries": [{"query": query} for query in batch]}
+            start = time.perf_counter()
+            process.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+            process.stdin.flush()
+            process.stdout.readline()
+            # 批量请求按查询数均摊
+            samples.extend([(time.perf_counter() - start) / len(batch)] * len(batch))
+        return samples
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search.py 延迟基准测试")
+    parser.add_argument("-n", "--queries", type=int, default=40, help="查询次数（默认: 40）")
+    parser.add_argument("-b", "--batch", type=int, default=20, help="批量请求大小（默认: 20）")
+    args = parser.parse_args()
+
+    queries = [QUERIES[idx % len(QUERIES)] for idx in range(args.queries)]
+
+    cli_mean = summarize("一次性 CLI", bench_cli(queries))
+    serve_mean = summarize("--serve", bench_serve(queries, 1))
+    batch_mean = summarize(f"--serve 批量{args.batch}", bench_serve(queries, args.batch))
+
+    print(f"\n常驻服务单次查询比 CLI 快 {cli_mean / serve_mean:.0f}x，"
+          f"批量请求快 {cli_mean / batch_mean:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
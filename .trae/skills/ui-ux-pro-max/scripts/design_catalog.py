@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部设计目录
+将 JSON/CSV 格式的设计风格、配色、字体和 UX 准则编译为 SQLite 目录文件，
+其中包含预先计算好的 BM25 倒排表。查询时以内存映射方式打开，只读取
+查询词对应的倒排记录和最终命中的风格条目，不需要把整个目录载入内存。
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+import sqlite3
+import sys
+
+from design_index import FIELD_WEIGHTS, QueryExpander, char_ngrams, is_cjk, style_fields, tokenize
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE styles (
+    id INTEGER PRIMARY KEY,
+    product_type TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE terms (token TEXT PRIMARY KEY, idf REAL NOT NULL) WITHOUT ROWID;
+CREATE TABLE term_ngrams (
+    ngram TEXT NOT NULL,
+    token TEXT NOT NULL,
+    PRIMARY KEY (ngram, token)
+) WITHOUT ROWID;
+CREATE TABLE postings (
+    token TEXT NOT NULL,
+    style_id INTEGER NOT NULL,
+    tf REAL NOT NULL,
+    norm REAL NOT NULL,
+    PRIMARY KEY (token, style_id)
+) WITHOUT ROWID;
+CREATE TABLE palettes (name TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE fonts (name TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE guidelines (category TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+# 默认映射 256MB；目录更大时超出部分仍按普通方式读取
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or "").split("|") if item.strip()]
+
+
+def load_source(path):
+    """
+    读取目录源文件
+
+    JSON 文件可包含 styles、palettes、fonts、guidelines 四个键，结构与
+    search.py 中的内置数据相同。CSV 文件每行一个风格，列为
+    product_type、name、keywords、colors、fonts、description，列表值以 | 分隔，
+    colors 与 fonts 引用配色和字体名称（构建时缺少的部分取自内置数据）。
+    """
+    if path.lower().endswith(".csv"):
+        styles = {}
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                styles[row["product_type"]] = {
+                    "name": row.get("name", ""),
+                    "keywords": _split_list(row.get("keywords")),
+                    "colors": _split_list(row.get("colors")),
+                    "fonts": _split_list(row.get("fonts")),
+                    "description": row.get("description", ""),
+                }
+        return {"styles": styles}
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_catalog(sources, output_file, k1=1.2, b=0.75):
+    """
+    将一个或多个源文件编译为 SQLite 目录，后出现的同名条目覆盖先出现的
+
+    Returns:
+        风格条目数
+    """
+    from search import COLOR_PALETTES, FONT_PAIRINGS, UX_GUIDELINES
+
+    merged = {"styles": {}, "palettes": {}, "fonts": {}, "guidelines": {}}
+    for source in sources:
+        data = load_source(source)
+        for section in merged:
+            merged[section].update(data.get(section, {}))
+
+    # CSV 源只有风格；没有任何源提供的配色、字体与准则沿用内置数据
+    builtin = {"palettes": COLOR_PALETTES, "fonts": FONT_PAIRINGS, "guidelines": UX_GUIDELINES}
+    for section, defaults in builtin.items():
+        if not merged[section]:
+            merged[section] = dict(defaults)
+
+    if os.path.exists(output_file):
+        os.unlink(output_file)
+    conn = sqlite3.connect(output_file)
+    try:
+        conn.executescript(SCHEMA)
+
+        # 第一遍：计算每个风格的加权词频与文档长度
+        styles = merged["styles"]
+        doc_tfs = []
+        doc_lengths = []
+        doc_freq = {}
+        for product_type, style in styles.items():
+            weighted_tf = {}
+            length = 0.0
+            for field, text in style_fields(product_type, style).items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    weighted_tf[token] = weighted_tf.get(token, 0.0) + weight
+                    length += weight
+            doc_tfs.append(weighted_tf)
+            doc_lengths.append(length)
+            for token in weighted_tf:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+
+        total = len(styles)
+        avg_length = sum(doc_lengths) / total if total else 0.0
+
+        conn.executemany(
+            "INSERT INTO styles VALUES (?, ?, ?)",
+            ((style_id, product_type, json.dumps(style, ensure_ascii=False))
+             for style_id, (product_type, style) in enumerate(styles.items())),
+        )
+
+        # 第二遍：写出倒排表，长度归一化因子随倒排记录一起存储，查询时无需再查风格表
+        def postings():
+            for style_id, weighted_tf in enumerate(doc_tfs):
+                norm = k1 * (1 - b + b * doc_lengths[style_id] / avg_length) if avg_length else k1
+                for token, tf in weighted_tf.items():
+                    yield token, style_id, tf, norm
+
+        conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings())
+        conn.executemany(
+            "INSERT INTO terms VALUES (?, ?)",
+            ((token, math.log(1 + (total - df + 0.5) / (df + 0.5))) for token, df in doc_freq.items()),
+        )
+
+        conn.executemany(
+            "INSERT INTO term_ngrams VALUES (?, ?)",
+            ((gram, token) for token in doc_freq if not is_cjk(token) for gram in char_ngrams(token)),
+        )
+
+        for table, section in (("palettes", "palettes"), ("fonts", "fonts"), ("guidelines", "guidelines")):
+            conn.executemany(
+                f"INSERT INTO {table} VALUES (?, ?)",
+                ((name, json.dumps(value, ensure_ascii=False)) for name, value in merged[section].items()),
+            )
+
+        default_type = "saas" if "saas" in styles else next(iter(styles), "")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("schema_version", str(SCHEMA_VERSION)),
+            ("k1", str(k1)),
+            ("styles", str(total)),
+            ("default_type", default_type),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return total
+
+
+class DesignCatalog:
+    """
+    以只读、内存映射方式打开的 SQLite 设计目录
+
+    接口与 search.py 中的内置目录一致：search、style、palette、font、guidelines。
+    """
+
+    def __init__(self, path, mmap_size=DEFAULT_MMAP_SIZE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"目录文件不存在: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if int(meta.get("schema_version", 0)) != SCHEMA_VERSION:
+            raise ValueError(f"目录格式版本不兼容: {path}")
+        self.k1 = float(meta["k1"])
+        self.default_type = meta["default_type"]
+        self._guidelines = None
+        self.expander = QueryExpander(self._has_term, self._terms_for_ngram)
+
+    def _has_term(self, token):
+        return self._conn.execute("SELECT 1 FROM terms WHERE token = ?", (token,)).fetchone() is not None
+
+    def _terms_for_ngram(self, gram):
+        return [row[0] for row in self._conn.execute("SELECT token FROM term_ngrams WHERE ngram = ?", (gram,))]
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM styles").fetchone()[0]
+
+    def search(self, query, top_k=5):
+        """返回得分最高的 top_k 个 (product_type, score)"""
+        scores = {}
+        for token, weight in self.expander.expand(query):
+            idf = self._conn.execute("SELECT idf FROM terms WHERE token = ?", (token,)).fetchone()[0] * weight
+            for style_id, tf, norm in self._conn.execute(
+                "SELECT style_id, tf, norm FROM postings WHERE token = ?", (token,)
+            ):
+                score = idf * tf * (self.k1 + 1) / (tf + norm)
+                scores[style_id] = scores.get(style_id, 0.0) + score
+
+        ranked = heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for style_id, score in ranked:
+            product_type = self._conn.execute(
+                "SELECT product_type FROM styles WHERE id = ?", (style_id,)
+            ).fetchone()[0]
+            results.append((product_type, score))
+        return results
+
+    def style(self, product_type):
+        row = self._conn.execute(
+            "SELECT data FROM styles WHERE product_type = ?", (product_type,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def palette(self, name):
+        row = self._conn.execute("SELECT data FROM palettes WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def font(self, name):
+        row = self._conn.execute("SELECT data FROM fonts WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def guidelines(self):
+        if self._guidelines is None:
+            self._guidelines = {
+                category: json.loads(data)
+                for category, data in self._conn.execute("SELECT category, data FROM guidelines")
+            }
+        return self._guidelines
+
+
+def export_builtin(output_file):
+    """将 search.py 内置的设计数据导出为 JSON 源文件，作为扩展目录的起点"""
+    from search import COLOR_PALETTES, DESIGN_STYLES, FONT_PAIRINGS, UX_GUIDELINES
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "styles": DESIGN_STYLES,
+            "palettes": COLOR_PALETTES,
+            "fonts": FONT_PAIRINGS,
+            "guidelines": UX_GUIDELINES,
+        }, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="构建 UI/UX Pro Max 外部设计目录",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python design_catalog.py export builtin.json
+  python design_catalog.py build builtin.json extra_styles.csv -o catalog.db
+  python search.py "saas dashboard" --catalog catalog.db
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="由 JSON/CSV 源文件构建目录")
+    build_parser.add_argument("sources", nargs="+", help="源文件（JSON 或 CSV）")
+    build_parser.add_argument("-o", "--output", default="catalog.db", help="输出目录文件（默认: catalog.db）")
+
+    export_parser = subparsers.add_parser("export", help="导出内置设计数据为 JSON 源文件")
+    export_parser.add_argument("output", help="输出 JSON 文件")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_builtin(args.output)
+        print(f"✅ 内置数据已导出到: {args.output}")
+    else:
+        count = build_catalog(args.sources, args.output)
+        print(f"✅ 目录已生成: {args.output}（{count} 个风格）")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设计风格倒排索引
+对产品类型、关键词、风格名称和描述分词建立倒排表，按 BM25 对查询打分。
+查询只访问查询词对应的倒排表，不再逐条遍历整个风格库。
+
+分词同时支持中英文：英文词做轻量词干还原，中文按字二元组切分；
+词表外的英文词借助预先计算的字符 n-gram 索引做编辑距离模糊匹配。
+"""
+
+import functools
+import heapq
+import math
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff\uf900-\ufaff]+")
+
+NGRAM_SIZE = 3
+
+# 归一化后的查询缓存条数
+QUERY_CACHE_SIZE = 4096
+
+# 各字段的词频权重：命中产品类型比命中描述更能说明意图
+FIELD_WEIGHTS = {
+    "product_type": 3.0,
+    "keywords": 2.0,
+    "name": 1.0,
+    "description": 1.0,
+}
+
+
+def stem(word):
+    """轻量英文词干还原，只处理常见的复数、进行时、过去式和副词后缀"""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is", "as")):
+        word = word[:-1]
+    for suffix in ("ing", "ed", "ly"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # running -> run，stopped -> stop
+            if len(word) >= 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    return word
+
+
+def is_cjk(token):
+    return "\u3400" <= token[0] <= "\ufaff"
+
+
+def tokenize(text):
+    """
+    中英文混合分词
+
+    英文按字母数字切分后做词干还原；连续的中文按字二元组切分
+    （如"仪表板" -> 仪表、表板），单个汉字保留为一元词。
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if is_cjk(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[idx:idx + 2] for idx in range(len(run) - 1))
+        else:
+            tokens.append(stem(run))
+    return tokens
+
+
+def char_ngrams(term, size=NGRAM_SIZE):
+    """带边界标记的字符 n-gram，用于模糊匹配的候选召回"""
+    padded = f"^{term}$"
+    return {padded[idx:idx + size] for idx in range(max(1, len(padded) - size + 1))}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein 距离，超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class QueryExpander:
+    """
+    将查询归一化为 ((词, 权重), ...)
+
+    词表内的词权重为 1；词表外的英文词通过 n-gram 索引召回候选，
+    编辑距离在允许范围内、或 n-gram 重合度足够高的候选按相似度降权加入。
+    结果按原始查询做 LRU 缓存，重复查询无需再次分词与模糊匹配。
+
+    Args:
+        has_term: 判断词是否在词表中的函数
+        terms_for_ngram: 返回包含某个 n-gram 的词表词的函数
+    """
+
+    def __init__(self, has_term, terms_for_ngram, cache_size=QUERY_CACHE_SIZE):
+        self._has_term = has_term
+        self._terms_for_ngram = terms_for_ngram
+        self.expand = functools.lru_cache(maxsize=cache_size)(self._expand)
+
+    def _expand(self, query):
+        weights = {}
+        for token in tokenize(query):
+            if self._has_term(token):
+                weights[token] = max(weights.get(token, 0.0), 1.0)
+                continue
+            if is_cjk(token) or len(token) < 3:
+                continue
+            for term, weight in self._fuzzy(token):
+                weights[term] = max(weights.get(term, 0.0), weight)
+        return tuple(sorted(weights.items()))
+
+    def _fuzzy(self, token):
+        grams = char_ngrams(token)
+        shared = {}
+        for gram in grams:
+            for term in self._terms_for_ngram(gram):
+                shared[term] = shared.get(term, 0) + 1
+
+        limit = 1 if len(token) <= 5 else 2
+        matches = []
+        for term, count in shared.items():
+            dice = 2 * count / (len(grams) + len(char_ngrams(term)))
+            distance = edit_distance(token, term, limit)
+            if distance <= limit:
+                matches.append((term, 0.8 if distance == 1 else 0.6))
+            elif dice >= 0.6:
+                matches.append((term, 0.5 * dice))
+        return matches
+
+
+def style_fields(product_type, style):
+    """风格条目中参与索引的字段文本"""
+    return {
+        "product_type": product_type,
+        "keywords": " ".join(style.get("keywords", [])),
+        "name": style.get("name", ""),
+        "description": style.get("description", ""),
+    }
+
+
+class DesignIndex:
+    """
+    BM25 倒排索引
+
+    Args:
+        styles: {product_type: style_info}，与 DESIGN_STYLES 结构相同
+        k1, b: BM25 参数
+    """
+
+    def __init__(self, styles, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = {}
+
+        for product_type, style in styles.items():
+            doc_idx = len(self.doc_ids)
+            self.doc_ids.append(product_type)
+            weighted_tf = {}
+            length = 0.0
+            for field, text in style_fields(product_type, style).items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    weighted_tf[token] = weighted_tf.get(token, 0.0) + weight
+                    length += weight
+            self.doc_lengths.append(length)
+            for token, tf in weighted_tf.items():
+                self.postings.setdefault(token, []).append((doc_idx, tf))
+
+        total = len(self.doc_ids)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        # 预先计算 idf 与长度归一化因子，查询时只做查表和加法
+        self.idf = {
+            token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+        self._norms = [
+            k1 * (1 - b + b * length / self.avg_length) if self.avg_length else k1
+            for length in self.doc_lengths
+        ]
+
+        self.ngram_index = {}
+        for token in self.postings:
+            if not is_cjk(token):
+                for gram in char_ngrams(token):
+                    self.ngram_index.setdefault(gram, []).append(token)
+        self.expander = QueryExpander(
+            self.postings.__contains__,
+            lambda gram: self.ngram_index.get(gram, ()),
+        )
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def search(self, query, top_k=5):
+        """
+        返回得分最高的 top_k 个 (product_type, score)，无命中时返回空列表
+
+        同分时按风格库中的原始顺序排列。
+        """
+        scores = {}
+        for token, weight in self.expander.expand(query):
+            idf = self.idf[token] * weight
+            for doc_idx, tf in self.postings[token]:
+                score = idf * tf * (self.k1 + 1) / (tf + self._norms[doc_idx])
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + score
+
+        ranked = heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.doc_ids[doc_idx], score) for doc_idx, score in ranked]
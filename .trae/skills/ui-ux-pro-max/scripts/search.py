@@ -7,9 +7,14 @@ UI/UX Pro Max 设计指南搜索工具
 
 import argparse
 import json
+import os
+import re
 import sys
+import time
 from pathlib import Path
 
+from design_index import DesignIndex
+
 # 设计风格数据库
 DESIGN_STYLES = {
     "saas": {
@@ -183,52 +188,136 @@ UX_GUIDELINES = {
 }
 
 
-def search_design_system(query: str) -> dict:
-    """根据查询搜索设计方案"""
-    query_lower = query.lower()
-    
-    # 匹配产品类型
-    matched_style = None
-    for product_type, style_info in DESIGN_STYLES.items():
-        if product_type in query_lower:
-            matched_style = style_info
-            break
-        # 检查关键词匹配
-        for keyword in style_info["keywords"]:
-            if keyword in query_lower:
-                matched_style = style_info
-                break
-        if matched_style:
-            break
+class BuiltinCatalog:
+    """内置设计数据，首次查询时构建倒排索引"""
     
-    # 如果没有匹配，使用默认风格
-    if not matched_style:
-        matched_style = DESIGN_STYLES["saas"]
+    default_type = "saas"
+    
+    def __init__(self):
+        self._index = None
+    
+    def search(self, query: str, top_k: int = 5) -> list:
+        if self._index is None:
+            self._index = DesignIndex(DESIGN_STYLES)
+        return self._index.search(query, top_k)
+    
+    def style(self, product_type: str) -> dict:
+        return DESIGN_STYLES.get(product_type)
+    
+    def palette(self, name: str) -> dict:
+        return COLOR_PALETTES.get(name)
+    
+    def font(self, name: str) -> dict:
+        return FONT_PAIRINGS.get(name)
+    
+    def guidelines(self) -> dict:
+        return UX_GUIDELINES
+
+
+_CATALOG = None
+
+
+def get_catalog():
+    """当前使用的设计目录（默认为内置数据）"""
+    global _CATALOG
+    if _CATALOG is None:
+        _CATALOG = BuiltinCatalog()
+    return _CATALOG
+
+
+def use_catalog(path: str):
+    """切换到由 design_catalog.py 构建的外部目录"""
+    global _CATALOG
+    from design_catalog import DesignCatalog
+    _CATALOG = DesignCatalog(path)
+    return _CATALOG
+
+
+def expand_style(product_type: str, style_info: dict, score: float = None) -> dict:
+    """展开风格对应的配色方案与字体搭配"""
+    catalog = get_catalog()
     
     # 获取配色方案
     colors = {}
-    for color_name in matched_style["colors"]:
-        if color_name in COLOR_PALETTES:
-            colors[color_name] = COLOR_PALETTES[color_name]
+    for color_name in style_info["colors"]:
+        palette = catalog.palette(color_name)
+        if palette:
+            colors[color_name] = palette
     
     # 获取字体搭配
     fonts = {}
-    for font_name in matched_style["fonts"]:
-        if font_name in FONT_PAIRINGS:
-            fonts[font_name] = FONT_PAIRINGS[font_name]
+    for font_name in style_info["fonts"]:
+        font = catalog.font(font_name)
+        if font:
+            fonts[font_name] = font
     
-    return {
-        "product_type": product_type if matched_style else "general",
-        "style": matched_style,
+    result = {
+        "product_type": product_type,
+        "style": style_info,
         "colors": colors,
         "fonts": fonts,
-        "ux_guidelines": UX_GUIDELINES
+        "ux_guidelines": catalog.guidelines()
     }
+    if score is not None:
+        result["score"] = round(score, 4)
+    return result
+
+
+def search_design_systems(query: str, top_k: int = 5) -> list:
+    """根据查询返回按相关度排序的前 top_k 个设计方案"""
+    catalog = get_catalog()
+    return [
+        expand_style(product_type, catalog.style(product_type), score)
+        for product_type, score in catalog.search(query, top_k)
+    ]
+
+
+def search_design_system(query: str) -> dict:
+    """根据查询搜索最相关的设计方案，没有命中时使用默认风格"""
+    ranked = search_design_systems(query, top_k=1)
+    if ranked:
+        return ranked[0]
+    
+    # 如果没有匹配，使用默认风格
+    catalog = get_catalog()
+    return expand_style("general", catalog.style(catalog.default_type))
+
+
+def tailwind_config_lines(result: dict) -> list:
+    """由设计方案生成 tailwind.config.js 内容（按行），没有配色时返回空列表"""
+    if not result["colors"]:
+        return []
+    
+    output = []
+    first_color = list(result["colors"].values())[0]
+    output.append("module.exports = {")
+    output.append("  theme: {")
+    output.append("    extend: {")
+    output.append("      colors: {")
+    output.append(f"        primary: '{first_color['primary']}',")
+    output.append(f"        secondary: '{first_color['secondary']}',")
+    output.append(f"        background: '{first_color['background']}',")
+    output.append(f"        text: '{first_color['text']}',")
+    output.append(f"        accent: '{first_color['accent']}',")
+    output.append("      },")
+    
+    if result["fonts"]:
+        first_font = list(result["fonts"].values())[0]
+        output.append("      fontFamily: {")
+        output.append(f"        heading: ['{first_font['heading']}', '{first_font['fallback']}'],")
+        output.append(f"        body: ['{first_font['body']}', '{first_font['fallback']}'],")
+        output.append("      },")
+    
+    output.append("    },")
+    output.append("  },")
+    output.append("}")
+    return output
 
 
-def generate_design_system(query: str, project_name: str = None) -> str:
-    """生成完整的设计系统文档"""
-    result = search_design_system(query)
+def generate_design_system(query: str, project_name: str = None, result: dict = None) -> str:
+    """生成完整的设计系统文档（可传入已查询好的 result 避免重复搜索）"""
+    if result is None:
+        result = search_design_system(query)
     
     output = []
     output.append("=" * 60)
@@ -275,19 +364,19 @@ def generate_design_system(query: str, project_name: str = None) -> str:
     output.append("-" * 60)
     
     output.append("\n🔴 无障碍访问 (CRITICAL):")
-    for guideline in result["ux_guidelines"]["accessibility"]:
+    for guideline in result["ux_guidelines"].get("accessibility", []):
         output.append(f"  ✓ {guideline}")
     
     output.append("\n🔴 触摸与交互 (CRITICAL):")
-    for guideline in result["ux_guidelines"]["interaction"]:
+    for guideline in result["ux_guidelines"].get("interaction", []):
         output.append(f"  ✓ {guideline}")
     
     output.append("\n🟠 性能 (HIGH):")
-    for guideline in result["ux_guidelines"]["performance"]:
+    for guideline in result["ux_guidelines"].get("performance", []):
         output.append(f"  ✓ {guideline}")
     
     output.append("\n🟠 响应式布局 (HIGH):")
-    for guideline in result["ux_guidelines"]["responsive"]:
+    for guideline in result["ux_guidelines"].get("responsive", []):
         output.append(f"  ✓ {guideline}")
     
     # Tailwind CSS 配置示例
@@ -295,36 +384,204 @@ def generate_design_system(query: str, project_name: str = None) -> str:
     output.append("🛠️ Tailwind CSS 配置示例")
     output.append("-" * 60)
     
-    if result["colors"]:
-        first_color = list(result["colors"].values())[0]
+    lines = tailwind_config_lines(result)
+    if lines:
         output.append("\n// tailwind.config.js")
-        output.append("module.exports = {")
-        output.append("  theme: {")
-        output.append("    extend: {")
-        output.append("      colors: {")
-        output.append(f"        primary: '{first_color['primary']}',")
-        output.append(f"        secondary: '{first_color['secondary']}',")
-        output.append(f"        background: '{first_color['background']}',")
-        output.append(f"        text: '{first_color['text']}',")
-        output.append(f"        accent: '{first_color['accent']}',")
-        output.append("      },")
-        
-        if result["fonts"]:
-            first_font = list(result["fonts"].values())[0]
-            output.append("      fontFamily: {")
-            output.append(f"        heading: ['{first_font['heading']}', '{first_font['fallback']}'],")
-            output.append(f"        body: ['{first_font['body']}', '{first_font['fallback']}'],")
-            output.append("      },")
-        
-        output.append("    },")
-        output.append("  },")
-        output.append("}")
+        output.extend(lines)
     
     output.append("\n" + "=" * 60)
     
     return "\n".join(output)
 
 
+def resolve_batch_query(query: str, memo: dict) -> dict:
+    """
+    批量模式下解析单个查询
+    
+    配色与字体的展开结果按风格缓存在 memo 中，命中同一风格的查询直接复用。
+    """
+    catalog = get_catalog()
+    ranked = catalog.search(query, 1)
+    if ranked:
+        product_type, score = ranked[0]
+    else:
+        product_type, score = "general", None
+    
+    expanded = memo.get(product_type)
+    if expanded is None:
+        style_key = catalog.default_type if product_type == "general" else product_type
+        expanded = memo[product_type] = expand_style(product_type, catalog.style(style_key))
+    
+    result = dict(expanded)
+    if score is not None:
+        result["score"] = round(score, 4)
+    return result
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r"[^\w\u4e00-\u9fff.-]+", "_", name).strip("_") or "project"
+
+
+def run_batch(batch_file: str, out_format: str = "jsonl", output: str = None) -> int:
+    """
+    对查询文件中的每一条查询生成设计方案
+    
+    查询文件每行一个 JSON 对象 {"query": "...", "project": "..."}，或一个纯文本查询。
+    jsonl 格式逐条写出到 output 文件（默认标准输出）；markdown/tailwind 格式
+    为每个项目在 output 目录下生成一个文件。
+    
+    Returns:
+        处理的查询数
+    """
+    memo = {}
+    count = 0
+    used_names = set()
+    start = time.perf_counter()
+    
+    if out_format == "jsonl":
+        sink = open(output, "w", encoding="utf-8") if output else sys.stdout
+    else:
+        output = output or "design_systems"
+        os.makedirs(output, exist_ok=True)
+        sink = None
+    
+    try:
+        with open(batch_file, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line) if line.startswith("{") else {"query": line}
+                except ValueError as e:
+                    print(f"⚠ 第 {line_no} 行不是有效的 JSON，已跳过: {e}", file=sys.stderr)
+                    continue
+                query = request.get("query") if isinstance(request, dict) else None
+                if not isinstance(query, str):
+                    print(f"⚠ 第 {line_no} 行缺少 query，已跳过", file=sys.stderr)
+                    continue
+                project = request.get("project")
+                result = resolve_batch_query(query, memo)
+                count += 1
+                
+                if sink is not None:
+                    record = {"query": query, "project": project, **result}
+                    sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    continue
+                
+                name = _safe_filename(project or f"query_{line_no}")
+                while name in used_names:
+                    name = f"{name}_{line_no}"
+                used_names.add(name)
+                if out_format == "markdown":
+                    path = os.path.join(output, f"{name}.md")
+                    content = generate_design_system(query, project, result)
+                else:
+                    path = os.path.join(output, f"{name}.tailwind.config.js")
+                    content = "\n".join(tailwind_config_lines(result))
+                with open(path, "w", encoding="utf-8") as out:
+                    out.write(content + "\n")
+    finally:
+        if sink is not None and sink is not sys.stdout:
+            sink.close()
+    
+    elapsed = time.perf_counter() - start
+    print(f"✅ 批量完成: {count} 条查询，{len(memo)} 种风格，耗时 {elapsed:.3f}s，"
+          f"{count / elapsed if elapsed else 0:.0f} 查询/秒", file=sys.stderr)
+    return count
+
+
+def handle_request(request: dict) -> dict:
+    """
+    处理一条服务模式请求
+    
+    请求格式:
+        {"query": "...", "mode": "search" | "design_system", "top_k": 1, "project": "..."}
+        {"queries": [请求, ...]}  批量请求，按顺序返回 {"results": [...]}
+    """
+    if not isinstance(request, dict):
+        return {"error": "请求必须是 JSON 对象"}
+    if "queries" in request:
+        if not isinstance(request["queries"], list):
+            return {"error": "queries 必须是数组"}
+        return {"results": [handle_request(item) for item in request["queries"]]}
+    
+    query = request.get("query")
+    if not isinstance(query, str):
+        return {"error": "缺少 query 字段"}
+    
+    mode = request.get("mode", "search")
+    if mode == "design_system":
+        return {"query": query, "design_system": generate_design_system(query, request.get("project"))}
+    if mode != "search":
+        return {"error": f"未知的 mode: {mode}"}
+    
+    top_k = int(request.get("top_k", 1))
+    if top_k > 1:
+        return {"query": query, "results": search_design_systems(query, top_k)}
+    return {"query": query, "result": search_design_system(query)}
+
+
+def handle_line(line: str) -> str:
+    """解析一行 JSON 请求并返回一行 JSON 响应"""
+    try:
+        request = json.loads(line)
+        if isinstance(request, str):
+            request = {"query": request}
+        response = handle_request(request)
+    except (ValueError, TypeError) as e:
+        response = {"error": f"无效的请求: {e}"}
+    except Exception as e:
+        # 单条请求出错只返回错误响应，不影响服务继续处理后续请求
+        response = {"error": f"处理请求失败: {type(e).__name__}: {e}"}
+    return json.dumps(response, ensure_ascii=False)
+
+
+def serve_stdio():
+    """逐行读取标准输入中的 JSON 请求，每条请求输出一行 JSON 响应"""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        sys.stdout.write(handle_line(line) + "\n")
+        sys.stdout.flush()
+
+
+def serve_socket(socket_path: str):
+    """在 Unix 套接字上提供与标准输入相同的行协议，每个连接一个线程"""
+    import signal
+    import socketserver
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                for raw in self.rfile:
+                    line = raw.decode("utf-8")
+                    if not line.strip():
+                        continue
+                    self.wfile.write((handle_line(line) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端提前断开，丢弃未送达的响应
+                pass
+    
+    def handle_sigterm(signum, frame):
+        # 转为 SystemExit，使下面的 finally 在 kill 时同样删除套接字文件
+        raise SystemExit(0)
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    try:
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            print(f"🚀 服务已启动: {socket_path}", file=sys.stderr)
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="UI/UX Pro Max 设计指南搜索工具",
@@ -334,11 +591,17 @@ def main():
   python search.py "saas dashboard b2b" --design-system
   python search.py "ecommerce fashion" --design-system -p "MyShop"
   python search.py "portfolio creative" --design-system
+  python search.py --serve                       # 标准输入/输出行协议
+  python search.py --serve --socket /tmp/uiux.sock
+  python search.py "saas dashboard" --catalog catalog.db
+  python search.py --batch briefs.jsonl -o results.jsonl
+  python search.py --batch briefs.jsonl --batch-format markdown -o specs/
         """
     )
     
     parser.add_argument(
         "query",
+        nargs="?",
         help="搜索查询，如产品类型、行业、关键词等"
     )
     
@@ -359,14 +622,83 @@ def main():
         help="以 JSON 格式输出"
     )
     
+    parser.add_argument(
+        "-k", "--top-k",
+        type=int,
+        default=1,
+        help="返回相关度最高的前 K 个结果（默认: 1）"
+    )
+    
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="常驻服务模式，按行接收 JSON 请求"
+    )
+    
+    parser.add_argument(
+        "--socket",
+        help="服务模式下监听的 Unix 套接字路径（默认使用标准输入/输出）"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        help="批量模式：查询文件（每行一个 JSON 对象或纯文本查询）"
+    )
+    
+    parser.add_argument(
+        "--batch-format",
+        choices=["jsonl", "markdown", "tailwind"],
+        default="jsonl",
+        help="批量模式输出格式（默认: jsonl）"
+    )
+    
+    parser.add_argument(
+        "-o", "--output",
+        help="批量模式输出：jsonl 为文件（默认标准输出），其余为目录"
+    )
+    
+    parser.add_argument(
+        "--catalog",
+        help="使用 design_catalog.py 构建的外部目录文件"
+    )
+    
     args = parser.parse_args()
     
+    if args.catalog:
+        use_catalog(args.catalog)
+    
+    if args.serve:
+        # 启动时预先构建索引，首个请求无需再付出构建开销
+        get_catalog().search("")
+        if args.socket:
+            serve_socket(args.socket)
+        else:
+            serve_stdio()
+        return
+    
+    if args.batch:
+        run_batch(args.batch, args.batch_format, args.output)
+        return
+    
+    if args.query is None:
+        parser.error("需要提供查询，或使用 --serve / --batch")
+    
     if args.design_system:
         result = generate_design_system(args.query, args.project)
         print(result)
     elif args.json:
-        result = search_design_system(args.query)
+        if args.top_k > 1:
+            result = search_design_systems(args.query, args.top_k)
+        else:
+            result = search_design_system(args.query)
         print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif args.top_k > 1:
+        results = search_design_systems(args.query, args.top_k)
+        if not results:
+            print("未找到匹配的设计方案")
+        for rank, result in enumerate(results, 1):
+            print(f"{rank}. [{result['product_type']}] {result['style']['name']} "
+                  f"(得分 {result['score']}) - {', '.join(result['colors'].keys())}")
     else:
         # 简单搜索模式
         result = search_design_system(args.query)